@@ -1,13 +1,13 @@
 from collections.abc import Sequence
-from datetime import datetime, timedelta
 
 from future.application import Future
 from future.controllers import DebugController, GraphQLController, OpenAPIController, WebSocketController, WelcomeController
+from future.election import FileLeaseBackend, LeaderElection
 from future.lifespan import Lifespan
 from future.middleware import TestMiddlewareRequest, TestMiddlewareResponse
 from future.routing import Get, Route, RouteGroup, WebSocket
 from future.scheduler import Task, Unit, check_dns, check_ssh_banner, check_system_uptime, daily_backup
-from future.settings import APP_DEBUG, APP_DOMAIN, APP_LOG_LEVEL, APP_NAME
+from future.settings import APP_DEBUG, APP_DOMAIN, APP_LOG_LEVEL, APP_NAME, APP_ROUTER
 
 
 routes: Sequence[Route | RouteGroup] = [  # type: ignore
@@ -27,7 +27,7 @@ routes: Sequence[Route | RouteGroup] = [  # type: ignore
             TestMiddlewareRequest,  # type: ignore
             TestMiddlewareResponse,  # type: ignore
             # ResponseCodeConfuser,  # type: ignore
-            # ScopeValidationMiddleware,  # type: ignore
+            # ScopeValidationMiddleware(secret="change-me"),  # type: ignore
         ],
         routes=[
             Get(path="/", endpoint=WelcomeController.root, name="Welcome"),  # type: ignore[reportAttributeAccessIssue]
@@ -69,24 +69,22 @@ shutdown_tasks = [
 
 # Cron jobs (run periodically)
 cronjobs = [
-    Task("dns_check", interval=5, unit=Unit.MINUTES, func=check_dns, args=("example.com",)),
-    Task("ssh_banner_check", interval=10, unit=Unit.MINUTES, func=check_ssh_banner, args=("localhost", 22)),
+    Task("dns_check", interval=5, unit=Unit.MINUTES, func=check_dns, args=("example.com",), timeout=10),
+    Task("ssh_banner_check", interval=10, unit=Unit.MINUTES, func=check_ssh_banner, args=("localhost", 22), timeout=10),
     Task("system_uptime", interval=1, unit=Unit.HOURS, func=check_system_uptime),
-    Task(
-        "daily_backup",
-        interval=1,
-        unit=Unit.DAYS,
-        start_time=datetime.now().replace(hour=2, minute=0, second=0, microsecond=0) + timedelta(days=1),
-        func=daily_backup,
-    ),
+    # Missed backups run back to back, queued behind the one in progress
+    Task("daily_backup", cron="0 2 * * *", timezone="Europe/Oslo", func=daily_backup, misfire="catch_up", overlap="queue"),
 ]
 
-lifespan = Lifespan(startup_tasks, shutdown_tasks, cronjobs)
+# Only one of the uvicorn workers runs the cron jobs
+election = LeaderElection(FileLeaseBackend(), name=f"{APP_NAME.lower()}-scheduler")
+lifespan = Lifespan(startup_tasks, shutdown_tasks, cronjobs, election=election)
 config = {
     "APP_NAME": APP_NAME,
     "APP_DOMAIN": APP_DOMAIN,
     "APP_DEBUG": APP_DEBUG,
     "APP_LOG_LEVEL": APP_LOG_LEVEL,
+    "APP_ROUTER": APP_ROUTER,
 }
 
 app = Future(lifespan=lifespan, config=config)
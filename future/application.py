@@ -1,8 +1,10 @@
+import asyncio
+import functools
 import platform
 import sys
 import traceback
 
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
 from importlib.metadata import PackageNotFoundError, version
 from typing import Any, Optional, Union
 
@@ -14,12 +16,15 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 
+from future.cache import LRUCache
+from future.exceptions import ErrorHandler, FutureException
 from future.logger import log
 from future.middleware import Middleware
-from future.requests import Request
-from future.responses import Response
-from future.routing import Route, RouteGroup
-from future.types import AsgiEventType, ASGIReceive, ASGIScope, ASGISend, RouteConfig
+from future.requests import Headers, Request
+from future.responses import CachedResponse, Response
+from future.routing import ROUTERS, Route, RouteGroup, RouteList, RouteMethods, RouteRegex, RouteTree, is_cors
+from future.types import AsgiEventType, ASGIMessage, ASGIReceive, ASGIScope, ASGISend, Intercept, RouteConfig
+from future.websockets import WebSocketConnection, WebSocketDisconnect
 
 
 """
@@ -73,9 +78,15 @@ class Future:
         # spawn background tasks in the lifespan startup process... or database connections etc...
         # on shutdown, save shit, send info about shutdown etc...
         self.lifespan = lifespan
-        self.routes: dict[str, dict[str, RouteConfig]] = {}
+        self.routes: dict[str, dict[str, RouteMethods]] = {}
+        self.routers: dict[str, RouteTree | RouteRegex | RouteList] = {}
         self.config = config or {}
 
+        # Route matching engine used for every domain: "tree" (default), "regex" or "linear"
+        self.router = self.config.get("APP_ROUTER", "tree")
+        if self.router not in ROUTERS:
+            raise ValueError(f"Invalid router: {self.router}. Must be one of: {', '.join(ROUTERS)}.")
+
         domain = self.config.get("APP_DOMAIN", "")
 
         # Domainless mode: if no domain is set, subdomains are ignored, only prefixes work
@@ -98,6 +109,20 @@ class Future:
             self.domain = domain
             self.domainless_mode = False
 
+        # Requests with a larger body are rejected with 413, None means unlimited
+        max_body_size = self.config.get("APP_MAX_BODY_SIZE")
+        self.max_body_size = int(max_body_size) if max_body_size is not None else None
+        self.error_handler = ErrorHandler()
+
+        # Maps normalized host names to their (allowed, router) resolution
+        self.host_cache = LRUCache(max_size=int(self.config.get("APP_HOST_CACHE_SIZE", 1024)))
+        # Outgoing messages buffered per WebSocket connection before send_* has to wait
+        self.websocket_queue_size = int(self.config.get("APP_WEBSOCKET_QUEUE_SIZE", 64))
+        # Seconds a closing WebSocket connection waits for its queued messages to go out
+        self.websocket_close_timeout = float(self.config.get("APP_WEBSOCKET_CLOSE_TIMEOUT", 5))
+        # Shared handler calls of routes with coalesce enabled, see _call_coalesced
+        self.inflight: dict[tuple[Any, ...], asyncio.Task[Any]] = {}
+
         # Performance monitoring
         self.route_count = 0
         self.max_nesting_depth = 0
@@ -117,8 +142,10 @@ class Future:
         key = "" if getattr(self, "domainless_mode", False) else subdomain
         if key not in self.routes:
             self.routes[key] = {}
+            self.routers[key] = ROUTERS[self.router]()
         self.route_count += 1
         self.registered_domains.add(key)
+        self.host_cache.clear()
 
         # Build hierarchical middleware structure
         middleware_levels = []
@@ -128,9 +155,9 @@ class Future:
             parent_before = []
             parent_after = []
             for middleware in parent_middlewares:
-                if middleware.attach_to == "request":
+                if middleware.attach_to in ("request", "both"):
                     parent_before.append(middleware)
-                elif middleware.attach_to == "response":
+                if middleware.attach_to in ("response", "both"):
                     parent_after.append(middleware)
 
             # Sort parent middlewares by priority
@@ -148,9 +175,9 @@ class Future:
         route_before = []
         route_after = []
         for middleware in route.middlewares:
-            if middleware.attach_to == "request":
+            if middleware.attach_to in ("request", "both"):
                 route_before.append(middleware)
-            elif middleware.attach_to == "response":
+            if middleware.attach_to in ("response", "both"):
                 route_after.append(middleware)
 
         # Sort route middlewares by priority
@@ -159,15 +186,38 @@ class Future:
 
         middleware_levels.append({"before": route_before, "after": route_after})
 
+        # Flatten the hierarchy into the exact call order used at dispatch
+        before: list[Intercept] = []
+        after: list[Intercept] = []
+        for level in middleware_levels:
+            before.extend(self._compile_intercept(m) for m in level["before"])
+        for level in reversed(middleware_levels):
+            after.extend(self._compile_intercept(m) for m in level["after"])
+
         # Create route config with hierarchical middleware structure
         route_config = RouteConfig(
+            route=route,
             handler=route.endpoint,
             middleware={"levels": middleware_levels},
+            before=tuple(before),
+            after=tuple(after),
             regex={"paths": [route._rx]} if hasattr(route, "_rx") else None,  # type: ignore[reportGeneralTypeIssues]
+            coalesce=route.coalesce if "WEBSOCKET" not in route.methods else None,
         )
 
-        # Use route path as key for direct lookup
-        self.routes[key][route.path] = route_config
+        # Use route path as key for direct lookup, and index it in the domain's router for dispatch.
+        # Routes sharing a path share one method table, so GET and POST on the same path coexist.
+        route_methods = self.routes[key].get(route.path)
+        if route_methods is None:
+            route_methods = RouteMethods()
+            self.routes[key][route.path] = route_methods
+            self.routers[key].insert(route, route_methods)
+        route_methods.add(route_config)
+
+    def _compile_intercept(self, middleware: Middleware) -> Intercept:
+        """Resolve a middleware's intercept once, flagging whether its result has to be awaited."""
+        intercept = middleware.intercept
+        return (intercept, asyncio.iscoroutinefunction(intercept))
 
     def add_routes(self, routes: Sequence[Union[Route, RouteGroup]]) -> None:
         for r in routes:
@@ -210,13 +260,16 @@ class Future:
         # Build the full prefix path for this group with validation
         full_prefix = self._build_prefix_path(parent_prefix, route_group.prefix)
 
+        # Middlewares of all enclosing groups apply to this group's routes, outermost first
+        group_middlewares = [*(parent_middlewares or []), *route_group.middlewares]
+
         # Process all routes in this group
         for r in route_group.routes:
             if isinstance(r, RouteGroup):
                 # Nested RouteGroup - recurse with updated parent subdomain and prefix
-                # Pass parent middlewares as a separate parameter to maintain hierarchy
+                # Pass the accumulated parent middlewares as a separate parameter to maintain hierarchy
                 self._add_route_group(
-                    r, parent_subdomain=full_subdomain, parent_prefix=full_prefix, parent_middlewares=route_group.middlewares, nesting_depth=nesting_depth + 1
+                    r, parent_subdomain=full_subdomain, parent_prefix=full_prefix, parent_middlewares=group_middlewares, nesting_depth=nesting_depth + 1
                 )
             else:
                 # Regular Route - add with full subdomain path and accumulated prefix
@@ -233,7 +286,7 @@ class Future:
                 self._check_route_conflicts(r, full_domain)
 
                 # Pass parent middlewares to maintain hierarchy
-                self._add_route(route=r, subdomain=full_domain, parent_middlewares=route_group.middlewares)
+                self._add_route(route=r, subdomain=full_domain, parent_middlewares=group_middlewares)
 
     def _validate_route_group(self, route_group: RouteGroup) -> None:
         """Validate RouteGroup configuration."""
@@ -267,9 +320,12 @@ class Future:
 
     def _check_route_conflicts(self, route: Route, domain: str) -> None:
         """Check for route conflicts within the same domain."""
-        existing_routes = self.routes.get(domain, {})
-        if route.path in existing_routes:
-            raise ValueError(f"Route conflict detected: {route.path} already exists in domain {domain}")
+        existing_methods = self.routes.get(domain, {}).get(route.path)
+        if existing_methods is None:
+            return
+        for method in route.methods:
+            if method.upper() in existing_methods.handlers:
+                raise ValueError(f"Route conflict detected: {method} {route.path} already exists in domain {domain}")
 
     def _validate_domain_access(self, host_domain: str) -> bool:
         """Validate if the host domain is allowed to access routes."""
@@ -287,6 +343,65 @@ class Future:
 
         return False
 
+    def _normalize_host(self, host: str) -> str:
+        """Lowercase the Host header, strip the port and trailing dot, and fold IDNs to their ASCII form."""
+        host = host.split("/")[0].strip().lower()
+        if host.startswith("["):
+            host = host[: host.find("]") + 1]  # IPv6 literal, e.g. [::1]:8000
+        elif ":" in host:
+            host = host.rsplit(":", 1)[0]
+        host = host.rstrip(".")
+        if not host.isascii():
+            try:
+                host = host.encode("idna").decode("ascii")
+            except UnicodeError:
+                pass
+        return host
+
+    def _resolve_host(self, host: str) -> tuple[bool, Optional[RouteTree | RouteRegex | RouteList]]:
+        """Resolve a raw Host header to (allowed, router), caching the decision per normalized host.
+
+        Keying on the normalized host keeps ports and case variants of one name from filling the cache.
+        """
+        # In domainless mode, always use the empty string key for lookup
+        if getattr(self, "domainless_mode", False):
+            return True, self.routers.get("")
+
+        host_domain = self._normalize_host(host)
+        resolved = self.host_cache.get(host_domain)
+        if resolved is None:
+            if self._validate_domain_access(host_domain):
+                resolved = (True, self.routers.get(host_domain))
+            else:
+                resolved = (False, None)
+            self.host_cache.set(host_domain, resolved)
+        return resolved  # type: ignore[no-any-return]
+
+    def _head_send(self, send: ASGISend) -> ASGISend:
+        """Wrap send so a GET response is answered as HEAD: headers are sent as is, the body is dropped."""
+        start_message: Optional[ASGIMessage] = None
+
+        async def send_head(message: ASGIMessage) -> None:
+            nonlocal start_message
+            if message["type"] == AsgiEventType.HTTP_RESPONSE_START:
+                start_message = message
+                return
+            if message["type"] == AsgiEventType.HTTP_RESPONSE_BODY:
+                more_body = message.get("more_body", False)
+                if start_message is not None:
+                    # Advertise the length the GET body would have had when it is known up front
+                    headers = list(start_message["headers"])
+                    if not more_body and not any(key.lower() == b"content-length" for key, _ in headers):
+                        headers.append([b"content-length", str(len(message.get("body", b""))).encode()])
+                    await send({**start_message, "headers": headers})
+                    start_message = None
+                if more_body:
+                    return
+                message = {"type": AsgiEventType.HTTP_RESPONSE_BODY, "body": b""}
+            await send(message)
+
+        return send_head
+
     def get_performance_stats(self) -> dict[str, Any]:
         """Get performance statistics for the application."""
         return {
@@ -294,7 +409,12 @@ class Future:
             "registered_domains": len(self.registered_domains),
             "max_nesting_depth": self.max_nesting_depth,
             "domain_list": list(self.registered_domains),
-            "memory_usage": {"routes_dict_size": len(self.routes), "total_route_configs": sum(len(configs) for configs in self.routes.values())},
+            "router": self.router,
+            "host_cache": self.host_cache.get_stats(),
+            "memory_usage": {
+                "routes_dict_size": len(self.routes),
+                "total_route_configs": sum(len(methods.handlers) for configs in self.routes.values() for methods in configs.values()),
+            },
         }
 
     async def handle_lifespan_request(self, scope: ASGIScope, receive: ASGIReceive, send: ASGISend) -> None:
@@ -337,121 +457,200 @@ class Future:
         """
 
     async def handle_http_request(self, scope: ASGIScope, receive: ASGIReceive, send: ASGISend) -> None:
-        request = Request(scope, receive)
-        request_path = request.path.encode()
-        host_domain = request.host.split("/")[0] if "/" in request.host else request.host
-        if not self._validate_domain_access(host_domain):
+        request = Request(scope, receive, max_body_size=self.max_body_size)
+        allowed, router = self._resolve_host(request.host)
+        if not allowed:
             response = Response(body="Forbidden", status=403)
             await response(send)
             return
-        # In domainless mode, always use the empty string key for lookup
-        key = "" if getattr(self, "domainless_mode", False) else host_domain
-        domain_routes = self.routes.get(key, {})
-        matched_route = None
-        route_params = None
-        for route_path, route_config in domain_routes.items():
-            route = route_config.get("route", None)
-            if route and hasattr(route, "match"):
-                route_match = route.match(request_path)
-                if route_match:
-                    matched_route = route_config
-                    route_params = route_match.params
-                    break
-            else:
-                if route_path == request.path:
-                    matched_route = route_config
-                    break
-        if not matched_route:
+        route_match = router.match(request.path) if router else None
+        if not route_match:
             response = Response(body="Not Found", status=404)
             await response(send)
             return
-        handler = matched_route["handler"]
-        middleware_levels = matched_route["middleware"]["levels"]
-        for level in middleware_levels:
-            for m in level["before"]:
-                response = await m.intercept(request)  # type: ignore[reportUnknownMemberType]
-                if response is not None:
-                    await response(send)
-                    return
-        if route_params:
-            response = await handler(request, **route_params)
-        else:
-            response = await handler(request)
-        for level in reversed(middleware_levels):
-            for m in level["after"]:
-                modified_response = await m.intercept(request, response)  # type: ignore[reportUnknownMemberType]
-                if modified_response is not None:
-                    response = modified_response
+        route_methods, route_params = route_match
+        matched_route = route_methods.handlers.get(request.method)
+        if matched_route is None:
+            if request.method == "HEAD" and "GET" in route_methods.handlers:
+                # Serve HEAD from the GET handler, only the body is dropped on the way out
+                matched_route = route_methods.handlers["GET"]
+                send = self._head_send(send)
+            elif request.method == "OPTIONS" and route_methods.options is not None:
+                matched_route = route_methods.options
+            elif route_methods.allow:
+                response = Response(body="Method Not Allowed", status=405, headers={"allow": route_methods.allow})
+                await response(send)
+                return
+            else:
+                response = Response(body="Not Found", status=404)
+                await response(send)
+                return
+        request.route = matched_route["route"]
+        try:
+            response = await self._call_route(request, matched_route, route_params)
+        except FutureException as e:
+            response = self.error_handler.handle(request, e)
+            # Browsers only let a page read errors that carry CORS headers, other response middlewares are skipped
+            for entry in matched_route["after"]:
+                if is_cors(entry):
+                    modified_response = entry[0](request, response)
+                    if entry[1]:
+                        modified_response = await modified_response
+                    if modified_response is not None:
+                        response = modified_response
         await response(send)
 
+    async def _call_route(self, request: Request, matched_route: RouteConfig, route_params: dict[str, str]) -> Any:
+        """Run the request middlewares, the handler and the response middlewares of a route.
+
+        A request middleware returning a response skips the handler. When that middleware is a
+        response middleware too (attach_to "both", e.g. a cache hit), its response goes through the
+        response middlewares outside it, as a response from the handler would; otherwise it is
+        returned as is. The request's finalizers run at the end, however the route ended.
+        """
+        try:
+            handler = matched_route["handler"]
+            after = matched_route["after"]
+            resume = 0
+            response = None
+            for entry in matched_route["before"]:
+                intercept, is_async = entry
+                response = intercept(request)
+                if is_async:
+                    response = await response
+                if response is not None:
+                    if entry not in after:
+                        return response
+                    resume = after.index(entry) + 1
+                    break
+            if response is None:
+                if matched_route["coalesce"] is not None:
+                    response = await self._call_coalesced(request, matched_route, route_params)
+                elif route_params:
+                    response = await handler(request, **route_params)
+                else:
+                    response = await handler(request)
+                if isinstance(response, CachedResponse):
+                    # Frozen responses are shared (module level, or by coalesced requests), each request gets a copy
+                    response = response.copy()
+            if after:
+                for intercept, is_async in after[resume:] if resume else after:
+                    modified_response = intercept(request, response)
+                    if is_async:
+                        modified_response = await modified_response
+                    if modified_response is not None:
+                        response = modified_response
+            return response
+        finally:
+            if request.finalizers:
+                for finalizer in request.finalizers:
+                    finalizer(request)
+
+    async def _call_coalesced(self, request: Request, matched_route: RouteConfig, route_params: dict[str, str]) -> Any:
+        """Call the handler once for identical concurrent requests and share its response.
+
+        Requests are identical when they have the same handler, method (HEAD counts as GET), host,
+        path, query string and values of the route's coalesce headers. Requests carrying an
+        Authorization or Cookie header may get a response meant for that user alone, so they call
+        the handler themselves unless the route lists the header. Request and response
+        middlewares still run for every request. The shared call runs in its own task that the
+        requests await through a shield, so a client disconnecting doesn't cancel it for the others.
+        """
+        handler = matched_route["handler"]
+        coalesce = matched_route["coalesce"] or ()
+        for header in ("authorization", "cookie"):
+            if header in request.headers and header not in coalesce:
+                return await handler(request, **route_params)
+        key = (
+            handler,
+            "GET" if request.method == "HEAD" else request.method,
+            request.host,
+            request.path,
+            request.scope.get("query_string", b""),
+            *(request.headers.get(header) for header in coalesce),
+        )
+        task = self.inflight.get(key)
+        leader = task is None
+        if task is None:
+            task = asyncio.ensure_future(self._call_shared(handler, request, route_params))
+            self.inflight[key] = task
+            task.add_done_callback(functools.partial(self._release_coalesced, key))
+        response = await asyncio.shield(task)
+        # Frozen responses are copied for each request by _call_route
+        if leader or isinstance(response, CachedResponse) or not isinstance(response, Response):
+            return response
+        # Streamed responses can only be sent once, so this request runs the handler itself
+        return await handler(request, **route_params)
+
+    async def _call_shared(self, handler: Callable[..., Any], request: Request, route_params: dict[str, str]) -> Any:
+        response = await handler(request, **route_params)
+        # Buffered responses are frozen, so each request can be handed a cheap copy of it
+        if type(response).__call__ is Response.__call__:
+            return response.freeze()
+        return response
+
+    def _release_coalesced(self, key: tuple[Any, ...], task: "asyncio.Task[Any]") -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark it retrieved even if every request awaiting it went away
+
     async def handle_websocket_request(self, scope: ASGIScope, receive: ASGIReceive, send: ASGISend) -> None:
         """Handle WebSocket requests following the same pattern as HTTP requests."""
-        request_path = scope["path"].encode()
-        host_domain = ""
-
         # Extract host from headers
-        headers = dict(scope.get("headers", []))
-        host_header = headers.get(b"host", b"").decode()
-        if host_header:
-            host_domain = host_header.split("/")[0] if "/" in host_header else host_header
+        host_header = Headers(scope.get("headers", [])).get("host", "")
 
-        if not self._validate_domain_access(host_domain):
+        allowed, router = self._resolve_host(host_header)
+        if not allowed:
             await send({"type": "websocket.close", "code": 1008, "reason": "Forbidden"})
             return
 
-        # In domainless mode, always use the empty string key for lookup
-        key = "" if getattr(self, "domainless_mode", False) else host_domain
-        domain_routes = self.routes.get(key, {})
-        matched_route = None
-        route_params = None
-
-        for route_path, route_config in domain_routes.items():
-            route = route_config.get("route", None)
-            if route and hasattr(route, "match"):
-                route_match = route.match(request_path)
-                if route_match:
-                    matched_route = route_config
-                    route_params = route_match.params
-                    break
-            else:
-                if route_path == scope["path"]:
-                    matched_route = route_config
-                    break
-
-        if not matched_route:
+        route_match = router.match(scope["path"]) if router else None
+        matched_route = route_match[0].handlers.get("WEBSOCKET") if route_match else None
+        if not route_match or not matched_route:
             await send({"type": "websocket.close", "code": 1008, "reason": "Not Found"})
             return
 
+        route_params = route_match[1]
         handler = matched_route["handler"]
-        middleware_levels = matched_route["middleware"]["levels"]
 
-        # Create a mock request for middleware compatibility
-        request = Request(scope, receive)
+        # The connection is the handler's request, middlewares see it as one
+        websocket = WebSocketConnection(scope, receive, send, send_queue_size=self.websocket_queue_size, close_timeout=self.websocket_close_timeout)
+        websocket.route = matched_route["route"]
 
-        # Run request middleware
-        for level in middleware_levels:
-            for m in level["before"]:
-                response = await m.intercept(request)  # type: ignore[reportUnknownMemberType]
+        try:
+            # Run request middleware, a response rejects the connection
+            for intercept, is_async in matched_route["before"]:
+                response = intercept(websocket)
+                if is_async:
+                    response = await response
                 if response is not None:
-                    # Middleware decided to close the connection
-                    await send({"type": "websocket.close", "code": 1008, "reason": "Middleware rejected"})
+                    await websocket.close(1008, "Middleware rejected")
                     return
 
-        # Call the WebSocket handler to get the response
-        if route_params:
-            response = await handler(request, **route_params)
-        else:
-            response = await handler(request)
-
-        # Run after middleware (same as HTTP)
-        for level in reversed(middleware_levels):
-            for m in level["after"]:
-                modified_response = await m.intercept(request, response)  # type: ignore[reportUnknownMemberType]
-                if modified_response is not None:
-                    response = modified_response
-
-        # Send the WebSocket response (same pattern as HTTP)
-        await response(send)
+            if route_params:
+                response = await handler(websocket, **route_params)
+            else:
+                response = await handler(websocket)
+
+            if response is not None:
+                # Handlers may still return a response that drives the socket itself, e.g. WebSocketResponse
+                for intercept, is_async in matched_route["after"]:
+                    modified_response = intercept(websocket, response)
+                    if is_async:
+                        modified_response = await modified_response
+                    if modified_response is not None:
+                        response = modified_response
+                await response(send)
+        except FutureException as e:
+            await websocket.close(1008, e.message)
+        except WebSocketDisconnect:
+            pass
+        except Exception:
+            await websocket.close(1011, "Internal Server Error")
+            raise
+        finally:
+            await websocket.cleanup()
 
     async def __call__(self, scope: ASGIScope, receive: ASGIReceive, send: ASGISend) -> None:
         # Inject ourselves into the chain for later convenience
@@ -2,6 +2,62 @@
 Base authentication interface.
 """
 
+import base64
+import binascii
+import hashlib
+import hmac
+import time
+
+from collections.abc import Sequence
+from typing import Any, Union
+
+from future.exceptions import UnauthorizedException
+from future.serialization import json_loads
+
+
+JWT_ALGORITHMS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def decode_jwt(token: str, secret: Union[str, bytes], algorithms: Sequence[str] = ("HS256",), leeway: float = 0) -> dict[str, Any]:
+    """Verify an HMAC signed (HS256, HS384, HS512) JWT and return its claims.
+
+    Raises UnauthorizedException when the token is malformed, signed with another algorithm or key,
+    expired (`exp`) or not yet valid (`nbf`). Use PyJWT or similar for asymmetric algorithms.
+    """
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        header = json_loads(_b64decode(header_segment))
+        signature = _b64decode(signature_segment)
+    except (ValueError, binascii.Error) as e:
+        raise UnauthorizedException("Invalid token") from e
+
+    algorithm = header.get("alg") if isinstance(header, dict) else None
+    if algorithm not in algorithms or algorithm not in JWT_ALGORITHMS:
+        raise UnauthorizedException("Invalid token algorithm")
+
+    key = secret.encode() if isinstance(secret, str) else secret
+    expected = hmac.new(key, f"{header_segment}.{payload_segment}".encode(), JWT_ALGORITHMS[algorithm]).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise UnauthorizedException("Invalid token signature")
+
+    try:
+        claims = json_loads(_b64decode(payload_segment))
+    except (ValueError, binascii.Error) as e:
+        raise UnauthorizedException("Invalid token") from e
+    if not isinstance(claims, dict):
+        raise UnauthorizedException("Invalid token")
+
+    now = time.time()
+    if isinstance(claims.get("exp"), (int, float)) and claims["exp"] <= now - leeway:
+        raise UnauthorizedException("Token expired")
+    if isinstance(claims.get("nbf"), (int, float)) and claims["nbf"] > now + leeway:
+        raise UnauthorizedException("Token not yet valid")
+    return claims
+
 
 class Authentication:
     auth_type: str = ""
@@ -0,0 +1,104 @@
+import time
+
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, Optional
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry once full."""
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self.entries.pop(key, default)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get_stats(self) -> dict[str, int]:
+        return {"size": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class TTLCache:
+    """LRU cache whose entries expire after a TTL and whose total size is bounded.
+
+    Every entry is stored with its size (e.g. a response body length), and least recently used
+    entries are evicted until the sizes add up to at most `max_bytes`. Expired entries are dropped
+    when they are looked up or evicted.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 60.0) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires at, value, size)
+        self.entries: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry[0] <= time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        self.pop(key)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return default
+        self.size -= entry[2]
+        return entry[1]
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_stats(self) -> dict[str, int]:
+        return {"size": len(self.entries), "bytes": self.size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
@@ -292,23 +292,22 @@ def print_routes() -> None:
     app = get_app_from_project()
     routes = getattr(app, "routes", {})
     for domain, domain_routes in routes.items():
-        for path, route_info in domain_routes.items():
-            schema = "ws://" if "ws" in path else "http://"
-            # Remove double slashes
-            full_path = (schema + domain + path).replace("//", "/", 1)
-            # Extract middleware names
-            middleware_levels = route_info.get("middleware", {}).get("levels", [])
-            middleware_names = []
-            for level in middleware_levels:
-                for middleware in level.get("before", []) + level.get("after", []):
-                    if hasattr(middleware, "name"):
-                        middleware_names.append(middleware.name)
-                    else:
-                        middleware_names.append(middleware.__name__)
-            middleware_str = f" ({', '.join(middleware_names)})" if middleware_names else ""
-            # Determine method (GET for HTTP, WEBSOCKET for WebSocket)
-            method = "WEBSOCKET" if "ws" in path else "GET"
-            print(f"{method} {full_path}{middleware_str}")
+        for path, route_methods in domain_routes.items():
+            for method, route_info in route_methods.handlers.items():
+                schema = "ws://" if method == "WEBSOCKET" else "http://"
+                # Remove double slashes
+                full_path = (schema + domain + path).replace("//", "/", 1)
+                # Extract middleware names
+                middleware_levels = route_info.get("middleware", {}).get("levels", [])
+                middleware_names = []
+                for level in middleware_levels:
+                    for middleware in level.get("before", []) + level.get("after", []):
+                        if hasattr(middleware, "name"):
+                            middleware_names.append(middleware.name)
+                        else:
+                            middleware_names.append(middleware.__name__)
+                middleware_str = f" ({', '.join(middleware_names)})" if middleware_names else ""
+                print(f"{method} {full_path}{middleware_str}")
 
 
 def scaffold_project(target_dir: str) -> None:
@@ -3,8 +3,9 @@ from typing import Any
 
 from future.graphql import queries, schema
 from future.requests import Request
-from future.responses import HTMLResponse, JSONResponse, Response, WebSocketResponse
+from future.responses import HTMLResponse, JSONResponse, Response
 from future.settings import API_SPEC
+from future.websockets import WebSocketConnection
 
 
 """
@@ -21,6 +22,19 @@ from future.settings import API_SPEC
 """
 
 
+# Responses that never change are encoded once at import time and replayed for every request
+WELCOME_RESPONSE = Response(body="✨ Welcome to Future! ✨").freeze()
+OPENAPI_RESPONSE = JSONResponse(data=API_SPEC, status=200).freeze()
+SWAGGER_CONFIG_RESPONSE = JSONResponse(
+    data={
+        "apisSorter": "alpha",
+        "operationsSorter": "alpha",
+        "docExpansion": "full",
+    },
+    status=200,
+).freeze()
+
+
 class Controller:
     # __new__ is inherited automatically so we do not have to super.__init__() classes that extend it
     def __new__(cls, *args: Any, **kwargs: Any) -> "Controller":
@@ -72,7 +86,7 @@ class DebugController(Controller):
 
 class WelcomeController(Controller):
     async def root(request: Request) -> Response:  # type: ignore[no-self]
-        return Response(body="✨ Welcome to Future! ✨")
+        return WELCOME_RESPONSE
 
 
 class OpenAPIController(Controller):
@@ -80,7 +94,7 @@ class OpenAPIController(Controller):
 
     async def openapi(request: Request) -> Response:  # type: ignore[no-self]
         """Serve the OpenAPI schema as JSON."""
-        return JSONResponse(data=API_SPEC, status=200)
+        return OPENAPI_RESPONSE
 
     async def redoc(request: Request) -> Response:  # type: ignore[no-self]
         """Serve ReDoc HTML."""
@@ -105,12 +119,7 @@ class OpenAPIController(Controller):
 
     async def swagger_config(request: Request) -> Response:  # type: ignore[no-self]
         """Serve Swagger configuration."""
-        swagger_config = {
-            "apisSorter": "alpha",
-            "operationsSorter": "alpha",
-            "docExpansion": "full",
-        }
-        return JSONResponse(data=swagger_config, status=200)
+        return SWAGGER_CONFIG_RESPONSE
 
     async def swagger(request: Request) -> Response:  # type: ignore[no-self]
         """Serve Swagger UI HTML."""
@@ -162,8 +171,11 @@ class OpenAPIController(Controller):
 class WebSocketController(Controller):
     """Controller for WebSocket endpoints."""
 
-    async def websocket_handler(request: Request, **params: Any) -> WebSocketResponse:  # type: ignore[no-self]
-        """WebSocket handler that returns a WebSocketResponse."""
-        # Get the message from the request (if any)
-        message = params.get("message", "Hello from WebSocket!")
-        return WebSocketResponse(message=message)
+    async def websocket_handler(websocket: WebSocketConnection, **params: Any) -> None:  # type: ignore[no-self]
+        """Echo every message back until the client disconnects."""
+        await websocket.accept()
+        async for message in websocket:
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(f"Echo: {message}")
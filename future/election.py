@@ -0,0 +1,184 @@
+import asyncio
+import os
+import socket
+import tempfile
+import time
+
+from typing import IO, Optional
+
+from future.logger import log
+
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+class LeaseBackend:
+    """Storage for named leases, of which at most one owner holds each at a time.
+
+    `acquire` takes the lease `name` for `owner` for `ttl` seconds if it is free (or expired)
+    and returns whether `owner` holds it now. `renew` extends a lease the owner still holds and
+    returns False when it was lost. `release` gives it up.
+    """
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    async def renew(self, name: str, owner: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    async def release(self, name: str, owner: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryLeaseBackend(LeaseBackend):
+    """Leases in process memory, for tests and for elections between tasks of one process.
+
+    It keeps to the TTL semantics of a shared store such as Redis, so it doubles as a local
+    stand-in when testing code written against one.
+    """
+
+    def __init__(self) -> None:
+        # name: (owner, expires)
+        self.leases: dict[str, tuple[str, float]] = {}
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.monotonic()
+        lease = self.leases.get(name)
+        if lease is not None and lease[0] != owner and lease[1] > now:
+            return False
+        self.leases[name] = (owner, now + ttl)
+        return True
+
+    async def renew(self, name: str, owner: str, ttl: float) -> bool:
+        lease = self.leases.get(name)
+        if lease is None or lease[0] != owner or lease[1] <= time.monotonic():
+            return False
+        self.leases[name] = (owner, time.monotonic() + ttl)
+        return True
+
+    async def release(self, name: str, owner: str) -> None:
+        lease = self.leases.get(name)
+        if lease is not None and lease[0] == owner:
+            del self.leases[name]
+
+
+class FileLeaseBackend(LeaseBackend):
+    """Leases as `flock` locks on files in `directory`, shared by the processes of one host.
+
+    The kernel drops the lock when its holder exits, however it dies, so another worker takes
+    over on its next attempt and the TTL never has to run out. The owner is written into the
+    file for inspection. Opening and locking the file run in the default executor.
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        if fcntl is None:  # pragma: no cover
+            raise RuntimeError("FileLeaseBackend needs fcntl, which is not available on this platform")
+        self.directory = directory or tempfile.gettempdir()
+        # name: (owner, locked file)
+        self.files: dict[str, tuple[str, IO[str]]] = {}
+
+    def _lock(self, name: str, owner: str) -> Optional[IO[str]]:
+        file = open(os.path.join(self.directory, f"{name}.lock"), "a+")
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return None
+        file.truncate(0)
+        file.write(owner)
+        file.flush()
+        return file
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        held = self.files.get(name)
+        if held is not None:
+            return held[0] == owner
+        file = await asyncio.get_running_loop().run_in_executor(None, self._lock, name, owner)
+        if file is None:
+            return False
+        self.files[name] = (owner, file)
+        return True
+
+    async def renew(self, name: str, owner: str, ttl: float) -> bool:
+        held = self.files.get(name)
+        return held is not None and held[0] == owner
+
+    async def release(self, name: str, owner: str) -> None:
+        held = self.files.get(name)
+        if held is not None and held[0] == owner:
+            del self.files[name]
+            fcntl.flock(held[1], fcntl.LOCK_UN)
+            held[1].close()
+
+
+class LeaderElection:
+    """Elect one leader among the workers sharing a lease backend.
+
+    Every worker tries to take the lease `name` every `renew_interval` seconds (a third of `ttl`
+    by default), and the leader renews it as often. The leader steps down as soon as a renewal
+    fails, and `is_leader()` turns False once the lease could have expired without a successful
+    renewal, so a stalled leader never overlaps with its successor.
+    """
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        name: str = "future-scheduler",
+        ttl: float = 15.0,
+        renew_interval: Optional[float] = None,
+        owner: Optional[str] = None,
+    ) -> None:
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval if renew_interval is not None else ttl / 3
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.leader = False
+        self.expires = 0.0
+        self.task: Optional[asyncio.Task[None]] = None
+
+    def is_leader(self) -> bool:
+        return self.leader and time.monotonic() < self.expires
+
+    async def campaign(self) -> bool:
+        """Take or renew the lease once, returns whether this worker leads."""
+        started = time.monotonic()
+        try:
+            if self.leader:
+                held = await self.backend.renew(self.name, self.owner, self.ttl)
+            else:
+                held = await self.backend.acquire(self.name, self.owner, self.ttl)
+        except Exception as e:
+            log.error(f"Leader election '{self.name}' failed: {e}")
+            held = False
+
+        if held:
+            self.expires = started + self.ttl
+            if not self.leader:
+                log.info(f"Elected leader for '{self.name}' as {self.owner}")
+        elif self.leader:
+            log.warning(f"Lost leadership for '{self.name}'")
+        self.leader = held
+        return held
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            await self.campaign()
+
+    async def start(self) -> None:
+        if self.task is None:
+            await self.campaign()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.leader:
+            self.leader = False
+            await self.backend.release(self.name, self.owner)
@@ -1,9 +1,15 @@
+import math
 import traceback
 
-from future.requests import Request
+from typing import TYPE_CHECKING, Optional
+
 from future.responses import JSONResponse, Response
 
 
+if TYPE_CHECKING:
+    from future.requests import Request
+
+
 class FutureException(Exception):
     """Base exception class for Future framework."""
 
@@ -11,6 +17,7 @@ class FutureException(Exception):
         super().__init__(message)
         self.message = message
         self.status_code = status_code
+        self.headers: dict[str, str] = {}  # added to the error response, e.g. Retry-After
         self.traceback = traceback.format_exc()
 
 
@@ -56,6 +63,13 @@ class ConflictException(FutureException):
         super().__init__(message, 409)
 
 
+class PayloadTooLargeException(FutureException):
+    """Exception for request bodies above the configured limit (413 Payload Too Large)."""
+
+    def __init__(self, message: str = "Payload Too Large"):
+        super().__init__(message, 413)
+
+
 class ValidationException(FutureException):
     """Exception for validation errors (422 Unprocessable Entity)."""
 
@@ -66,8 +80,10 @@ class ValidationException(FutureException):
 class RateLimitException(FutureException):
     """Exception for rate limiting errors (429 Too Many Requests)."""
 
-    def __init__(self, message: str = "Too Many Requests"):
+    def __init__(self, message: str = "Too Many Requests", retry_after: Optional[float] = None):
         super().__init__(message, 429)
+        if retry_after is not None:
+            self.headers["Retry-After"] = str(math.ceil(retry_after))
 
 
 class InternalServerException(FutureException):
@@ -87,17 +103,21 @@ class ServiceUnavailableException(FutureException):
 class ErrorHandler:
     """Base error handler for the Future framework."""
 
-    def handle(self, request: Request, exception: Exception) -> Response:
+    def handle(self, request: "Request", exception: Exception) -> Response:
         """Handle an exception and return an appropriate response."""
         if isinstance(exception, FutureException):
             return self._handle_future_exception(request, exception)
         else:
             return self._handle_generic_exception(request, exception)
 
-    def _handle_future_exception(self, request: Request, exception: FutureException) -> Response:
+    def _handle_future_exception(self, request: "Request", exception: FutureException) -> Response:
         """Handle Future framework exceptions."""
-        return JSONResponse(data={"error": exception.message, "status_code": exception.status_code, "path": request.path}, status=exception.status_code)
+        return JSONResponse(
+            data={"error": exception.message, "status_code": exception.status_code, "path": request.path},
+            status=exception.status_code,
+            headers=exception.headers or None,
+        )
 
-    def _handle_generic_exception(self, request: Request, exception: Exception) -> Response:
+    def _handle_generic_exception(self, request: "Request", exception: Exception) -> Response:
         """Handle generic exceptions."""
         return JSONResponse(data={"error": "Internal Server Error", "status_code": 500, "path": request.path}, status=500)
@@ -0,0 +1,185 @@
+import os
+
+from collections import deque
+from typing import Any
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, create_engine, delete, insert, select, update
+
+from future.logger import log
+from future.serialization import json_dumps, json_loads
+from future.types import RunRecord, TaskState
+
+
+class JobStore:
+    """Persistent state and run history of scheduled tasks.
+
+    The scheduler calls these methods from a dedicated thread, one at a time, so they may block.
+    `load` returns the saved state of every task, `write` saves a batch of task states and run
+    records, and `history` returns the latest runs of a task, newest first.
+    """
+
+    def load(self) -> dict[str, TaskState]:
+        raise NotImplementedError
+
+    def write(self, states: dict[str, TaskState], runs: list[RunRecord]) -> None:
+        raise NotImplementedError
+
+    def history(self, name: str, limit: int = 20) -> list[RunRecord]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLJobStore(JobStore):
+    """Task state and run history in a database through SQLAlchemy, SQLite by default.
+
+    The tables are created on first load. Only the last `history` runs of each task are kept.
+    """
+
+    def __init__(self, url: str = "sqlite:///future-jobs.db", history: int = 100, **engine_options: Any) -> None:
+        self.engine = create_engine(url, **engine_options)  # Connects lazily
+        self.history_size = history
+        metadata = MetaData()
+        self.metadata = metadata
+        self.tasks = Table(
+            "scheduler_tasks",
+            metadata,
+            Column("name", String(255), primary_key=True),
+            Column("last_run", Float),
+            Column("next_run", Float),
+        )
+        self.runs = Table(
+            "scheduler_runs",
+            metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("task", String(255), nullable=False, index=True),
+            Column("started", Float, nullable=False),
+            Column("duration", Float, nullable=False),
+            Column("outcome", String(16), nullable=False),
+            Column("error", Text),
+        )
+
+    def load(self) -> dict[str, TaskState]:
+        self.metadata.create_all(self.engine)
+        with self.engine.connect() as connection:
+            rows = connection.execute(select(self.tasks)).all()
+        return {row.name: TaskState(last_run=row.last_run, next_run=row.next_run) for row in rows}
+
+    def write(self, states: dict[str, TaskState], runs: list[RunRecord]) -> None:
+        with self.engine.begin() as connection:
+            for name, state in states.items():
+                result = connection.execute(update(self.tasks).where(self.tasks.c.name == name).values(**state))
+                if result.rowcount == 0:
+                    connection.execute(insert(self.tasks).values(name=name, **state))
+            if runs:
+                connection.execute(insert(self.runs), list(runs))
+                for name in {run["task"] for run in runs}:
+                    # Drop runs beyond the newest `history` of the task
+                    cutoff = connection.execute(
+                        select(self.runs.c.id).where(self.runs.c.task == name).order_by(self.runs.c.id.desc()).offset(self.history_size).limit(1)
+                    ).scalar()
+                    if cutoff is not None:
+                        connection.execute(delete(self.runs).where(self.runs.c.task == name, self.runs.c.id <= cutoff))
+
+    def history(self, name: str, limit: int = 20) -> list[RunRecord]:
+        query = select(self.runs).where(self.runs.c.task == name).order_by(self.runs.c.id.desc()).limit(limit)
+        with self.engine.connect() as connection:
+            rows = connection.execute(query).all()
+        return [RunRecord(task=row.task, started=row.started, duration=row.duration, outcome=row.outcome, error=row.error) for row in rows]
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+class FileJobStore(JobStore):
+    """Task state and run history appended as JSON lines to the file at `path`.
+
+    Writes only ever append, so a crash loses at most the batch being written, and a torn last
+    line is skipped when loading and cut off before the next append. Once the file holds `compact_after` lines more than its live
+    content, it is rewritten with just the current states and the last `history` runs per task.
+    """
+
+    def __init__(self, path: str = "future-jobs.jsonl", history: int = 100, compact_after: int = 10000) -> None:
+        self.path = path
+        self.history_size = history
+        self.compact_after = compact_after
+        self.states: dict[str, TaskState] = {}
+        self.runs: dict[str, deque[RunRecord]] = {}
+        self.lines = 0
+        # Offset just past the last complete line, where the next batch is appended
+        self.end = 0
+        self.loaded = False
+
+    def _apply(self, record: dict[str, Any]) -> None:
+        if record.get("type") == "state":
+            self.states[record["name"]] = TaskState(last_run=record["last_run"], next_run=record["next_run"])
+        elif record.get("type") == "run":
+            run = RunRecord(task=record["task"], started=record["started"], duration=record["duration"], outcome=record["outcome"], error=record["error"])
+            self.runs.setdefault(run["task"], deque(maxlen=self.history_size)).append(run)
+
+    def load(self) -> dict[str, TaskState]:
+        self.states, self.runs, self.lines, self.end = {}, {}, 0, 0
+        try:
+            with open(self.path, "rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        log.warning(f"Skipping torn last line of job store {self.path}")
+                        break
+                    self.lines += 1
+                    self.end += len(line)
+                    try:
+                        self._apply(json_loads(line))
+                    except Exception:
+                        log.warning(f"Skipping unreadable line {self.lines} of job store {self.path}")
+        except FileNotFoundError:
+            pass
+        self.loaded = True
+        return dict(self.states)
+
+    def _encode(self, states: dict[str, TaskState], runs: list[RunRecord]) -> bytes:
+        lines = [json_dumps({"type": "state", "name": name, **state}) for name, state in states.items()]
+        lines += [json_dumps({"type": "run", **run}) for run in runs]
+        return b"".join(line + b"\n" for line in lines)
+
+    def write(self, states: dict[str, TaskState], runs: list[RunRecord]) -> None:
+        if not self.loaded:
+            self.load()
+        data = self._encode(states, runs)
+        try:
+            with open(self.path, "ab") as file:
+                if file.tell() > self.end:
+                    file.truncate(self.end)
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            # Part of the batch may have reached the file, find the end again on the next write
+            self.loaded = False
+            raise
+        self.end += len(data)
+        self.lines += len(states) + len(runs)
+        self.states.update(states)
+        for run in runs:
+            self.runs.setdefault(run["task"], deque(maxlen=self.history_size)).append(run)
+
+        if self.lines > self.compact_after + len(self.states) + sum(len(runs) for runs in self.runs.values()):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the file with only its live content, atomically replacing the old one."""
+        runs = [run for task_runs in self.runs.values() for run in task_runs]
+        temporary = f"{self.path}.tmp"
+        data = self._encode(self.states, runs)
+        with open(temporary, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.lines = len(self.states) + len(runs)
+        self.end = len(data)
+
+    def history(self, name: str, limit: int = 20) -> list[RunRecord]:
+        if not self.loaded:
+            self.load()
+        return list(reversed(self.runs.get(name, ())))[:limit]
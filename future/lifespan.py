@@ -2,6 +2,8 @@ import asyncio
 
 from typing import Any
 
+from future.election import LeaderElection
+from future.jobstore import JobStore
 from future.logger import log
 from future.scheduler import CronScheduler, Task
 
@@ -9,12 +11,19 @@ from future.scheduler import CronScheduler, Task
 class Lifespan:
     """Application lifespan manager with integrated cron scheduler."""
 
-    def __init__(self, startup_tasks: list[Task] | None = None, shutdown_tasks: list[Task] | None = None, cron_tasks: list[Task] | None = None) -> None:
+    def __init__(
+        self,
+        startup_tasks: list[Task] | None = None,
+        shutdown_tasks: list[Task] | None = None,
+        cron_tasks: list[Task] | None = None,
+        election: LeaderElection | None = None,
+        store: JobStore | None = None,
+    ) -> None:
         self.app = None
         self.startup_tasks = startup_tasks or []
         self.shutdown_tasks = shutdown_tasks or []
         self.cron_tasks = cron_tasks or []
-        self.scheduler = CronScheduler()
+        self.scheduler = CronScheduler(election=election, store=store)
         self.db = None
         self.s3_client = None
         self.redis_client = None
@@ -1,9 +1,31 @@
+import asyncio
+import functools
+import hashlib
 import random
+import re
+import time
+import zlib
 
-from typing import Optional
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional, Union
 
+from future.authentication import decode_jwt
+from future.cache import LRUCache, TTLCache
+from future.exceptions import ForbiddenException, FutureException, RateLimitException, UnauthorizedException
 from future.requests import Request
-from future.responses import EmptyResponse, Response
+from future.responses import CachedResponse, EmptyResponse, NotModifiedResponse, PlainTextResponse, Response, is_not_modified
+
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
 
 
 # CSRF: https://github.com/simonw/asgi-csrf
@@ -19,7 +41,7 @@ class Middleware:
     name: Optional[str] = None
     apply: bool = True
     priority: int = 0
-    attach_to: str = "request"
+    attach_to: str = "request"  # "request", "response" or "both" (called with response=None first)
 
     def intercept(request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[reportAttributeAccessIssue,reportSelfClsParameterName]
         """Intercept the request/response.
@@ -141,8 +163,173 @@ class ResponseCodeConfuser(Middleware):
         return None
 
 
+class RateLimitBackend:
+    """Storage for token buckets.
+
+    `acquire` takes `cost` tokens from the bucket of `key`, which holds up to `capacity` tokens
+    and refills at `rate` tokens per second. It returns 0 when the tokens were taken, otherwise
+    the number of seconds until enough tokens are available. It may be sync or async.
+    """
+
+    def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Union[float, Awaitable[float]]:
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Token buckets in process memory, private to each worker.
+
+    Buckets are refilled lazily when a key is seen again, so idle keys cost nothing until the
+    eviction sweep drops them. The keys are spread over `shards` dicts and the sweep visits one
+    shard at a time, so it never walks every key in one go. All of it runs on the event loop
+    without awaiting, so no locks are needed.
+    """
+
+    def __init__(self, shards: int = 16, idle_timeout: float = 300.0, eviction_interval: float = 60.0) -> None:
+        # bucket: [tokens, last update]
+        self.shards: list[dict[str, list[float]]] = [{} for _ in range(shards)]
+        self.idle_timeout = idle_timeout
+        # A full sweep over all shards takes eviction_interval seconds
+        self.eviction_step = eviction_interval / shards
+        self.next_eviction = time.monotonic() + self.eviction_step
+        self.eviction_shard = 0
+
+    def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        if now >= self.next_eviction:
+            self.evict(now)
+
+        shard = self.shards[hash(key) % len(self.shards)]
+        bucket = shard.get(key)
+        if bucket is None:
+            tokens = capacity
+            bucket = shard[key] = [tokens, now]
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return 0.0
+        bucket[0] = tokens
+        return (cost - tokens) / rate
+
+    def evict(self, now: float) -> None:
+        """Drop the buckets of one shard that have been idle for longer than idle_timeout."""
+        shard = self.shards[self.eviction_shard]
+        cutoff = now - self.idle_timeout
+        for key in [key for key, bucket in shard.items() if bucket[1] < cutoff]:
+            del shard[key]
+        self.eviction_shard = (self.eviction_shard + 1) % len(self.shards)
+        self.next_eviction = now + self.eviction_step
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Token buckets in Redis (or any server speaking its protocol and Lua), shared by all workers.
+
+    `client` is an async client with an `eval` method, such as `redis.asyncio.Redis`. Each bucket
+    is updated atomically by a Lua script using the server's clock, and expires once it would
+    have refilled completely.
+    """
+
+    script = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + (now - tonumber(bucket[2])) * rate)
+end
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+    def __init__(self, client: Any, prefix: str = "ratelimit:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        # Lua numbers are truncated to integers on return, hence the string
+        return float(await self.client.eval(self.script, 1, self.prefix + key, rate, capacity, cost))
+
+
 class RateLimitMiddleware(Middleware):
-    pass
+    """Token bucket rate limiting, answering 429 with Retry-After once a client's bucket is empty.
+
+    Clients are identified by `key_by`: "ip" (the connection's address), "header" (the value of
+    `header`, e.g. an API key) or "user" (`request.context[context_key]`, set by an earlier
+    middleware), falling back to the IP when the header or user is missing. Each client may burst
+    up to `capacity` requests, refilled at `rate` requests per second.
+
+    Middlewares run in ascending `priority`, so with key_by="user" the limiter takes a priority
+    above ScopeValidationMiddleware's and runs after it on the same route or group.
+    """
+
+    name = "rateLimit"
+    attach_to = "request"
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        capacity: Optional[float] = None,
+        key_by: str = "ip",
+        header: str = "x-api-key",
+        context_key: str = "user_id",
+        backend: Optional[RateLimitBackend] = None,
+    ) -> None:
+        if key_by not in ("ip", "header", "user"):
+            raise ValueError(f"Invalid rate limit key: {key_by}. Must be one of: ip, header, user")
+        if rate <= 0:
+            raise ValueError("Rate limit rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.key_by = key_by
+        self.header = header.lower()
+        self.context_key = context_key
+        if key_by == "user":
+            self.priority = ScopeValidationMiddleware.priority + 10
+        self.backend = backend or MemoryRateLimitBackend()
+        # Pick the sync or async intercept once, so the memory backend never goes through a coroutine
+        if asyncio.iscoroutinefunction(self.backend.acquire):
+            self.intercept = self.intercept_async  # type: ignore[method-assign,assignment]
+
+    def key(self, request: Request) -> str:
+        if self.key_by == "header":
+            value: Optional[str] = request.headers.get(self.header)
+            if value:
+                return "header:" + value
+        elif self.key_by == "user":
+            user_id = request.context.get(self.context_key)
+            if user_id is not None:
+                return f"user:{user_id}"
+        client = request.scope.get("client")
+        return "ip:" + (client[0] if client else "")
+
+    def intercept(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[override]
+        retry_after: Any = self.backend.acquire(self.key(request), self.rate, self.capacity)
+        if retry_after:
+            raise RateLimitException(retry_after=retry_after)
+        return None
+
+    async def intercept_async(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:
+        retry_after = await self.backend.acquire(self.key(request), self.rate, self.capacity)  # type: ignore[misc]
+        if retry_after:
+            raise RateLimitException(retry_after=retry_after)
+        return None
 
 
 class CSRFMiddleware(Middleware):
@@ -171,80 +358,636 @@ class HeaderConfuser(Middleware):
     pass
 
 
-class GZipMiddleware(Middleware):
-    # from starlette.applications import Starlette
-    # from starlette.middleware import Middleware
-    # from starlette.middleware.gzip import GZipMiddleware
+class CompressedResponse(Response):
+    """Wraps a response and compresses its body messages on the way out.
+
+    The wrapped response runs unchanged; the start message is held back until the first body
+    message, so small, already encoded or incompressible responses can still be passed through.
+    Multi-chunk (more_body) output is fed through one incremental encoder per response.
+    """
+
+    def __init__(self, response: Response, middleware: "CompressionMiddleware", encoding: str) -> None:
+        self.response = response
+        self.middleware = middleware
+        self.encoding = encoding
+        self.status = response.status
+        self.headers = response.headers
+        self.context = response.context
+
+    async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        middleware = self.middleware
+        start: Optional[dict[str, Any]] = None
+        encoder: Optional[Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message: dict[str, Any]) -> None:
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                if middleware.should_compress(message["status"], message["headers"]):
+                    start = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                # e.g. http.response.zerocopysend, which can't be compressed
+                passthrough = True
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                if not more_body and len(body) < middleware.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                encoder = middleware.encoder(self.encoding)
+                headers = [header for header in start["headers"] if header[0].lower() not in (b"content-length", b"vary")]
+                vary = b", ".join(value for key, value in start["headers"] if key.lower() == b"vary")
+                headers.append([b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"])
+                headers.append([b"content-encoding", self.encoding.encode()])
+
+                if not more_body:
+                    body = await middleware.run(encoder, body, finish=True)
+                    headers.append([b"content-length", str(len(body)).encode()])
+                    await send({**start, "headers": headers})
+                    start = None
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                await send({**start, "headers": headers})
+                start = None
+
+            if encoder is None:
+                return
+
+            body = await middleware.run(encoder, body, finish=not more_body)
+            # Encoders buffer internally, only send intermediate chunks that produced output
+            if body or not more_body:
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.response(send_compressed)
+
+
+class CompressionMiddleware(Middleware):
+    """Compresses response bodies with zstd, brotli or gzip, negotiated from Accept-Encoding.
+
+    Configured per instance, e.g. ``middlewares=[CompressionMiddleware(minimum_size=1000)]``.
+    Brotli and zstd are offered only when the ``brotli`` and ``zstandard`` packages are installed.
+    Compression at a level of ``offload_level`` or above, or of a chunk of ``offload_size`` bytes
+    or more, runs in the thread pool so it doesn't block the event loop.
+    """
+
+    name = "compression"
+    attach_to = "response"
+
+    default_levels: dict[str, int] = {"zstd": 3, "br": 4, "gzip": 6}
+    offload_levels: dict[str, int] = {"zstd": 10, "br": 8, "gzip": 8}
+    # Content that is already compressed (or must not be buffered by an encoder)
+    excluded_content_types: tuple[bytes, ...] = (
+        b"image/",
+        b"video/",
+        b"audio/",
+        b"font/woff",
+        b"application/zip",
+        b"application/gzip",
+        b"application/x-gzip",
+        b"application/zstd",
+        b"application/x-bzip2",
+        b"application/x-7z-compressed",
+        b"application/x-rar-compressed",
+        b"application/pdf",
+        b"text/event-stream",
+    )
+    included_content_types: tuple[bytes, ...] = (b"image/svg+xml",)
+
+    def __init__(
+        self,
+        minimum_size: int = 500,
+        encodings: Sequence[str] = ("zstd", "br", "gzip"),
+        levels: Optional[dict[str, int]] = None,
+        offload_size: int = 1024 * 1024,
+    ) -> None:
+        unknown = set(encodings) - set(self.default_levels)
+        if unknown:
+            raise ValueError(f"Unsupported compression encodings: {', '.join(sorted(unknown))}")
+        self.minimum_size = minimum_size
+        # Keep the preference order, dropping encodings whose library isn't installed
+        available = {"zstd": zstandard is not None, "br": brotli is not None, "gzip": True}
+        self.encodings = tuple(encoding for encoding in encodings if available[encoding])
+        self.levels = {**self.default_levels, **(levels or {})}
+        self.offload_size = offload_size
+        self.negotiated = LRUCache(256)
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        """Pick the encoding with the highest q-value, ties going to the server's preference order."""
+        cached: Optional[str] = self.negotiated.get(accept_encoding, False)
+        if cached is not False:
+            return cached
+
+        qualities: dict[str, float] = {}
+        for part in accept_encoding.lower().split(","):
+            coding, _, params = part.partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            qualities[coding.strip()] = quality
+
+        wildcard = qualities.get("*", 0.0)
+        best: Optional[str] = None
+        best_quality = 0.0
+        for encoding in self.encodings:
+            quality = qualities.get(encoding, wildcard)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+
+        self.negotiated.set(accept_encoding, best)
+        return best
+
+    def should_compress(self, status: int, headers: list[list[bytes]]) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        for key, value in headers:
+            key = key.lower()
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value.lower()
+                if content_type.startswith(self.included_content_types):
+                    continue
+                if content_type.startswith(self.excluded_content_types):
+                    return False
+        return True
+
+    def encoder(self, encoding: str) -> "Encoder":
+        level = self.levels[encoding]
+        offload = level >= self.offload_levels[encoding]
+        if encoding == "zstd":
+            compressobj = zstandard.ZstdCompressor(level=level).compressobj()
+            return Encoder(compressobj.compress, compressobj.flush, offload)
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=level)
+            return Encoder(compressor.process, compressor.finish, offload)
+        compressobj = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        return Encoder(compressobj.compress, compressobj.flush, offload)
+
+    async def run(self, encoder: "Encoder", data: bytes, finish: bool = False) -> bytes:
+        if encoder.offload or len(data) >= self.offload_size:
+            return await asyncio.get_running_loop().run_in_executor(None, encoder, data, finish)
+        return encoder(data, finish)
+
+    def intercept(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[override]
+        if response is None or isinstance(response, CompressedResponse):
+            return None
+        accept_encoding = request.headers.get("accept-encoding")
+        if not accept_encoding:
+            return None
+        encoding = self.negotiate(accept_encoding)
+        if encoding is None:
+            return None
+        # Wrap rather than modify, the response may be a shared CachedResponse
+        return CompressedResponse(response, self, encoding)
+
+
+class Encoder:
+    """An incremental encoder: feed it chunks, pass finish=True with the last one."""
 
-    # routes = ...
+    __slots__ = ("compress", "flush", "offload")
 
-    # middleware = [
-    #    Middleware(GZipMiddleware, minimum_size=1000)
-    # ]
+    def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes], offload: bool) -> None:
+        self.compress = compress
+        self.flush = flush
+        self.offload = offload
 
-    # app = Starlette(routes=routes, middleware=middleware)
-    pass
+    def __call__(self, data: bytes, finish: bool = False) -> bytes:
+        output = self.compress(data) if data else b""
+        if finish:
+            output += self.flush()
+        return output
+
+
+class GZipMiddleware(CompressionMiddleware):
+    """CompressionMiddleware restricted to gzip, which every client supports."""
+
+    name = "gzip"
+
+    def __init__(self, minimum_size: int = 500, compresslevel: int = 6, offload_size: int = 1024 * 1024) -> None:
+        super().__init__(minimum_size=minimum_size, encodings=("gzip",), levels={"gzip": compresslevel}, offload_size=offload_size)
+
+
+class ExtraHeadersResponse(Response):
+    """Wraps a response and adds headers to its start message, leaving the response itself untouched."""
+
+    def __init__(self, response: Response, headers: list[list[bytes]]) -> None:
+        self.response = response
+        self.extra_headers = headers
+        self.status = response.status
+        self.headers = response.headers
+        self.context = response.context
+
+    async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        async def send_with_headers(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message["headers"], *self.extra_headers]}
+            await send(message)
+
+        await self.response(send_with_headers)
 
 
 class CORSMiddleware(Middleware):
-    # from starlette.applications import Starlette
-    # from starlette.middleware import Middleware
-    # from starlette.middleware.cors import CORSMiddleware
-
-    # middleware = [
-    #    Middleware(CORSMiddleware, allow_origins=['*'])
-    # ]
-
-    # app = Starlette(routes=routes, middleware=middleware)
-
-    CORS: dict[str, str] = {
-        "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Credentials": "true",
-        "Access-Control-Allow-Headers": ("origin, content-type, accept, authorization, x-xsrf-token, x-request-id"),
-    }
-    pass
+    """Cross-Origin Resource Sharing.
+
+    Configured per instance, e.g. ``CORSMiddleware(allow_origins=["https://app.example.com"])``.
+    The allowed origins are compiled once into a set (plus `allow_origin_regex`) and the header
+    blocks are built once per origin. Preflight requests are answered from a frozen response in
+    the request phase, before the route handler; actual requests get the CORS headers added to
+    their response. `max_age` lets browsers cache a preflight for that many seconds.
+    """
+
+    name = "cors"
+    attach_to = "both"
+
+    def __init__(
+        self,
+        allow_origins: Sequence[str] = ("*",),
+        allow_origin_regex: Optional[str] = None,
+        allow_methods: Sequence[str] = ("GET", "POST", "OPTIONS"),
+        allow_headers: Sequence[str] = ("origin", "content-type", "accept", "authorization", "x-xsrf-token", "x-request-id"),
+        allow_credentials: bool = False,
+        expose_headers: Sequence[str] = (),
+        max_age: int = 600,
+    ) -> None:
+        self.allow_all_origins = "*" in allow_origins
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_origin_regex = re.compile(allow_origin_regex) if allow_origin_regex else None
+        self.allow_all_methods = "*" in allow_methods
+        self.allow_methods = frozenset(method.upper() for method in allow_methods)
+        self.allow_all_headers = "*" in allow_headers
+        self.allow_headers = frozenset(header.lower() for header in allow_headers)
+        self.allow_credentials = allow_credentials
+
+        # Origin "*" can only be sent literally when credentials aren't allowed, otherwise it's echoed
+        self.wildcard = self.allow_all_origins and not allow_credentials
+        common: list[list[bytes]] = []
+        if allow_credentials:
+            common.append([b"access-control-allow-credentials", b"true"])
+        self.simple_headers = list(common)
+        if expose_headers:
+            self.simple_headers.append([b"access-control-expose-headers", ", ".join(expose_headers).encode()])
+
+        methods = "DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT" if self.allow_all_methods else ", ".join(allow_methods)
+        self.preflight_headers = [
+            *common,
+            [b"access-control-allow-methods", methods.encode()],
+            [b"access-control-max-age", str(max_age).encode()],
+        ]
+        if not self.allow_all_headers:
+            self.preflight_headers.append([b"access-control-allow-headers", ", ".join(sorted(self.allow_headers)).encode()])
+
+        # origin -> (simple request headers, frozen preflight response), None for disallowed origins
+        self.origins = LRUCache(1024)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        if self.allow_all_origins or origin in self.allow_origins:
+            return True
+        return self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(origin) is not None
+
+    def for_origin(self, origin: str) -> Optional[tuple[list[list[bytes]], CachedResponse]]:
+        """The header block and preflight response for an origin, built on first use."""
+        compiled: Optional[tuple[list[list[bytes]], CachedResponse]] = self.origins.get(origin, False)
+        if compiled is not False:
+            return compiled
+
+        compiled = None
+        if self.is_allowed_origin(origin):
+            if self.wildcard:
+                origin_headers = [[b"access-control-allow-origin", b"*"]]
+            else:
+                origin_headers = [[b"access-control-allow-origin", origin.encode("latin-1")], [b"vary", b"Origin"]]
+            preflight = EmptyResponse(status=204)
+            preflight.headers = [*origin_headers, *self.preflight_headers]
+            compiled = ([*origin_headers, *self.simple_headers], preflight.freeze())
+        self.origins.set(origin, compiled)
+        return compiled
+
+    def preflight(self, request: Request, origin: str) -> Response:
+        compiled = self.for_origin(origin)
+        if compiled is None:
+            return PlainTextResponse("Disallowed CORS origin", status=400)
+
+        method = request.headers.get("access-control-request-method", "").upper()
+        if not self.allow_all_methods and method not in self.allow_methods:
+            return PlainTextResponse("Disallowed CORS method", status=400)
+
+        requested_headers = request.headers.get("access-control-request-headers")
+        if not requested_headers:
+            return compiled[1]
+        if self.allow_all_headers:
+            # Echo the requested headers, which can't be precomputed
+            response = EmptyResponse(status=204)
+            response.headers = [*compiled[1].headers, [b"access-control-allow-headers", requested_headers.encode("latin-1")]]
+            return response
+        if any(header.strip().lower() not in self.allow_headers for header in requested_headers.split(",")):
+            return PlainTextResponse("Disallowed CORS headers", status=400)
+        return compiled[1]
+
+    def intercept(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[override]
+        origin: Optional[str] = request.headers.get("origin")
+        if origin is None:
+            return None
+
+        if response is None:
+            # Request phase: only preflights are answered here
+            if request.method == "OPTIONS" and "access-control-request-method" in request.headers:
+                return self.preflight(request, origin)
+            return None
+
+        compiled = self.for_origin(origin)
+        if compiled is None:
+            return None
+        return ExtraHeadersResponse(response, compiled[0])
 
 
 class ScopeValidationMiddleware(Middleware):
+    """Requires a bearer token carrying every scope listed in the matched route's `scopes`.
+
+    Configured per instance with an HMAC `secret` (see decode_jwt), or a `verify` function that
+    takes the token and returns its claims, e.g. one wrapping PyJWT for RS256. Verified claims are
+    cached by the token's SHA-256 for up to `cache_ttl` seconds (never past the token's `exp`), so
+    repeated requests with the same token skip the signature check. The claims are stored in
+    `request.context["claims"]` and their `sub` in `request.context["user_id"]`.
+    Token scopes are read from the `scope` claim (space separated) or a `scopes` list.
+    """
+
     name = "scopeValidation"
     attach_to = "request"
     priority = 10  # High priority to run early
 
     # https://sanic-jwt.readthedocs.io/en/latest/pages/scoped.html
 
-    def intercept(request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[reportAttributeAccessIssue,reportSelfClsParameterName]
+    def __init__(
+        self,
+        secret: Optional[Union[str, bytes]] = None,
+        verify: Optional[Callable[[str], dict[str, Any]]] = None,
+        algorithms: Sequence[str] = ("HS256",),
+        cache_size: int = 10_000,
+        cache_ttl: float = 300.0,
+        exclude_paths: Sequence[str] = ("/health", "/ping"),
+    ) -> None:
+        if verify is None:
+            if secret is None:
+                raise ValueError("ScopeValidationMiddleware needs a secret or a verify function")
+            verify = functools.partial(decode_jwt, secret=secret, algorithms=algorithms)
+        self.verify = verify
+        self.cache_ttl = cache_ttl
+        self.exclude_paths = frozenset(exclude_paths)
+        # token digest -> (valid until, claims, scopes)
+        self.tokens = LRUCache(cache_size)
+
+    def claims(self, token: str) -> tuple[dict[str, Any], frozenset[str]]:
+        """The verified claims and scopes of a token, from the cache when possible."""
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        cached = self.tokens.get(key)
+        if cached is not None:
+            if cached[0] > now:
+                return cached[1], cached[2]
+            self.tokens.pop(key)
+
+        try:
+            claims = self.verify(token)
+        except FutureException:
+            raise
+        except Exception as e:
+            raise UnauthorizedException("Invalid token") from e
+
+        scopes = claims.get("scope", claims.get("scopes", ()))
+        if isinstance(scopes, str):
+            scopes = scopes.split()
+        user_scopes = frozenset(scopes)
+
+        valid_until = now + self.cache_ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            valid_until = min(valid_until, claims["exp"])
+        self.tokens.set(key, (valid_until, claims, user_scopes))
+        return claims, user_scopes
+
+    def intercept(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[override]
         # Skip validation for certain paths (like health checks)
-        if request.path in ["/health", "/ping"]:
-            # Don't return anything to allow continuation
+        if request.path in self.exclude_paths:
             return None
 
-        # Get the matched route from request context
-        # The route should be available in the request context after routing
-        route = getattr(request, "route", None)
-        if not route:
+        # If no scopes required, allow access
+        route = request.route
+        if route is None or not route.scopes:
             return None
 
-        # Get required scopes for this route
-        required_scopes = getattr(route, "scopes", [])
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise UnauthorizedException("Missing bearer token")
 
-        # If no scopes required, allow access
-        if not required_scopes:
+        claims, user_scopes = self.claims(token.strip())
+        request.context["claims"] = claims
+        if "sub" in claims:
+            request.context["user_id"] = claims["sub"]
+
+        if not route.scopes <= user_scopes:
+            raise ForbiddenException("Insufficient permissions")
+
+        # Don't return anything to allow continuation
+        return None
+
+
+class CacheMiddleware(Middleware):
+    """Serves repeated requests from an in-memory cache of frozen responses.
+
+    Configured per instance and added to the routes or route groups to cache, e.g.
+    ``CacheMiddleware(ttl=30, vary=["accept-language"])``. Responses are keyed on method (HEAD
+    shares GET's entries), host, path, query string and the `vary` request headers, and kept for
+    `ttl` seconds in an LRU bounded to `max_bytes`. Only buffered responses with a status in
+    `statuses` and without Set-Cookie or Cache-Control no-store/private are stored, and requests
+    with an Authorization header bypass the cache unless it is listed in `vary`.
+
+    Concurrent misses for the same key are coalesced: the first request runs the handler while the
+    others wait (up to `wait_timeout` seconds) for its response. If that request fails, is
+    cancelled or produces an uncacheable response, the waiting requests run the handler themselves.
+
+    A hit is answered in the request phase and then goes through the response middlewares outside
+    this one (e.g. CORS headers or ConditionalGetMiddleware on a group), like a fresh response.
+    What is cached is the response as this middleware sees it, after the response middlewares
+    inside it ran; each request gets its own copy of the headers.
+    """
+
+    name = "cache"
+    attach_to = "both"
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        vary: Sequence[str] = (),
+        methods: Sequence[str] = ("GET", "HEAD"),
+        statuses: Sequence[int] = (200,),
+        wait_timeout: float = 10.0,
+    ) -> None:
+        self.cache = TTLCache(max_bytes=max_bytes, ttl=ttl)
+        self.vary = tuple(header.lower() for header in vary)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.statuses = frozenset(statuses)
+        self.wait_timeout = wait_timeout
+        # key -> future resolved with the frozen response of the request running the handler
+        self.inflight: dict[Hashable, asyncio.Future[Optional[CachedResponse]]] = {}
+        # Where a request running the handler keeps its key and future, one entry per instance
+        self.context_key = f"cache.{id(self)}"
+
+    def key(self, request: Request) -> Optional[Hashable]:
+        if request.method not in self.methods:
+            return None
+        if "authorization" in request.headers and "authorization" not in self.vary:
+            return None
+        method = "GET" if request.method == "HEAD" else request.method
+        return (method, request.host, request.path, request.scope.get("query_string", b""), *(request.headers.get(header) for header in self.vary))
+
+    def is_cacheable(self, response: Any) -> bool:
+        if not isinstance(response, Response) or response.status not in self.statuses:
+            return False
+        # Streaming, file and wrapped responses can't be replayed from their body
+        if not isinstance(response, CachedResponse) and type(response).__call__ is not Response.__call__:
+            return False
+        for key, value in response.headers:
+            key = key.lower()
+            if key == b"set-cookie":
+                return False
+            if key == b"cache-control" and (b"no-store" in value or b"private" in value):
+                return False
+        return True
+
+    def release(self, key: Hashable, future: "asyncio.Future[Optional[CachedResponse]]", response: Optional[CachedResponse]) -> None:
+        if not future.done():
+            future.set_result(response)
+        if self.inflight.get(key) is future:
+            del self.inflight[key]
+
+    def finalize(self, request: Request) -> None:
+        """Wake the waiting requests if this one ended without caching a response, e.g. on an error."""
+        pending = request.context.pop(self.context_key, None)
+        if pending is not None:
+            key, future = pending
+            self.release(key, future, None)
+
+    async def intercept(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[override]
+        if response is None:
+            key = self.key(request)
+            if key is None:
+                return None
+            cached: Optional[CachedResponse] = self.cache.get(key)
+            if cached is not None:
+                return cached.copy()
+
+            inflight = self.inflight.get(key)
+            if inflight is not None:
+                try:
+                    shared = await asyncio.wait_for(asyncio.shield(inflight), self.wait_timeout)
+                except asyncio.TimeoutError:
+                    return None
+                return shared.copy() if shared is not None else None
+
+            # This request runs the handler, the others wait for its response
+            future: asyncio.Future[Optional[CachedResponse]] = asyncio.get_running_loop().create_future()
+            self.inflight[key] = future
+            request.context[self.context_key] = (key, future)
+            request.add_finalizer(self.finalize)
+            return None
+
+        pending = request.context.pop(self.context_key, None)
+        if pending is None:
             return None
+        key, future = pending
+        frozen = None
+        if self.is_cacheable(response):
+            frozen = response.freeze()
+            self.cache.set(key, frozen, len(frozen.body) + sum(len(name) + len(value) for name, value in frozen.headers))
+        self.release(key, future, frozen)
+        # Freezing copied the headers, the response itself is still this request's to modify
+        if frozen is response:
+            return frozen.copy()
+        return None
 
-        # Get user ID from request context
-        user_id = request.context.get("user_id")
-        if not user_id:
-            return Response(body="Unauthorized - no user ID found", headers={"Content-Type": "text/plain"}, status=401)
+    def get_stats(self) -> dict[str, int]:
+        return {**self.cache.get_stats(), "inflight": len(self.inflight)}
 
-        # TODO: Implement your token validation logic here
-        # For now, return mock scopes - replace with actual JWT validation
-        user_scopes = ["read:posts", "write:posts", "admin", "read:public", "read:api", "user", "debug"]
 
-        # Check if user has required scopes
-        for required_scope in required_scopes:
-            if required_scope not in user_scopes:
-                return Response(body="Insufficient permissions", headers={"Content-Type": "text/plain"}, status=403)
+class ConditionalGetMiddleware(Middleware):
+    """Answers GET/HEAD requests with 304 Not Modified when the client's copy is current.
 
-        # Don't return anything to allow continuation
+    Buffered 200 responses get a strong ETag from a hash of their body (computed once for frozen
+    responses), unless the handler already set an ETag, e.g. a cheap weak `W/"<version>"`. That
+    ETag and the response's Last-Modified are checked against If-None-Match/If-Modified-Since,
+    and a matching request gets an empty 304 instead of the body. Streamed responses pass through;
+    FileResponse handles its own validators.
+
+    Configured per instance, e.g. ``ConditionalGetMiddleware()``. `not_modified_headers` lists the
+    response headers repeated on a 304, those of RFC 9110 section 15.4.5 by default.
+    """
+
+    name = "conditionalGet"
+    attach_to = "response"
+
+    def __init__(self, not_modified_headers: Sequence[str] = ("cache-control", "content-location", "date", "etag", "expires", "vary")) -> None:
+        self.not_modified_headers = frozenset(header.lower().encode("latin-1") for header in not_modified_headers)
+
+    def intercept(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[override]
+        if response is None or response.status != 200 or request.method not in ("GET", "HEAD"):
+            return None
+        if not isinstance(response, CachedResponse) and type(response).__call__ is not Response.__call__:
+            return None
+
+        etag: Optional[str] = None
+        last_modified: Optional[float] = None
+        for key, value in response.headers:
+            key = key.lower()
+            if key == b"etag":
+                etag = value.decode("latin-1")
+            elif key == b"last-modified":
+                try:
+                    last_modified = parsedate_to_datetime(value.decode("latin-1")).timestamp()
+                except (TypeError, ValueError):
+                    pass
+
+        added: list[list[bytes]] = []
+        if etag is None:
+            etag = response.shared.etag if isinstance(response, CachedResponse) else None
+            if etag is None:
+                etag = f'"{hashlib.blake2b(response.body, digest_size=16).hexdigest()}"'
+                if isinstance(response, CachedResponse):
+                    response.shared.etag = etag
+            added.append([b"etag", etag.encode()])
+
+        if is_not_modified(request.headers, etag, last_modified):
+            not_modified = NotModifiedResponse()
+            not_modified.headers = [[key, value] for key, value in [*response.headers, *added] if key.lower() in self.not_modified_headers]
+            return not_modified
+
+        if not added:
+            return None
+        # Frozen responses are shared, add the header on the way out instead
+        if isinstance(response, CachedResponse):
+            return ExtraHeadersResponse(response, added)
+        response.headers.extend(added)
         return None
@@ -1,31 +1,142 @@
-from typing import Any
+from collections.abc import AsyncIterator, Callable, Iterator, Mapping
+from typing import TYPE_CHECKING, Any, Optional
 
-from future.types import ASGIReceive, ASGIScope
+from future.exceptions import BadRequestException, PayloadTooLargeException, ValidationException
+from future.responses import is_not_modified
+from future.serialization import JSONValidationError, json_loads
+from future.types import AsgiEventType, ASGIReceive, ASGIScope
+
+
+if TYPE_CHECKING:
+    from future.routing import Route
+
+
+class Headers(Mapping[str, str]):
+    """Case-insensitive, read-only view over the raw ASGI header list.
+
+    Nothing is decoded up front: a header is looked up in `scope["headers"]` the first time
+    it is accessed, decoded as latin-1 and cached. Repeated headers are kept, `get()` returns
+    the first value and `getlist()` returns all of them.
+    """
+
+    def __init__(self, raw: list[tuple[bytes, bytes]]) -> None:
+        self.raw = raw
+        self._cache: dict[str, list[str]] = {}
+
+    def getlist(self, key: str) -> list[str]:
+        key = key.lower()
+        values = self._cache.get(key)
+        if values is None:
+            name = key.encode("latin-1")
+            values = [value.decode("latin-1") for raw_name, value in self.raw if raw_name == name or raw_name.lower() == name]
+            self._cache[key] = values
+        return values
+
+    def get(self, key: str, default: Any = None) -> Any:
+        values = self.getlist(key)
+        return values[0] if values else default
+
+    def __getitem__(self, key: str) -> str:
+        values = self.getlist(key)
+        if not values:
+            raise KeyError(key)
+        return values[0]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and bool(self.getlist(key))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(dict.fromkeys(name.decode("latin-1").lower() for name, _ in self.raw))
+
+    def __len__(self) -> int:
+        return len({name.lower() for name, _ in self.raw})
+
+    def __repr__(self) -> str:
+        return f"Headers({[(name.decode('latin-1'), value.decode('latin-1')) for name, value in self.raw]!r})"
 
 
 class Request:
-    def __init__(self, scope: ASGIScope, receive: ASGIReceive):
+    def __init__(self, scope: ASGIScope, receive: ASGIReceive, max_body_size: Optional[int] = None):
         self.scope = scope
         self.receive = receive
-        self.method = scope["method"]
+        self.method = scope.get("method", "WEBSOCKET")  # WebSocket scopes have no method
         self.path = scope["path"]
-        self.headers = dict([(key.decode("utf-8"), value.decode("utf-8")) for key, value in scope["headers"]])  # FIXME: why decode?
-        self.host = self.headers.get("host", "")
+        self.headers = Headers(scope["headers"])
+        self.host: str = self.headers.get("host", "")
         # self.host = dict(scope['headers']).get(b'host', b'').decode()
         self.context: dict[str, Any] = {}  # for custom data we inject into the request
+        self.route: Optional["Route"] = None  # the matched route, set by the application before the middlewares run
+        self.finalizers: Optional[list[Callable[["Request"], None]]] = None  # see add_finalizer
         self.scheme = scope["scheme"]
+        self.max_body_size = max_body_size
+        self._body: Optional[bytes] = None
+        self._stream_consumed = False
 
-    async def body(self) -> bytes:
+    def add_finalizer(self, finalizer: Callable[["Request"], None]) -> None:
+        """Call `finalizer(request)` once the route is done with this request, however it ended.
+
+        It runs after the response middlewares, and also when the handler or a middleware raised
+        or the request was cancelled, so middlewares can release what they hold for the request.
+        """
+        if self.finalizers is None:
+            self.finalizers = []
+        self.finalizers.append(finalizer)
+
+    def is_not_modified(self, etag: Optional[str] = None, last_modified: Optional[float] = None) -> bool:
+        """Whether the client already has the current version, per If-None-Match/If-Modified-Since.
+
+        Meant to be called with a cheap version (e.g. a row's updated_at as a weak ETag) before
+        rendering, to answer with a NotModifiedResponse instead.
+        """
+        return is_not_modified(self.headers, etag, last_modified)
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """Yield the request body chunk by chunk as it arrives.
+
+        The next chunk is only received once the previous one has been consumed, so a slow
+        consumer applies backpressure to the client. Bodies above `max_body_size` raise a 413.
+        """
+        if self._body is not None:
+            yield self._body
+            return
+        if self._stream_consumed:
+            raise RuntimeError("Request body stream has already been consumed")
+        self._stream_consumed = True
+
+        limit = self.max_body_size
+        if limit is not None:
+            # Fail fast when the client announces a body that is too large
+            content_length = self.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > limit:
+                raise PayloadTooLargeException()
+
+        received = 0
         more_body = True
-        body: bytes = b""
         while more_body:
             message = await self.receive()
-            body += message.get("body", b"")
+            if message["type"] == AsgiEventType.HTTP_DISCONNECT:
+                raise BadRequestException("Client disconnected")
+            chunk = message.get("body", b"")
             more_body = message.get("more_body", False)
-        return body
+            if chunk:
+                received += len(chunk)
+                if limit is not None and received > limit:
+                    raise PayloadTooLargeException()
+                yield chunk
 
-    """
-    async def json(self) -> dict:
+    async def body(self) -> bytes:
+        """Read the whole body, it is cached so middlewares and the handler can all read it."""
+        if self._body is None:
+            chunks = [chunk async for chunk in self.stream()]
+            self._body = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        return self._body
+
+    async def json(self, type: Optional[Any] = None) -> Any:
+        """Decode the body as JSON, optionally into `type` (e.g. a msgspec.Struct model)."""
         body = await self.body()
-        return json.loads(body)
-    """
+        try:
+            return json_loads(body, type=type)
+        except JSONValidationError as e:
+            raise ValidationException(str(e)) from e
+        except ValueError as e:
+            raise BadRequestException("Invalid JSON") from e
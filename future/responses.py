@@ -1,7 +1,42 @@
-import json
+import asyncio
+import mimetypes
+import os
 
-from collections.abc import Awaitable
-from typing import Any, Callable, Optional, Union
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Iterable, Iterator, Mapping
+from email.utils import formatdate, parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from future.serialization import json_dumps
+
+
+if TYPE_CHECKING:
+    from future.requests import Request
+
+
+# Encoded content-type values, there are only a handful of distinct ones per application
+encoded_content_types: dict[str, bytes] = {}
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: Optional[str], last_modified: Optional[float]) -> bool:
+    """Whether the client's cached copy is current, per If-None-Match or else If-Modified-Since.
+
+    ETags are compared weakly, as RFC 9110 prescribes for If-None-Match, so a handler-supplied
+    `W/"..."` tag matches too.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
 
 class Response:
@@ -22,15 +57,19 @@ class Response:
         else:
             raise TypeError(f"Response body must be str or bytes, got {type(body)}")
 
-        # Set up headers
-        if not headers:
-            headers = {}
+        # Set up headers, leaving the caller's dict untouched
+        self.headers = [[key.encode(), value.encode()] for key, value in headers.items()] if headers else []
 
         # Ensure content-type is set
-        if "content-type" not in headers and content_type:
-            headers["content-type"] = content_type
+        if content_type and not (headers and any(key.lower() == "content-type" for key in headers)):
+            encoded = encoded_content_types.get(content_type)
+            if encoded is None:
+                encoded = encoded_content_types[content_type] = content_type.encode()
+            self.headers.append([b"content-type", encoded])
 
-        self.headers = [[key.encode(), value.encode()] for key, value in headers.items()]
+    def freeze(self) -> "CachedResponse":
+        """Encode this response once so it can be replayed for every request, see CachedResponse."""
+        return CachedResponse(self)
 
     async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
         # assert type(self.body) == bytes, "Response body must be bytes"
@@ -49,6 +88,48 @@ class Response:
         await send(body_message)
 
 
+class CachedResponse(Response):
+    """A response with its status, headers and body encoded once.
+
+    The ASGI start and body messages are built up front and sent as is, so replaying it costs no
+    allocations. Use it for responses that never change, e.g. a module level
+    `WELCOME = Response(body="Welcome").freeze()` returned by the handler. Each request is handed
+    a `copy()` with its own headers and context, so response middlewares may modify them.
+    """
+
+    def __init__(self, response: Response) -> None:
+        self.status = response.status
+        self.body = response.body
+        self.context = response.context
+        self.headers = [[key, value] for key, value in response.headers if key.lower() != b"content-length"]
+        self.headers.append([b"content-length", str(len(self.body)).encode()])
+        self.start_message = {"type": "http.response.start", "status": self.status, "headers": self.headers}
+        self.body_message = {"type": "http.response.body", "body": self.body}
+        # Strong ETag of the body, computed on first use by ConditionalGetMiddleware
+        self.etag: Optional[str] = None
+        # The instance copies were made from, where the ETag is kept for all of them
+        self.shared = self
+
+    def freeze(self) -> "CachedResponse":
+        return self
+
+    def copy(self) -> "CachedResponse":
+        """A shallow copy with its own headers and start message, for handing to one request.
+
+        The body and its message are still shared, they are bytes and never modified.
+        """
+        response = object.__new__(CachedResponse)
+        response.__dict__.update(self.__dict__)
+        response.context = dict(self.context)
+        response.headers = [[key, value] for key, value in self.headers]
+        response.start_message = {"type": "http.response.start", "status": self.status, "headers": response.headers}
+        return response
+
+    async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        await send(self.start_message)
+        await send(self.body_message)
+
+
 class WebSocketResponse:
     def __init__(self, message: str = "") -> None:
         self.message = message
@@ -69,8 +150,8 @@ class PlainTextResponse(Response):
 
 class JSONResponse(Response):
     def __init__(self, data: Any, status: int = 200, headers: dict[str, str] | None = None) -> None:
-        # Convert data to JSON string
-        json_data = json.dumps(data, default=str, ensure_ascii=False)
+        # Encode data straight to JSON bytes
+        json_data = json_dumps(data)
         # Call parent with JSON content type
         super().__init__(body=json_data, status=status, headers=headers, content_type="application/json")
 
@@ -80,6 +161,21 @@ class EmptyResponse(Response):
         super().__init__(body="", status=status, headers=headers)
 
 
+class NotModifiedResponse(Response):
+    """304 Not Modified: no body, only the validators the client's copy was checked against.
+
+    Handlers can return it straight away when `request.is_not_modified(etag=...)` holds, which
+    skips rendering the response altogether.
+    """
+
+    def __init__(self, etag: Optional[str] = None, last_modified: Optional[float] = None, headers: dict[str, str] | None = None) -> None:
+        super().__init__(b"", 304, headers, content_type="")
+        if etag is not None:
+            self.headers.append([b"etag", etag.encode()])
+        if last_modified is not None:
+            self.headers.append([b"last-modified", formatdate(last_modified, usegmt=True).encode()])
+
+
 class HTMLResponse(Response):
     def __init__(self, html: str, status: int = 200, headers: dict[str, str] | None = None) -> None:
         super().__init__(body=html, status=status, headers=headers, content_type="text/html")
@@ -87,36 +183,376 @@ class HTMLResponse(Response):
 
 class PNGResponse(Response):
     def __init__(self, body: bytes = b"", status: int = 200, headers: dict[str, str] | None = None) -> None:
-        super().__init__(body, status, headers or {})
-        self.headers = [[b"content-type", b"image/png"]]
+        super().__init__(body, status, headers, content_type="image/png")
 
 
 class ImageResponse(Response):
     def __init__(
-        self, body: bytes = b"", status: int = 200, headers: dict[str, str] | None = None, image_content_type: str = "image/png", file_path: str | None = None
+        self,
+        body: bytes = b"",
+        status: int = 200,
+        headers: dict[str, str] | None = None,
+        image_content_type: str = "image/png",
+        file_path: str | None = None,
+        request: Optional["Request"] = None,
     ) -> None:
-        if file_path:
-            with open(file_path, "rb") as f:
-                body = f.read()
         final_headers = headers.copy() if headers else {}
         has_content_type = any(key.lower() == "content-type" for key in final_headers)
         if not has_content_type:
             final_headers["content-type"] = image_content_type
         super().__init__(body=body, status=status, headers=final_headers)
 
+        # Images on disk are streamed instead of being read into memory
+        self.file: Optional[FileResponse] = None
+        if file_path:
+            self.file = FileResponse(file_path, status=status, headers=final_headers, request=request)
+
+    async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        if self.file is not None:
+            self.file.headers = self.headers  # Keep headers added by response middlewares
+            await self.file(send)
+        else:
+            await super().__call__(send)
+
 
 class RedirectResponse(Response):
-    pass
+    def __init__(self, url: str, status: int = 307, headers: dict[str, str] | None = None) -> None:
+        final_headers = headers.copy() if headers else {}
+        final_headers["location"] = url
+        super().__init__(body=b"", status=status, headers=final_headers)
+
+
+class StreamingResponse(Response):
+    """Send the body chunk by chunk from a sync or async iterable.
+
+    Sync iterables (other than lists and tuples) are advanced in the default thread pool,
+    so blocking generators do not stall the event loop.
+    """
+
+    def __init__(
+        self,
+        content: Union[Iterable[Union[str, bytes]], AsyncIterable[Union[str, bytes]]],
+        status: int = 200,
+        headers: dict[str, str] | None = None,
+        content_type: Optional[str] = "application/octet-stream",
+    ) -> None:
+        super().__init__(body=b"", status=status, headers=headers, content_type=content_type)
+        self.content = content
+
+    async def iterate(self) -> AsyncIterator[Union[str, bytes]]:
+        if isinstance(self.content, AsyncIterable):
+            async for chunk in self.content:
+                yield chunk
+        elif isinstance(self.content, (list, tuple)):
+            for chunk in self.content:
+                yield chunk
+        else:
+            loop = asyncio.get_running_loop()
+            iterator: Iterator[Any] = iter(self.content)
+            done = object()
+            while True:
+                item: Any = await loop.run_in_executor(None, next, iterator, done)
+                if item is done:
+                    break
+                yield item
+
+    async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        await send({"type": "http.response.start", "status": self.status, "headers": self.headers})
+        async for chunk in self.iterate():
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk.encode("utf-8") if isinstance(chunk, str) else chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
 
 
 class FileResponse(Response):
-    def __init__(self, body: bytes = b"", status: int = 200, headers: dict[str, str] | None = None) -> None:
+    """Stream a file from disk.
+
+    The file is read in fixed-size chunks in the default thread pool, or handed to the server
+    with the `http.response.zerocopysend` extension when it is advertised. When the request is
+    passed in, `Range` (single range, 206/416) and `If-None-Match`/`If-Modified-Since` (304)
+    are honoured.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        status: int = 200,
+        headers: dict[str, str] | None = None,
+        content_type: Optional[str] = None,
+        filename: Optional[str] = None,
+        request: Optional["Request"] = None,
+    ) -> None:
         final_headers = headers.copy() if headers else {}
         has_content_type = any(key.lower() == "content-type" for key in final_headers)
         if not has_content_type:
-            final_headers["content-type"] = "application/octet-stream"
-        super().__init__(body, status, final_headers)
+            final_headers["content-type"] = content_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if filename:
+            final_headers["content-disposition"] = f'attachment; filename="{filename}"'
+        super().__init__(b"", status, final_headers)
+        self.path = path
+        self.request = request
+
+    def _is_not_modified(self, etag: str, mtime: float) -> bool:
+        if self.request is None:
+            return False
+        return is_not_modified(self.request.headers, etag, mtime)
+
+    def _parse_range(self, etag: str, last_modified: str, size: int) -> Optional[tuple[int, int]]:
+        """Return the requested (start, end) byte range, (0, -1) for the whole file or (-1, -1) if unsatisfiable."""
+        if self.request is None:
+            return (0, -1)
+        range_header = self.request.headers.get("range")
+        if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+            return (0, -1)  # No range, or multiple ranges which we answer with the whole file
+        if_range = self.request.headers.get("if-range")
+        if if_range is not None and if_range not in (etag, last_modified):
+            return (0, -1)
+
+        start_value, _, end_value = range_header[6:].strip().partition("-")
+        try:
+            if start_value:
+                start = int(start_value)
+                end = int(end_value) if end_value else size - 1
+            else:
+                start = max(size - int(end_value), 0)  # Suffix range: the last N bytes
+                end = size - 1
+        except ValueError:
+            return (0, -1)
+        if start > end or start >= size:
+            return (-1, -1)
+        return (start, min(end, size - 1))
 
+    async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            stat = await loop.run_in_executor(None, os.stat, self.path)
+        except FileNotFoundError:
+            await Response(body="Not Found", status=404)(send)
+            return
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        headers = [*self.headers, [b"etag", etag.encode()], [b"last-modified", last_modified.encode()], [b"accept-ranges", b"bytes"]]
+
+        if self._is_not_modified(etag, stat.st_mtime):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        status = self.status
+        start, end = self._parse_range(etag, last_modified, stat.st_size) if status == 200 else (0, -1)
+        if start < 0:
+            headers.append([b"content-range", f"bytes */{stat.st_size}".encode()])
+            await send({"type": "http.response.start", "status": 416, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if end < 0:
+            end = stat.st_size - 1
+        else:
+            status = 206
+            headers.append([b"content-range", f"bytes {start}-{end}/{stat.st_size}".encode()])
+
+        length = end - start + 1
+        headers.append([b"content-length", str(length).encode()])
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+
+        if length <= 0 or (self.request is not None and self.request.method == "HEAD"):
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        file = await loop.run_in_executor(None, open, self.path, "rb")
+        try:
+            extensions = (self.request.scope.get("extensions") or {}) if self.request is not None else {}
+            if "http.response.zerocopysend" in extensions:
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": start, "count": length})
+                return
+
+            await loop.run_in_executor(None, file.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, file.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # The file shrank while we were sending it, end the response cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await loop.run_in_executor(None, file.close)
+
+
+class ServerSentEvent:
+    """A single Server-Sent Event, encoded to its wire format once."""
+
+    __slots__ = ("data", "event", "id", "retry", "_encoded")
+
+    def __init__(self, data: Any = "", event: Optional[str] = None, id: Optional[Union[int, str]] = None, retry: Optional[int] = None) -> None:
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+        self._encoded: Optional[bytes] = None
+
+    def encode(self) -> bytes:
+        if self._encoded is None:
+            parts: list[bytes] = []
+            if self.id is not None:
+                parts += (b"id: ", str(self.id).encode(), b"\n")
+            if self.event is not None:
+                parts += (b"event: ", self.event.encode(), b"\n")
+            if self.retry is not None:
+                parts += (b"retry: ", str(self.retry).encode(), b"\n")
+            data = self.data if isinstance(self.data, (str, bytes)) else json_dumps(self.data)
+            if isinstance(data, str):
+                data = data.encode()
+            for line in data.splitlines() or (b"",):
+                parts += (b"data: ", line, b"\n")
+            parts.append(b"\n")
+            self._encoded = b"".join(parts)
+        return self._encoded
+
+
+class EventChannel:
+    """A stream of Server-Sent Events with a bounded history, for resuming with Last-Event-ID.
+
+    `publish` numbers and encodes an event once, keeps it in a ring buffer of the last `history`
+    events and hands it to every subscriber. A subscriber that falls `queue_size` events behind
+    is ended; the browser reconnects with Last-Event-ID and catches up from the history.
+    """
+
+    def __init__(self, history: int = 1000, queue_size: int = 256) -> None:
+        self.history: deque[tuple[int, bytes]] = deque(maxlen=history)
+        self.last_id = 0
+        self.queue_size = queue_size
+        self.subscribers: set[asyncio.Queue[Optional[tuple[int, bytes]]]] = set()
+
+    def publish(self, data: Any, event: Optional[str] = None) -> int:
+        self.last_id += 1
+        item = (self.last_id, ServerSentEvent(data, event=event, id=self.last_id).encode())
+        self.history.append(item)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Too slow, end its stream so the client resumes from the history
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        return self.last_id
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Yield encoded events, starting with the ones after `last_event_id` still in the history."""
+        queue: asyncio.Queue[Optional[tuple[int, bytes]]] = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        try:
+            sent = self.last_id
+            if last_event_id is not None:
+                try:
+                    # An id beyond the newest one was given out before a restart, start from live events
+                    sent = min(int(last_event_id), self.last_id)
+                except ValueError:
+                    pass
+                for event_id, encoded in list(self.history):
+                    if event_id > sent:
+                        sent = event_id
+                        yield encoded
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if item[0] > sent:  # Skip events already replayed from the history
+                    sent = item[0]
+                    yield item[1]
+        finally:
+            self.subscribers.discard(queue)
+
+
+class EventSourceResponse(Response):
+    """Stream Server-Sent Events from an async iterable.
+
+    Items may be ServerSentEvent instances, encoded events (bytes, e.g. from
+    EventChannel.subscribe) or plain data (str, or anything else which is sent as JSON).
+    A comment line is sent as heartbeat after `ping` seconds without events, which keeps proxies
+    from timing out the connection. When the request is passed in, `http.disconnect` is watched
+    for and the producer is cancelled as soon as the client goes away.
+    """
 
-class StreamingResponse(Response):
-    pass
+    def __init__(
+        self,
+        content: AsyncIterable[Any],
+        status: int = 200,
+        headers: dict[str, str] | None = None,
+        ping: Optional[float] = 15.0,
+        request: Optional["Request"] = None,
+    ) -> None:
+        final_headers = {"cache-control": "no-cache", "x-accel-buffering": "no", **(headers or {})}
+        super().__init__(body=b"", status=status, headers=final_headers, content_type="text/event-stream")
+        self.content = content
+        self.ping = ping
+        self.request = request
+
+    def encode(self, item: Any) -> bytes:
+        if isinstance(item, bytes):
+            return item
+        if isinstance(item, ServerSentEvent):
+            return item.encode()
+        return ServerSentEvent(item).encode()
+
+    async def _stream(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        iterator = aiter(self.content)
+        next_item: Optional[asyncio.Future[Any]] = None
+        try:
+            while True:
+                if next_item is None:
+                    next_item = asyncio.ensure_future(anext(iterator))
+                done, _ = await asyncio.wait({next_item}, timeout=self.ping)
+                if not done:
+                    await send({"type": "http.response.body", "body": b": ping\n\n", "more_body": True})
+                    continue
+                item, next_item = next_item, None
+                try:
+                    event = item.result()
+                except StopAsyncIteration:
+                    return
+                await send({"type": "http.response.body", "body": self.encode(event), "more_body": True})
+        finally:
+            if next_item is not None:
+                next_item.cancel()
+                await asyncio.gather(next_item, return_exceptions=True)
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def _wait_for_disconnect(self) -> None:
+        assert self.request is not None
+        while True:
+            message = await self.request.receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    async def __call__(self, send: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        await send({"type": "http.response.start", "status": self.status, "headers": self.headers})
+
+        stream = asyncio.create_task(self._stream(send))
+        tasks = {stream}
+        if self.request is not None:
+            tasks.add(asyncio.create_task(self._wait_for_disconnect()))
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if stream.cancelled():
+            return  # The client is gone
+        error = stream.exception()
+        if isinstance(error, OSError):
+            return  # The client went away while we were sending
+        if error is not None:
+            raise error
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
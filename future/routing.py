@@ -1,8 +1,12 @@
 import re
 
-from typing import Any, Callable, Optional, TypedDict
+from collections.abc import Sequence
+from typing import Any, Callable, Optional, TypedDict, Union
 
-from future.middleware import Middleware
+from future.middleware import CORSMiddleware, Middleware
+from future.requests import Request
+from future.responses import EmptyResponse, Response
+from future.types import Intercept, RouteConfig
 
 
 class RegexConfig(TypedDict):
@@ -45,6 +49,7 @@ class Route:
         strict_slashes: bool = False,
         middlewares: Optional[list[Middleware]] = None,
         scopes: Optional[list[str]] = None,
+        coalesce: Union[bool, Sequence[str]] = False,
     ) -> None:
         self.methods = methods
         self.path = path
@@ -52,7 +57,16 @@ class Route:
         self.name = name
         self.strict_slashes = strict_slashes
         self.middlewares = middlewares or []
-        self.scopes = scopes or []
+        # Compiled once so checking a token's scopes is a single subset test
+        self.scopes: frozenset[str] = frozenset(scopes or ())
+        # Identical concurrent requests share one handler call, keyed on these request headers too
+        self.coalesce: Optional[tuple[str, ...]] = None
+        if coalesce:
+            # The key ignores the request body, so only safe methods can share a handler call
+            unsafe = [method for method in methods if method.upper() not in ("GET", "HEAD")]
+            if unsafe:
+                raise ValueError(f"Route {name} cannot coalesce {', '.join(unsafe)} requests, only GET and HEAD")
+            self.coalesce = () if coalesce is True else tuple(header.lower() for header in coalesce)  # type: ignore[union-attr]
 
     # Huge credits to BlackSheep for the code below.
     def compile_pattern(self) -> None:
@@ -156,6 +170,7 @@ class Get(Route):
         strict_slashes: bool = False,
         middlewares: Optional[list[Middleware]] = None,
         scopes: Optional[list[str]] = None,
+        coalesce: Union[bool, Sequence[str]] = False,
     ) -> None:
         super().__init__(
             methods=["GET"],
@@ -165,6 +180,7 @@ class Get(Route):
             strict_slashes=strict_slashes,
             middlewares=middlewares,
             scopes=scopes,
+            coalesce=coalesce,
         )
 
 
@@ -331,6 +347,251 @@ class RouteGroup:
         self.middlewares = middlewares or []
 
 
+def is_cors(entry: Intercept) -> bool:
+    return isinstance(getattr(entry[0], "__self__", None), CORSMiddleware)
+
+
+class RouteMethods:
+    """Route configs registered for a single path, keyed by HTTP method."""
+
+    def __init__(self) -> None:
+        self.handlers: dict[str, RouteConfig] = {}
+        self.allow = ""
+        self.options: Optional[RouteConfig] = None
+
+    def add(self, config: RouteConfig) -> None:
+        for method in config["route"].methods:
+            self.handlers[method.upper()] = config
+
+        # Precompute the Allow header, HEAD and OPTIONS are always answered when GET is registered
+        methods = [method for method in self.handlers if method != "WEBSOCKET"]
+        if "GET" in methods and "HEAD" not in methods:
+            methods.append("HEAD")
+        if methods and "OPTIONS" not in methods:
+            methods.append("OPTIONS")
+        self.allow = ", ".join(methods)
+
+        # Synthesized OPTIONS is answered from the Allow header without user middlewares, which could reject it
+        # (e.g. for a missing token). Only CORSMiddleware runs, to answer preflights and add its headers.
+        if methods and "OPTIONS" not in self.handlers:
+            first = next(config for method, config in self.handlers.items() if method != "WEBSOCKET")
+            self.options = RouteConfig(
+                route=first["route"],
+                handler=self.respond_options,
+                middleware=first["middleware"],
+                before=tuple(entry for entry in first["before"] if is_cors(entry)),
+                after=tuple(entry for entry in first["after"] if is_cors(entry)),
+                regex=first["regex"],
+                coalesce=None,
+            )
+
+    async def respond_options(self, request: Request, **params: Any) -> Response:
+        return EmptyResponse(status=204, headers={"allow": self.allow})
+
+
+class RouteNode:
+    """A single path segment in the route tree."""
+
+    def __init__(self) -> None:
+        self.static: dict[str, RouteNode] = {}
+        self.params: list[tuple[str, Optional[re.Pattern[str]], RouteNode]] = []
+        # (param name, methods, whether the tail may be missing along with its slash)
+        self.tail: Optional[tuple[str, RouteMethods, bool]] = None
+        self.methods: Optional[RouteMethods] = None
+
+
+class RouteTree:
+    """Prefix tree of routes for a single domain.
+
+    Static segments are resolved with one dict lookup per segment, typed parameters
+    sit at the branches and are only tried when no static child matches. Routes whose
+    segments mix literals and parameters (e.g. `/<id>.json`) fall back to their
+    compiled regex and are tried in registration order after the tree.
+    """
+
+    value_patterns = {name: re.compile(pattern, re.ASCII) for name, pattern in Route.value_patterns.items()}
+
+    def __init__(self) -> None:
+        self.root = RouteNode()
+        self.fallback: list[tuple[Route, RouteMethods]] = []
+
+    def _parse_segment(self, segment: str) -> Optional[tuple[str, str]]:
+        """Return (kind, name) for a parameter segment, ("static", segment) for a literal or None if unsupported."""
+        if segment == "*":
+            return ("tail", "tail")
+        if (segment.startswith("<") and segment.endswith(">")) or (segment.startswith("{") and segment.endswith("}")):
+            inner = segment[1:-1]
+            if ":" in inner:
+                pattern_name, name = inner.split(":", 1)
+                if pattern_name not in Route.value_patterns:
+                    raise InvalidValuePatternName(pattern_name, inner)
+                return (pattern_name, name)
+            return ("string", inner)
+        if segment.startswith(":") and len(segment) > 1:
+            return ("string", segment[1:])
+        if any(c in segment for c in "<>{}*"):
+            return None
+        return ("static", segment.lower())
+
+    def insert(self, route: Route, methods: RouteMethods) -> None:
+        segments = route.path[1:].split("/") if route.path.startswith("/") else route.path.split("/")
+        if len(segments) > 1 and segments[-1] == "":
+            segments.pop()
+
+        parsed: list[tuple[str, str]] = []
+        for index, segment in enumerate(segments):
+            entry = self._parse_segment(segment)
+            # Tails swallow the rest of the path, so they are only supported as the last segment
+            if entry is None or (entry[0] in ("tail", "path") and index != len(segments) - 1):
+                self.fallback.append((route, methods))
+                return
+            parsed.append(entry)
+
+        node = self.root
+        for kind, name in parsed:
+            if kind == "static":
+                if name == "" and node is self.root:
+                    continue  # Root route "/"
+                node = node.static.setdefault(name, RouteNode())
+            elif kind in ("tail", "path"):
+                # "/files/*" also matches "/files", while "/files/<path:p>" needs at least the slash, like their regexes
+                node.tail = (name, methods, kind == "tail")
+                return
+            else:
+                pattern = None if kind in ("string", "str") else self.value_patterns[kind]
+                for param_name, param_pattern, child in node.params:
+                    if param_name == name and param_pattern is pattern:
+                        node = child
+                        break
+                else:
+                    child = RouteNode()
+                    node.params.append((name, pattern, child))
+                    node = child
+        node.methods = methods
+
+    def _match(self, node: RouteNode, segments: list[str], index: int, params: dict[str, str]) -> Optional[RouteMethods]:
+        if index == len(segments) or (index == len(segments) - 1 and segments[index] == ""):
+            if node.methods is not None:
+                return node.methods
+        else:
+            segment = segments[index]
+            child = node.static.get(segment) or node.static.get(segment.lower())
+            if child is not None:
+                methods = self._match(child, segments, index + 1, params)
+                if methods is not None:
+                    return methods
+            if segment:
+                for name, pattern, child in node.params:
+                    if pattern is None or pattern.fullmatch(segment):
+                        params[name] = segment
+                        methods = self._match(child, segments, index + 1, params)
+                        if methods is not None:
+                            return methods
+                        del params[name]
+
+        if node.tail is not None and (index < len(segments) or node.tail[2]):
+            name, methods, _ = node.tail
+            params[name] = "/".join(segments[index:])
+            return methods
+        return None
+
+    def match(self, path: str) -> Optional[tuple[RouteMethods, dict[str, str]]]:
+        """Resolve a request path to its route methods and extracted parameters."""
+        params: dict[str, str] = {}
+        methods = self._match(self.root, path[1:].split("/"), 0, params)
+        if methods is not None:
+            return methods, params
+
+        for route, methods in self.fallback:
+            route_match = route.match(path.encode())
+            if route_match:
+                return methods, route_match.params or {}
+        return None
+
+
+class RouteRegex:
+    """Route matcher that merges every parameterized route of a domain into one alternation regex.
+
+    Each route's pattern is wrapped in a named group `r<index>` and its parameters are renamed to
+    `r<index>_<name>`, so a single `match()` yields both the winning route (`lastgroup`) and its
+    params. Static routes are resolved with a dict lookup before the regex is tried.
+    """
+
+    _named_group_rx = re.compile(rb"\(\?P<([^>]+)>")
+
+    def __init__(self) -> None:
+        self.static: dict[str, RouteMethods] = {}
+        self.patterns: dict[str, tuple[Route, RouteMethods]] = {}
+        self.groups: dict[str, tuple[RouteMethods, list[tuple[str, str]]]] = {}
+        self._rx: Optional[re.Pattern[bytes]] = None
+
+    def _normalize(self, path: str) -> str:
+        if len(path) > 1 and path.endswith("/"):
+            path = path[:-1]
+        return path.lower()
+
+    def insert(self, route: Route, methods: RouteMethods) -> None:
+        if not route.param_names:
+            self.static[self._normalize(route.path)] = methods
+            return
+        self.patterns[route.path] = (route, methods)
+        self._rx = None  # Recompiled on the next match
+
+    def compile(self) -> re.Pattern[bytes]:
+        alternatives = []
+        self.groups = {}
+        for index, (route, methods) in enumerate(self.patterns.values()):
+            prefix = f"r{index}"
+            pattern = route._rx.pattern[1:-1]  # Strip the ^ and $ anchors
+            pattern = self._named_group_rx.sub(b"(?P<" + prefix.encode() + rb"_\1>", pattern)
+            alternatives.append(b"(?P<" + prefix.encode() + b">" + pattern + b")")
+            self.groups[prefix] = (methods, [(name, f"{prefix}_{name}") for name in route.param_names])
+        self._rx = re.compile(b"^(?:" + b"|".join(alternatives) + b")$", re.IGNORECASE)
+        return self._rx
+
+    def match(self, path: str) -> Optional[tuple[RouteMethods, dict[str, str]]]:
+        """Resolve a request path to its route methods and extracted parameters."""
+        methods = self.static.get(self._normalize(path))
+        if methods is not None:
+            return methods, {}
+        if not self.patterns:
+            return None
+
+        rx = self._rx or self.compile()
+        match = rx.match(path.encode())
+        if not match or match.lastgroup is None:
+            return None
+        methods, groups = self.groups[match.lastgroup]
+        return methods, {name: match.group(group).decode("utf-8") for name, group in groups}
+
+
+class RouteList:
+    """Route matcher that tries each route's regex in registration order."""
+
+    def __init__(self) -> None:
+        self.routes: dict[str, tuple[Route, RouteMethods]] = {}
+
+    def insert(self, route: Route, methods: RouteMethods) -> None:
+        self.routes[route.path] = (route, methods)
+
+    def match(self, path: str) -> Optional[tuple[RouteMethods, dict[str, str]]]:
+        """Resolve a request path to its route methods and extracted parameters."""
+        request_path = path.encode()
+        for route, methods in self.routes.values():
+            route_match = route.match(request_path)
+            if route_match:
+                return methods, route_match.params or {}
+        return None
+
+
+# Route matching engines selectable with the APP_ROUTER config key
+ROUTERS: dict[str, type[RouteTree] | type[RouteRegex] | type[RouteList]] = {
+    "tree": RouteTree,
+    "regex": RouteRegex,
+    "linear": RouteList,
+}
+
+
 class EndpointConfig(TypedDict):
     middleware_before: list[Middleware]
     middleware_after: list[Middleware]
@@ -1,10 +1,21 @@
 import asyncio
-
-from datetime import datetime, timedelta
+import calendar
+import functools
+import heapq
+import itertools
+import math
+import time
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, tzinfo
 from enum import Enum
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Optional, TypeVar, Union
+from zoneinfo import ZoneInfo
 
+from future.election import LeaderElection
+from future.jobstore import JobStore
 from future.logger import log
+from future.types import RunRecord, TaskState
 
 
 class Unit(Enum):
@@ -14,16 +25,156 @@ class Unit(Enum):
     DAYS = "days"
 
 
+T = TypeVar("T")
+
+UNIT_SECONDS = {Unit.SECONDS: 1, Unit.MINUTES: 60, Unit.HOURS: 3600, Unit.DAYS: 86400}
+
+
+MAX_CATCH_UP = 1000  # Missed runs replayed at most per task, with misfire="catch_up"
+
+CRON_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+CRON_NAMES = {name: number for number, name in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)} | {
+    name: number for number, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])
+}
+
+
+def next_bit(mask: int, start: int) -> Optional[int]:
+    """Position of the lowest bit set in `mask` at or above `start`."""
+    rest = mask >> start
+    if not rest:
+        return None
+    return start + (rest & -rest).bit_length() - 1
+
+
+class CronExpression:
+    """A compiled 5-field (minute hour day month weekday) or 6-field (with leading seconds) cron expression.
+
+    Each field is parsed once into a bitset, so finding the next fire time is a handful of bit
+    operations per field. Fields accept `*`, numbers, names (`jan`, `mon`), ranges, lists and
+    `/step`; a weekday of 7 is Sunday. As in cron, when both day fields are restricted a day matches
+    either of them. The `@daily` style aliases are supported too.
+    """
+
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) == 5:
+            fields.insert(0, "0")
+        if len(fields) != 6:
+            raise ValueError(f"Invalid cron expression: {expression!r}. Must have 5 or 6 fields")
+
+        self.seconds = self._parse(fields[0], 0, 59)
+        self.minutes = self._parse(fields[1], 0, 59)
+        self.hours = self._parse(fields[2], 0, 23)
+        self.days = self._parse(fields[3], 1, 31)
+        self.months = self._parse(fields[4], 1, 12)
+        weekdays = self._parse(fields[5], 0, 7)
+        self.weekdays = (weekdays | weekdays >> 7) & 0x7F  # 7 is Sunday too
+        # A day field is unrestricted when it covers its whole range, however it is spelled ("*", "*/1", "1-31")
+        self.any_day = self.days == self._parse("*", 1, 31)
+        self.any_weekday = self.weekdays == 0x7F
+
+    def _parse(self, field: str, low: int, high: int) -> int:
+        mask = 0
+        for part in field.lower().split(","):
+            span, _, step_text = part.partition("/")
+            try:
+                step = int(step_text) if step_text else 1
+                if span in ("*", "?"):
+                    start, end = low, high
+                else:
+                    first, dash, last = span.partition("-")
+                    start = CRON_NAMES[first] if first in CRON_NAMES else int(first)
+                    end = (CRON_NAMES[last] if last in CRON_NAMES else int(last)) if dash else (high if step_text else start)
+            except ValueError:
+                raise ValueError(f"Invalid cron field: {field!r} in {self.expression!r}") from None
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"Invalid cron field: {field!r} in {self.expression!r}. Values must be within {low}-{high}")
+            for value in range(start, end + 1, step):
+                mask |= 1 << value
+        return mask
+
+    def _days_in_month(self, year: int, month: int) -> int:
+        """Bitset of the matching days of a month."""
+        length = calendar.monthrange(year, month)[1]
+        month_mask = ((1 << length) - 1) << 1
+        first_weekday = (calendar.weekday(year, month, 1) + 1) % 7  # Cron counts from Sunday
+        week = 0
+        for offset in range(7):
+            if self.weekdays >> ((first_weekday + offset) % 7) & 1:
+                week |= 1 << offset
+        weekdays = (week | week << 7 | week << 14 | week << 21 | week << 28) << 1
+        if self.any_day:
+            return weekdays & month_mask
+        if self.any_weekday:
+            return self.days & month_mask
+        return (self.days | weekdays) & month_mask
+
+    def next_after(self, moment: datetime) -> datetime:
+        """The first wall clock time strictly after `moment` (which is compared naively) matching the expression."""
+        current = moment.replace(tzinfo=None, microsecond=0) + timedelta(seconds=1)
+        for _ in range(8 * 12):  # Any valid expression fires within eight years (29 February)
+            month = next_bit(self.months, current.month)
+            if month is None:
+                current = datetime(current.year + 1, 1, 1)
+                continue
+            if month != current.month:
+                current = datetime(current.year, month, 1)
+
+            day = next_bit(self._days_in_month(current.year, current.month), current.day)
+            if day is None:
+                current = datetime(current.year + current.month // 12, current.month % 12 + 1, 1)
+                continue
+            if day != current.day:
+                current = datetime(current.year, current.month, day)
+
+            hour = next_bit(self.hours, current.hour)
+            if hour is None:
+                current = datetime(current.year, current.month, current.day) + timedelta(days=1)
+                continue
+            if hour != current.hour:
+                current = current.replace(hour=hour, minute=0, second=0)
+
+            minute = next_bit(self.minutes, current.minute)
+            if minute is None:
+                current = current.replace(minute=0, second=0) + timedelta(hours=1)
+                continue
+            if minute != current.minute:
+                current = current.replace(minute=minute, second=0)
+
+            second = next_bit(self.seconds, current.second)
+            if second is None:
+                current = current.replace(second=0) + timedelta(minutes=1)
+                continue
+            return current.replace(second=second)
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
+
+
 class Task:
     def __init__(
         self,
         name: str,
-        interval: Optional[int] = None,
+        interval: Optional[float] = None,
         unit: Optional[Unit] = None,
         start_time: Optional[datetime] = None,
         kwargs: Optional[dict[str, Any]] = None,
         func: Optional[Callable[..., Any]] = None,
         args: tuple[Any, ...] = (),
+        max_concurrency: int = 1,
+        overlap: str = "skip",
+        timeout: Optional[float] = None,
+        executor: str = "thread",
+        cron: Optional[str] = None,
+        timezone: Optional[Union[str, tzinfo]] = None,
+        misfire: str = "coalesce",
     ) -> None:
         self.name = name
         self.interval = interval
@@ -32,64 +183,225 @@ class Task:
         self.kwargs = kwargs or {}
         self.func = func
         self.args = args
+        self.max_concurrency = max_concurrency
+        self.overlap = overlap
+        self.timeout = timeout
+        self.executor = executor
+        self.cron = cron
+        self.timezone = timezone
+        self.misfire = misfire
 
 
 class ScheduledTask:
-    """Represents a scheduled task with its timing configuration."""
+    """Represents a scheduled task with its timing configuration.
+
+    Interval runs are due at `start_time + n * interval`, tracked on the monotonic clock, so they
+    don't drift with execution time or wall clock adjustments. Cron runs follow the wall clock in
+    `timezone` (local time by default), starting from `start_time`.
+
+    When runs were missed, because the event loop stalled or the process was down, `misfire`
+    decides: "coalesce" runs the task once, "catch_up" runs it once for every missed slot (at most
+    MAX_CATCH_UP times). Missed runs go through `overlap` like any due run, so replaying more of
+    them than `max_concurrency` takes a "queue" policy or a higher `max_concurrency`.
+
+    At most `max_concurrency` runs are in flight. When a run is due while that many are still
+    going, `overlap` decides: "skip" drops it, "queue" starts it once a run finishes (holding at
+    most `max_concurrency` runs back) and "replace" cancels the oldest run. Runs taking longer
+    than `timeout` seconds are cancelled; sync functions run in the scheduler's thread pool, or in
+    its process pool with `executor="process"`.
+    """
 
     def __init__(
         self,
         name: str,
         func: Callable[..., Any],
-        interval: int,
-        unit: Unit,
+        interval: Optional[float] = None,
+        unit: Optional[Unit] = None,
         start_time: Optional[datetime] = None,
         last_run: Optional[datetime] = None,
         next_run: Optional[datetime] = None,
         args: tuple[Any, ...] = (),
         kwargs: Optional[dict[str, Any]] = None,
+        max_concurrency: int = 1,
+        overlap: str = "skip",
+        timeout: Optional[float] = None,
+        executor: str = "thread",
+        cron: Optional[Union[str, CronExpression]] = None,
+        timezone: Optional[Union[str, tzinfo]] = None,
+        misfire: str = "coalesce",
     ) -> None:
+        if overlap not in ("skip", "queue", "replace"):
+            raise ValueError(f"Invalid overlap policy: {overlap}. Must be one of: skip, queue, replace")
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Invalid executor: {executor}. Must be one of: thread, process")
+        if max_concurrency < 1:
+            raise ValueError("Task max_concurrency must be at least 1")
+        if misfire not in ("coalesce", "catch_up"):
+            raise ValueError(f"Invalid misfire policy: {misfire}. Must be one of: coalesce, catch_up")
+        if cron is None and (interval is None or unit is None):
+            raise ValueError("Task needs either a cron expression or an interval and unit")
+
         self.name = name
         self.func = func
         self.interval = interval
         self.unit = unit
-        self.start_time = start_time
+        self.start_time = start_time if start_time is not None else datetime.now()
+        self.anchored = start_time is not None  # Whether the schedule is tied to a given start_time
         self.last_run = last_run
         self.next_run = next_run
         self.args = args
         self.kwargs = kwargs if kwargs is not None else {}
-
-        if self.start_time is None:
-            self.start_time = datetime.now()
+        self.max_concurrency = max_concurrency
+        self.overlap = overlap
+        self.timeout = timeout
+        self.executor = executor
+        self.running: dict[asyncio.Task[None], None] = {}  # In start order, for "replace"
+        self.queued = 0
+        self.misfire = misfire
+        self.cron = CronExpression(cron) if isinstance(cron, str) else cron
+        self.timezone = ZoneInfo(timezone) if isinstance(timezone, str) else timezone
+
+        if self.cron is not None:
+            self.period = 0.0
+            self.fire_time = self._next_fire(self._wall_time(self.start_time) - timedelta(seconds=1))
+        else:
+            assert interval is not None and unit is not None
+            self.period = interval * UNIT_SECONDS[unit]
+            self.anchor = time.monotonic() + (self.start_time - datetime.now()).total_seconds()
+            self.slot = 0  # Number of intervals between start_time and the next run
+        self.deadline = 0.0
         self.calculate_next_run()
 
-    def calculate_next_run(self) -> None:
-        """Calculate when this task should run next."""
-        if self.last_run is None:
-            self.next_run = self.start_time
+    def state(self) -> TaskState:
+        return TaskState(
+            last_run=self.last_run.timestamp() if self.last_run is not None else None,
+            next_run=self.next_run.timestamp() if self.next_run is not None else None,
+        )
+
+    def restore(self, state: TaskState) -> None:
+        """Continue the schedule from a saved state, runs missed meanwhile are handled as misfires."""
+        if state["last_run"] is not None:
+            self.last_run = datetime.fromtimestamp(state["last_run"])
+        if state["next_run"] is None:
+            return
+        if self.cron is not None:
+            self.fire_time = self._wall_time(datetime.fromtimestamp(state["next_run"]))
         else:
-            if self.unit == Unit.SECONDS:
-                self.next_run = self.last_run + timedelta(seconds=self.interval)
-            elif self.unit == Unit.MINUTES:
-                self.next_run = self.last_run + timedelta(minutes=self.interval)
-            elif self.unit == Unit.HOURS:
-                self.next_run = self.last_run + timedelta(hours=self.interval)
-            elif self.unit == Unit.DAYS:
-                self.next_run = self.last_run + timedelta(days=self.interval)
+            next_run = datetime.fromtimestamp(state["next_run"], self.start_time.tzinfo)
+            if self.anchored and next_run >= self.start_time:
+                self.slot = round((next_run - self.start_time).total_seconds() / self.period)
+            else:
+                # Without a start_time of its own, the task keeps the schedule it had before
+                self.start_time = next_run
+                self.anchor = time.monotonic() + (next_run - datetime.now(next_run.tzinfo)).total_seconds()
+                self.slot = 0
+        self.calculate_next_run()
+
+    def _wall_time(self, moment: datetime) -> datetime:
+        """`moment` as an aware datetime in the task's timezone, naive ones are taken as local time."""
+        return moment.astimezone(self.timezone)
+
+    def _next_fire(self, after: datetime) -> datetime:
+        """The first cron fire time after the aware `after`, skipping wall times repeated by a DST change."""
+        assert self.cron is not None
+        wall = after.astimezone(self.timezone).replace(tzinfo=None)
+        while True:
+            wall = self.cron.next_after(wall)
+            if self.timezone is None:
+                fire = wall.astimezone()  # Local time, with the UTC offset in effect at that date
+            else:
+                # Round trip through the timestamp, so wall times in a DST gap move past it
+                fire = datetime.fromtimestamp(wall.replace(tzinfo=self.timezone).timestamp(), self.timezone)
+            # Aware datetimes sharing a tzinfo compare by wall clock, timestamps stay right across DST changes
+            if fire.timestamp() > after.timestamp():
+                return fire
+
+    def calculate_next_run(self, now: Optional[float] = None) -> int:
+        """Calculate when this task should run next, given the monotonic time `now` at which it ran.
+
+        Returns how many runs were due: 1, plus the slots missed in between, which are skipped. A cron
+        task woken before its fire time (the wall clock was set back) returns 0.
+        """
+        if self.cron is not None:
+            due = 0
+            if now is not None:
+                # Compare in UTC, wall times of one timezone repeat or jump when DST changes
+                timestamp = time.time() + (now - time.monotonic())
+                while self.fire_time.timestamp() <= timestamp and due < MAX_CATCH_UP:
+                    due += 1
+                    self.fire_time = self._next_fire(self.fire_time)
+                if self.fire_time.timestamp() <= timestamp:
+                    self.fire_time = self._next_fire(datetime.fromtimestamp(timestamp, self.fire_time.tzinfo))
+            self.next_run = self.fire_time
+            self.deadline = time.monotonic() + (self.fire_time.timestamp() - time.time())
+            return due
+
+        due = 1
+        if now is not None:
+            slot = math.floor((now - self.anchor) / self.period)
+            due = max(1, slot - self.slot + 1)
+            self.slot = max(self.slot + 1, slot + 1)
+        self.deadline = self.anchor + self.slot * self.period
+        self.next_run = self.start_time + timedelta(seconds=self.slot * self.period)
+        return due
 
 
 class CronScheduler:
-    """A cron-like scheduler for running background tasks."""
+    """A cron-like scheduler for running background tasks.
+
+    Tasks are kept in a min-heap on their monotonic deadline and the loop sleeps until the earliest
+    one is due, or until a task is added or removed. Entries of removed or rescheduled tasks are
+    left in the heap and skipped when they surface.
 
-    def __init__(self) -> None:
+    `max_concurrency` caps the runs in flight across all tasks. Sync functions run in a dedicated
+    pool of `max_workers` threads, so slow jobs can't starve the default executor, and in a pool
+    of `process_workers` processes for tasks with `executor="process"`; both are created on first use.
+
+    With an `election`, only the elected leader among the workers runs tasks; the others keep
+    their schedule and take over when the leader goes away.
+
+    With a `store`, task states saved by a previous process are loaded on start, so schedules
+    survive restarts. Changed states and finished runs are written every `flush_interval`
+    seconds, in one batch on a thread of their own.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 100,
+        max_workers: int = 8,
+        process_workers: Optional[int] = None,
+        election: Optional[LeaderElection] = None,
+        store: Optional[JobStore] = None,
+        flush_interval: float = 1.0,
+    ) -> None:
         self.tasks: dict[str, ScheduledTask] = {}
         self.running = False
-        self.check_interval = 1.0  # Check every second for tasks to run
+        self.queue: list[tuple[float, int, ScheduledTask]] = []
+        self.counter = itertools.count()  # Tie-breaker, so equal deadlines never compare tasks
+        self.wakeup = asyncio.Event()
+        self.loop_task: Optional[asyncio.Task[None]] = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.running_tasks: set[asyncio.Task[None]] = set()  # Strong references, the loop only keeps weak ones
+        self.max_workers = max_workers
+        self.process_workers = process_workers
+        self.thread_pool: Optional[ThreadPoolExecutor] = None
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+        self.election = election
+        self.store = store
+        self.flush_interval = flush_interval
+        self.store_executor: Optional[ThreadPoolExecutor] = None
+        self.flush_task: Optional[asyncio.Task[None]] = None
+        self.saved_states: dict[str, TaskState] = {}
+        self.dirty: set[str] = set()  # Tasks whose state changed since the last write
+        self.pending_runs: list[RunRecord] = []
 
     def add_task(self, task: Task) -> None:
-        if task.func is None or task.interval is None or task.unit is None:
+        if task.func is None or (task.cron is None and (task.interval is None or task.unit is None)):
             log.warning(f"Skipping task '{task.name}' - missing required parameters")
             return
+        if task.interval is not None and task.interval <= 0:
+            log.warning(f"Skipping task '{task.name}' - interval must be positive")
+            return
 
         scheduled = ScheduledTask(
             name=task.name,
@@ -99,14 +411,33 @@ class CronScheduler:
             start_time=task.start_time,
             args=task.args,
             kwargs=task.kwargs,
+            max_concurrency=task.max_concurrency,
+            overlap=task.overlap,
+            timeout=task.timeout,
+            executor=task.executor,
+            cron=task.cron,
+            timezone=task.timezone,
+            misfire=task.misfire,
         )
+        saved = self.saved_states.get(task.name)
+        if saved is not None:
+            scheduled.restore(saved)
         self.tasks[task.name] = scheduled
-        log.info(f"Added scheduled task '{task.name}' to run every {task.interval} {task.unit.value}")
+        self._push(scheduled)
+        if task.cron is not None:
+            log.info(f"Added scheduled task '{task.name}' to run at '{task.cron}', next at {scheduled.next_run}")
+        elif task.unit is not None:
+            log.info(f"Added scheduled task '{task.name}' to run every {task.interval} {task.unit.value}")
 
     def remove_task(self, name: str) -> bool:
         """Remove a scheduled task."""
         if name in self.tasks:
             del self.tasks[name]
+            # Rebuild the heap once it is mostly entries of removed tasks
+            if len(self.queue) > 2 * len(self.tasks) + 64:
+                self.queue = [entry for entry in self.queue if self._is_current(entry)]
+                heapq.heapify(self.queue)
+            self.wakeup.set()
             log.info(f"Removed scheduled task '{name}'")
             return True
         return False
@@ -119,50 +450,176 @@ class CronScheduler:
         """List all scheduled task names."""
         return list(self.tasks.keys())
 
+    def _push(self, task: ScheduledTask) -> None:
+        heapq.heappush(self.queue, (task.deadline, next(self.counter), task))
+        if self.queue[0][2] is task:
+            self.wakeup.set()  # Due before whatever the loop is sleeping on
+
+    def _is_current(self, entry: tuple[float, int, ScheduledTask]) -> bool:
+        deadline, _, task = entry
+        return self.tasks.get(task.name) is task and task.deadline == deadline
+
+    def _executor(self, task: ScheduledTask) -> Executor:
+        if task.executor == "process":
+            if self.process_pool is None:
+                self.process_pool = ProcessPoolExecutor(self.process_workers)
+            return self.process_pool
+        if self.thread_pool is None:
+            self.thread_pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="future-cron")
+        return self.thread_pool
+
+    def _dispatch(self, task: ScheduledTask) -> None:
+        """Start a due run of the task, unless its overlap policy says otherwise."""
+        if len(task.running) >= task.max_concurrency:
+            if task.overlap == "queue" and task.queued < task.max_concurrency:
+                task.queued += 1
+                return
+            if task.overlap != "replace":
+                log.warning(f"Skipping scheduled task '{task.name}', {len(task.running)} runs still in progress")
+                return
+            oldest = next(iter(task.running))
+            log.warning(f"Cancelling scheduled task '{task.name}' started earlier, replaced by a new run")
+            oldest.cancel()
+            del task.running[oldest]
+        self._start(task)
+
+    def _start(self, task: ScheduledTask) -> None:
+        run = asyncio.create_task(self._run_task(task), name=f"cron:{task.name}")
+        task.running[run] = None
+        self.running_tasks.add(run)
+        run.add_done_callback(functools.partial(self._finished, task))
+
+    def _finished(self, task: ScheduledTask, run: asyncio.Task[None]) -> None:
+        task.running.pop(run, None)
+        self.running_tasks.discard(run)
+        if task.queued and self.running and self.tasks.get(task.name) is task:
+            task.queued -= 1
+            self._start(task)
+
     async def _run_task(self, task: ScheduledTask) -> None:
         """Run a single task."""
+        started, outcome, error = time.time(), "cancelled", None
+        deadline: Optional[asyncio.Timeout] = None
         try:
-            log.debug(f"Running scheduled task '{task.name}'")
-            if asyncio.iscoroutinefunction(task.func):
-                # Run async functions directly
-                await task.func(*task.args, **task.kwargs)
-            else:
-                # Run sync functions in thread pool
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, task.func, *task.args, **task.kwargs)
+            async with self.semaphore:
+                log.debug(f"Running scheduled task '{task.name}'")
+                async with asyncio.timeout(task.timeout) as deadline:
+                    if asyncio.iscoroutinefunction(task.func):
+                        # Run async functions directly
+                        await task.func(*task.args, **task.kwargs)
+                    else:
+                        # Run sync functions in our own pool, a timeout stops waiting but can't interrupt a thread
+                        loop = asyncio.get_running_loop()
+                        await loop.run_in_executor(self._executor(task), functools.partial(task.func, *task.args, **task.kwargs))
 
             task.last_run = datetime.now()
-            task.calculate_next_run()
+            outcome = "success"
             if task.next_run:
                 log.debug(f"Completed scheduled task '{task.name}', next run at {task.next_run.strftime('%Y-%m-%d %H:%M:%S')}")
             else:
                 log.debug(f"Completed scheduled task '{task.name}'")
 
         except Exception as e:
-            log.error(f"Error running scheduled task '{task.name}': {e}")
-            # Don't update last_run on error, so it will retry next cycle
+            # Only our deadline makes a timeout, a TimeoutError raised by the task itself is an error like any other
+            if isinstance(e, TimeoutError) and deadline is not None and deadline.expired():
+                outcome = "timeout"
+                log.error(f"Scheduled task '{task.name}' timed out after {task.timeout}s")
+            else:
+                outcome, error = "error", str(e)
+                log.error(f"Error running scheduled task '{task.name}': {e}")
+            # Don't update last_run on error, the task runs again at its next slot
+        finally:
+            if self.store is not None:
+                self.pending_runs.append(RunRecord(task=task.name, started=started, duration=time.time() - started, outcome=outcome, error=error))
+                self.dirty.add(task.name)
+
+    async def _store_call(self, func: Callable[..., T], *args: Any) -> T:
+        """Call a job store method on the store's thread, which keeps its calls in order."""
+        if self.store_executor is None:
+            self.store_executor = ThreadPoolExecutor(1, thread_name_prefix="future-jobstore")
+        return await asyncio.get_running_loop().run_in_executor(self.store_executor, func, *args)
+
+    async def load_state(self) -> None:
+        """Load the saved task states, tasks already added continue from theirs."""
+        assert self.store is not None
+        self.saved_states = await self._store_call(self.store.load)
+        for name, state in self.saved_states.items():
+            task = self.tasks.get(name)
+            if task is not None:
+                deadline = task.deadline
+                task.restore(state)
+                if task.deadline != deadline:
+                    self._push(task)
+        log.info(f"Loaded the state of {len(self.saved_states)} scheduled tasks")
+
+    async def flush(self) -> None:
+        """Write changed task states and finished runs to the store."""
+        if self.store is None or not (self.dirty or self.pending_runs):
+            return
+        if self.election is not None and not self.election.is_leader():
+            self.dirty.clear()  # The leader keeps the store up to date
+            self.pending_runs.clear()
+            return
+        states = {name: self.tasks[name].state() for name in self.dirty if name in self.tasks}
+        runs, self.pending_runs = self.pending_runs, []
+        self.dirty = set()
+        try:
+            await self._store_call(self.store.write, states, runs)
+        except Exception as e:
+            log.error(f"Error writing scheduled task states: {e}")
+            self.dirty.update(states)  # The latest state is written with the next batch
+
+    async def get_history(self, name: str, limit: int = 20) -> list[RunRecord]:
+        """The latest runs of a task from the store, newest first."""
+        assert self.store is not None
+        await self.flush()
+        return await self._store_call(self.store.history, name, limit)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
 
     async def _scheduler_loop(self) -> None:
-        """Main scheduler loop that checks for tasks to run."""
+        """Main scheduler loop, sleeping until the next task is due."""
         log.info("Starting cron scheduler...")
 
         while self.running:
-            now = datetime.now()
-            tasks_to_run = []
-
-            # Check which tasks need to run
-            for task in self.tasks.values():
-                if task.next_run and now >= task.next_run:
-                    tasks_to_run.append(task)
-
-            # Run tasks that are due
-            if tasks_to_run:
-                log.debug(f"Running {len(tasks_to_run)} scheduled tasks")
-                for task in tasks_to_run:
-                    asyncio.create_task(self._run_task(task))
-
-            # Wait before next check
-            await asyncio.sleep(self.check_interval)
+            self.wakeup.clear()
+            now = time.monotonic()
+
+            # Run tasks that are due, scheduling their next run before they start
+            while self.queue and self.queue[0][0] <= now:
+                entry = heapq.heappop(self.queue)
+                if not self._is_current(entry):
+                    continue
+                task = entry[2]
+                due = task.calculate_next_run(now)
+                heapq.heappush(self.queue, (task.deadline, next(self.counter), task))
+                if due == 0:
+                    continue  # Woken early, the task waits for its fire time again
+                if self.election is not None and not self.election.is_leader():
+                    log.debug(f"Not running scheduled task '{task.name}', another worker leads")
+                    continue
+                self._dispatch(task)
+                if self.store is not None:
+                    self.dirty.add(task.name)
+                if due > 1 and task.misfire == "catch_up":
+                    log.warning(f"Catching up on {due - 1} missed runs of scheduled task '{task.name}'")
+                    # Past max_concurrency running and as many queued, further runs could only be dropped or replace a run
+                    for _ in range(min(due - 1, 2 * task.max_concurrency)):
+                        self._dispatch(task)
+
+            # Drop stale entries so we don't wake up for a removed task
+            while self.queue and not self._is_current(self.queue[0]):
+                heapq.heappop(self.queue)
+
+            timeout = self.queue[0][0] - now if self.queue else None
+            try:
+                async with asyncio.timeout(timeout):
+                    await self.wakeup.wait()
+            except TimeoutError:
+                pass
 
         log.info("Cron scheduler stopped")
 
@@ -170,11 +627,42 @@ class CronScheduler:
         """Start the scheduler."""
         if not self.running:
             self.running = True
-            asyncio.create_task(self._scheduler_loop())
+            if self.election is not None:
+                await self.election.start()
+            if self.store is not None:
+                await self.load_state()
+                self.flush_task = asyncio.create_task(self._flush_loop())
+            self.loop_task = asyncio.create_task(self._scheduler_loop())
 
     async def stop(self) -> None:
         """Stop the scheduler."""
         self.running = False
+        self.wakeup.set()
+        if self.loop_task is not None:
+            await self.loop_task
+            self.loop_task = None
+
+        # Cancel runs still in progress and release the worker pools
+        for run in list(self.running_tasks):
+            run.cancel()
+        await asyncio.gather(*self.running_tasks, return_exceptions=True)
+        for pool in (self.thread_pool, self.process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self.thread_pool = self.process_pool = None
+
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+            self.flush_task = None
+        if self.store is not None:
+            await self.flush()
+            await self._store_call(self.store.close)
+        if self.store_executor is not None:
+            self.store_executor.shutdown()
+            self.store_executor = None
+        if self.election is not None:
+            await self.election.stop()
 
 
 # --- Minimal cron task functions ---
@@ -182,7 +670,9 @@ async def check_dns(domain: str = "example.com") -> None:
     import socket
 
     try:
-        ip = socket.gethostbyname(domain)
+        # Resolve in the loop's resolver thread, a blocking lookup here would stall the loop and ignore timeouts
+        addresses = await asyncio.get_running_loop().getaddrinfo(domain, None, family=socket.AF_INET)
+        ip = addresses[0][4][0]
         log.info(f"DNS: {domain} -> {ip}")
     except socket.gaierror as e:
         log.error(f"DNS lookup failed for {domain}: {e}")
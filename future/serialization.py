@@ -0,0 +1,62 @@
+"""
+JSON encoding and decoding shared by requests and responses.
+
+msgspec encodes straight to bytes and decodes straight from bytes, so there is no
+intermediate str on either side. The encoder and decoders are created once and reused.
+The stdlib json module is used when msgspec is not installed, or for values msgspec
+cannot encode (e.g. dicts with non-string keys).
+"""
+
+import json
+
+from typing import Any, Optional
+
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None  # type: ignore[assignment]
+
+
+class JSONValidationError(ValueError):
+    """Raised when JSON is well-formed but does not match the requested type."""
+
+
+if msgspec is not None:
+    # Unsupported types are serialized with str(), like json.dumps(default=str)
+    json_encoder = msgspec.json.Encoder(enc_hook=str)
+    json_decoder = msgspec.json.Decoder()
+    json_typed_decoders: dict[Any, Any] = {}
+
+
+def json_dumps(data: Any) -> bytes:
+    """Serialize data to JSON bytes."""
+    if msgspec is not None:
+        try:
+            return json_encoder.encode(data)
+        except (TypeError, msgspec.EncodeError):
+            pass
+    return json.dumps(data, default=str, ensure_ascii=False).encode("utf-8")
+
+
+def json_loads(data: bytes, type: Optional[Any] = None) -> Any:
+    """Deserialize JSON bytes, optionally validating them into `type` (e.g. a msgspec.Struct).
+
+    Raises ValueError for malformed JSON and JSONValidationError for data that does not match `type`.
+    """
+    if msgspec is None:
+        if type is not None:
+            raise RuntimeError("Typed JSON decoding requires msgspec")
+        return json.loads(data)
+
+    decoder: Any = json_decoder
+    if type is not None:
+        decoder = json_typed_decoders.get(type)
+        if decoder is None:
+            decoder = json_typed_decoders[type] = msgspec.json.Decoder(type)
+    try:
+        return decoder.decode(data)
+    except msgspec.ValidationError as e:
+        raise JSONValidationError(str(e)) from e
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
@@ -25,6 +25,7 @@ APP_SSL_CERT_FILE = str(env.get("APP_SSL_CERT_FILE", "./cert.pem"))
 APP_SSL_KEY_FILE = str(env.get("APP_SSL_KEY_FILE", "./key.pem"))
 APP_SSL_PASSPHRASE = str(env.get("APP_SSL_PASSPHRASE", "changeme"))
 APP_DOMAIN = str(env.get("APP_DOMAIN", "example.com"))
+APP_ROUTER = str(env.get("APP_ROUTER", "tree"))  # tree, regex or linear
 
 # Database settings sourced from .env
 DB_DRIVER = str(env.get("DB_DRIVER", "sqlite"))
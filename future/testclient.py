@@ -1,9 +1,14 @@
+import asyncio
+import json
+
 from typing import Any
 from urllib.parse import urlparse
 
 import httpx
 
 from future.application import Future
+from future.types import ASGIMessage
+from future.websockets import WebSocketDisconnect
 
 
 class FutureTestClient:
@@ -23,12 +28,21 @@ class FutureTestClient:
         response = await self.client.get(url, headers=headers)
         return response
 
-    async def websocket_connect(self, url: str, headers: dict[str, str] | None = None) -> Any:
-        """Connect to a WebSocket endpoint for testing using ASGI transport."""
+    async def post(self, url: str, content: bytes | str | None = None, headers: dict[str, str] | None = None) -> httpx.Response:
+        response = await self.client.post(url, content=content, headers=headers)
+        return response
+
+    async def head(self, url: str, headers: dict[str, str] | None = None) -> httpx.Response:
+        response = await self.client.head(url, headers=headers)
+        return response
+
+    async def options(self, url: str, headers: dict[str, str] | None = None) -> httpx.Response:
+        response = await self.client.options(url, headers=headers)
+        return response
+
+    async def websocket_connect(self, url: str, headers: dict[str, str] | None = None, subprotocols: list[str] | None = None) -> "WebSocketTestSession":
+        """Open a WebSocket connection to the app, running its handler in a background task."""
         parsed = urlparse(url)
-        path = parsed.path
-        if parsed.query:
-            path += "?" + parsed.query
 
         # Convert headers to ASGI format
         ws_headers = []
@@ -39,37 +53,80 @@ class FutureTestClient:
         # Create ASGI scope for WebSocket
         scope = {
             "type": "websocket",
-            "path": path,
+            "asgi": {"version": "3.0"},
+            "path": parsed.path,
             "headers": ws_headers,
-            "raw_path": path.encode(),
-            "query_string": b"",
+            "raw_path": parsed.path.encode(),
+            "query_string": parsed.query.encode(),
             "client": ("127.0.0.1", 12345),
             "server": ("127.0.0.1", 8000),
-            "scheme": "ws",
+            "scheme": parsed.scheme or "ws",
+            "subprotocols": subprotocols or [],
         }
 
-        # Create a simple WebSocket client that works with ASGI
-        return await self._create_websocket_connection(scope)
-
-    async def _create_websocket_connection(self, scope: dict[str, Any]) -> Any:
-        """Create a WebSocket connection using ASGI transport."""
-
-        # This is a simplified implementation that works with the framework
-        class MockWebSocket:
-            def __init__(self, scope: dict[str, Any]) -> None:
-                self.scope = scope
-                self.messages: list[tuple[str, str]] = []
+        session = WebSocketTestSession(self.app, scope)
+        await session.connect()
+        return session
 
-            async def send(self, message: str) -> None:
-                self.messages.append(("send", message))
 
-            async def recv(self) -> str:
-                # Return a mock response based on the last sent message
-                if self.messages and self.messages[-1][0] == "send":
-                    return f"Echo: {self.messages[-1][1]}"
-                return "Echo: Hello from WebSocket!"
+class WebSocketTestSession:
+    """The client side of a WebSocket connection to the app, exchanging ASGI messages in memory."""
 
-            async def close(self) -> None:
-                pass
+    def __init__(self, app: Future, scope: dict[str, Any]) -> None:
+        self.app = app
+        self.scope = scope
+        self.to_app: asyncio.Queue[ASGIMessage] = asyncio.Queue()
+        self.from_app: asyncio.Queue[ASGIMessage] = asyncio.Queue()
+        self.task: asyncio.Task[None] | None = None
+        self.accepted_subprotocol: str | None = None
+
+    async def connect(self) -> None:
+        self.task = asyncio.create_task(self.app(self.scope, self.to_app.get, self.from_app.put))
+        await self.to_app.put({"type": "websocket.connect"})
+        message = await self.receive_message()
+        if message["type"] == "websocket.close":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason") or "")
+        self.accepted_subprotocol = message.get("subprotocol")
+
+    async def receive_message(self, timeout: float = 5) -> ASGIMessage:
+        get = asyncio.ensure_future(self.from_app.get())
+        assert self.task is not None
+        done, _ = await asyncio.wait({get, self.task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if get in done:
+            return get.result()
+        get.cancel()
+        if self.task in done:
+            self.task.result()  # Re-raise the handler's exception
+            raise WebSocketDisconnect(1006, "The app closed the connection without a close message")
+        raise TimeoutError("No message from the app")
+
+    async def send(self, data: str | bytes) -> None:
+        if isinstance(data, bytes):
+            await self.to_app.put({"type": "websocket.receive", "bytes": data})
+        else:
+            await self.to_app.put({"type": "websocket.receive", "text": data})
+
+    async def send_json(self, data: Any) -> None:
+        await self.send(json.dumps(data))
+
+    async def recv(self) -> str | bytes:
+        message = await self.receive_message()
+        if message["type"] == "websocket.close":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason") or "")
+        data: str | bytes = message["text"] if message.get("text") is not None else message["bytes"]
+        return data
+
+    async def receive_json(self) -> Any:
+        return json.loads(await self.recv())
+
+    async def close(self, code: int = 1000) -> None:
+        await self.to_app.put({"type": "websocket.disconnect", "code": code})
+        if self.task is not None:
+            await asyncio.wait_for(self.task, timeout=5)
+
+    async def __aenter__(self) -> "WebSocketTestSession":
+        return self
 
-        return MockWebSocket(scope)
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self.task is not None and not self.task.done():
+            await self.close()
@@ -4,9 +4,12 @@ import enum
 import re
 
 from collections.abc import Awaitable, MutableMapping
-from typing import Any, Callable, TypedDict
+from typing import TYPE_CHECKING, Any, Callable, TypedDict
 
 
+if TYPE_CHECKING:
+    from future.routing import Route
+
 # ASGI specific
 ASGIScope = MutableMapping[str, Any]
 ASGIMessage = MutableMapping[str, Any]
@@ -24,6 +27,7 @@ class AsgiEventType(enum.StrEnum):
     HTTP_REQUEST = "http.request"
     HTTP_RESPONSE_START = "http.response.start"
     HTTP_RESPONSE_BODY = "http.response.body"
+    HTTP_DISCONNECT = "http.disconnect"
     WEBSOCKET_CONNECT = "websocket.connect"
     WEBSOCKET_ACCEPT = "websocket.accept"
     WEBSOCKET_RECEIVE = "websocket.receive"
@@ -36,7 +40,28 @@ class RegexConfig(TypedDict):
     paths: list[re.Pattern[str]]
 
 
+# A middleware's intercept and whether its result has to be awaited
+Intercept = tuple[Callable[..., Any], bool]
+
+
 class RouteConfig(TypedDict):
+    route: Route
     handler: Callable[..., Any]
     middleware: dict[str, list[dict[str, list[Any]]]]  # type: ignore
+    before: tuple[Intercept, ...]  # Request middlewares in call order
+    after: tuple[Intercept, ...]  # Response middlewares in call order
     regex: dict[str, list[re.Pattern[str] | re.Pattern[bytes]]] | None
+    coalesce: tuple[str, ...] | None  # Request headers keying coalesced handler calls, None when disabled
+
+
+class TaskState(TypedDict):
+    last_run: float | None  # UTC timestamps
+    next_run: float | None
+
+
+class RunRecord(TypedDict):
+    task: str
+    started: float  # UTC timestamp
+    duration: float  # Seconds
+    outcome: str  # success, error, timeout or cancelled
+    error: str | None
@@ -0,0 +1,393 @@
+"""
+WebSocket connections and broadcasting.
+
+A WebSocket handler receives a `WebSocketConnection`, a Request that can also accept the
+connection, receive and send messages and close it:
+
+    async def echo(websocket: WebSocketConnection, **params: Any) -> None:
+        await websocket.accept()
+        async for message in websocket:
+            await websocket.send_text(f"Echo: {message}")
+
+Outgoing messages go through a bounded queue drained by a sender task, so a slow client makes
+`send_*` wait instead of growing memory without limit. `WebSocketHub` groups connections into
+rooms and broadcasts a message to all of them, building the ASGI message once.
+`WebSocketBatcher` coalesces high-rate events into fewer, larger frames.
+"""
+
+import asyncio
+import enum
+import time
+
+from collections.abc import AsyncIterator
+from typing import Any, Optional, Union
+
+from future.logger import log
+from future.requests import Request
+from future.serialization import json_dumps, json_loads
+from future.types import AsgiEventType, ASGIMessage, ASGIReceive, ASGIScope, ASGISend
+
+
+class WebSocketDisconnect(Exception):
+    """Raised when the client closed the connection, or it was closed from the server side."""
+
+    def __init__(self, code: int = 1000, reason: str = "") -> None:
+        super().__init__(f"WebSocket closed with code {code}")
+        self.code = code
+        self.reason = reason
+
+
+class WebSocketState(enum.Enum):
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    DISCONNECTED = "disconnected"
+
+
+class WebSocketConnection(Request):
+    """A WebSocket connection, passed to WebSocket handlers in place of the request.
+
+    `send_queue_size` bounds the number of outgoing messages waiting for the client; `send_*`
+    wait for room once it is full. Broadcasts never wait, see `WebSocketHub`. Closing waits at
+    most `close_timeout` seconds for the queued messages to go out before dropping them.
+    """
+
+    def __init__(self, scope: ASGIScope, receive: ASGIReceive, send: ASGISend, send_queue_size: int = 64, close_timeout: float = 5.0) -> None:
+        super().__init__(scope, receive)
+        self._send = send
+        self.close_timeout = close_timeout
+        self.state = WebSocketState.CONNECTING
+        self.close_code: Optional[int] = None
+        self.queue: asyncio.Queue[ASGIMessage] = asyncio.Queue(maxsize=send_queue_size)
+        self.sender: Optional[asyncio.Task[None]] = None
+        self.closing = False  # a close message is queued
+        self.hubs: set["WebSocketHub"] = set()
+
+    async def accept(self, subprotocol: Optional[str] = None, headers: Optional[dict[str, str]] = None) -> None:
+        if self.state is not WebSocketState.CONNECTING:
+            raise RuntimeError("WebSocket connection was already accepted or closed")
+        message = await self.receive()
+        if message["type"] == AsgiEventType.WEBSOCKET_DISCONNECT:
+            self._disconnected(message.get("code", 1000))
+            raise WebSocketDisconnect(self.close_code or 1000)
+
+        accept: ASGIMessage = {"type": AsgiEventType.WEBSOCKET_ACCEPT, "subprotocol": subprotocol}
+        if headers:
+            accept["headers"] = [(key.lower().encode(), value.encode()) for key, value in headers.items()]
+        await self._send(accept)
+        self.state = WebSocketState.CONNECTED
+        self.sender = asyncio.create_task(self._sender())
+
+    async def _sender(self) -> None:
+        """Send queued messages in order, until a close message went out or the client is gone."""
+        try:
+            while True:
+                message = await self.queue.get()
+                await self._send(message)
+                if message["type"] == AsgiEventType.WEBSOCKET_CLOSE:
+                    self._disconnected(message.get("code", 1000))
+                    return
+        except Exception as e:  # e.g. uvicorn's ClientDisconnected
+            if not isinstance(e, OSError):
+                log.error(f"Sending to WebSocket connection {self.path} failed: {e}")
+            self._disconnected(1006)
+
+    def _disconnected(self, code: int) -> None:
+        self.state = WebSocketState.DISCONNECTED
+        if self.close_code is None:
+            self.close_code = code
+        # Wake the producers waiting for room, nothing queued goes out anymore
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        for hub in list(self.hubs):
+            hub.leave_all(self)
+
+    async def _drain(self, message: Optional[ASGIMessage] = None) -> None:
+        """Wait for the sender to send the queued messages and then `message`, cancel it after `close_timeout` seconds."""
+        if self.sender is None or self.sender.done():
+            return
+        sender = self.sender
+
+        async def drain() -> None:
+            if message is not None:
+                await self.queue.put(message)
+            await asyncio.shield(sender)
+
+        try:
+            await asyncio.wait_for(drain(), timeout=self.close_timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"WebSocket connection {self.path} did not close within {self.close_timeout}s, dropping it")
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+            self._disconnected(1006)
+
+    async def receive_message(self) -> ASGIMessage:
+        """The next websocket.receive message, raises WebSocketDisconnect once the client is gone."""
+        if self.state is WebSocketState.CONNECTING:
+            raise RuntimeError('WebSocket connection is not accepted yet, call "accept" first')
+        if self.state is WebSocketState.DISCONNECTED:
+            raise WebSocketDisconnect(self.close_code or 1000)
+        message = await self.receive()
+        if message["type"] == AsgiEventType.WEBSOCKET_DISCONNECT:
+            self._disconnected(message.get("code", 1000))
+            raise WebSocketDisconnect(self.close_code or 1000, message.get("reason") or "")
+        return message
+
+    async def receive_text(self) -> str:
+        message = await self.receive_message()
+        text: Optional[str] = message.get("text")
+        return text if text is not None else bytes(message["bytes"]).decode()
+
+    async def receive_bytes(self) -> bytes:
+        message = await self.receive_message()
+        data: Optional[bytes] = message.get("bytes")
+        return data if data is not None else str(message["text"]).encode()
+
+    async def receive_json(self, type: Optional[Any] = None) -> Any:
+        message = await self.receive_message()
+        data = message.get("text")
+        return json_loads(data.encode() if data is not None else message["bytes"], type)
+
+    async def __aiter__(self) -> AsyncIterator[Union[str, bytes]]:
+        """Yield incoming text or bytes messages until the client disconnects."""
+        try:
+            while True:
+                message = await self.receive_message()
+                text = message.get("text")
+                yield text if text is not None else message["bytes"]
+        except WebSocketDisconnect:
+            return
+
+    async def send(self, message: ASGIMessage) -> None:
+        """Queue an ASGI message, waiting while the send queue is full."""
+        if self.state is not WebSocketState.CONNECTED:
+            raise WebSocketDisconnect(self.close_code or 1000)
+        await self.queue.put(message)
+
+    async def send_text(self, data: str) -> None:
+        await self.send({"type": AsgiEventType.WEBSOCKET_SEND, "text": data})
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.send({"type": AsgiEventType.WEBSOCKET_SEND, "bytes": data})
+
+    async def send_json(self, data: Any) -> None:
+        await self.send({"type": AsgiEventType.WEBSOCKET_SEND, "text": json_dumps(data).decode()})
+
+    def send_nowait(self, message: ASGIMessage) -> bool:
+        """Queue an ASGI message without waiting, returns False when the send queue is full."""
+        if self.state is not WebSocketState.CONNECTED:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def abort(self, code: int = 1013, reason: str = "") -> None:
+        """Drop the queued messages and close as soon as the sender is free, e.g. for a client too slow to keep up."""
+        if self.state is not WebSocketState.CONNECTED:
+            return
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({"type": AsgiEventType.WEBSOCKET_CLOSE, "code": code, "reason": reason})
+        self.closing = True
+        self.state = WebSocketState.DISCONNECTED
+        self.close_code = code
+        for hub in list(self.hubs):
+            hub.leave_all(self)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        """Close the connection once the queued messages are sent, or reject it if it wasn't accepted."""
+        if self.state is WebSocketState.CONNECTING:
+            await self._send({"type": AsgiEventType.WEBSOCKET_CLOSE, "code": code, "reason": reason})
+            self._disconnected(code)
+            return
+        if self.state is WebSocketState.CONNECTED:
+            self.state = WebSocketState.DISCONNECTED
+            self.closing = True
+            await self._drain({"type": AsgiEventType.WEBSOCKET_CLOSE, "code": code, "reason": reason})
+        else:
+            await self._drain()
+
+    async def cleanup(self) -> None:
+        """Stop the sender and leave all rooms, called by the application once the handler returned."""
+        if self.sender is not None and not self.sender.done():
+            if self.state is WebSocketState.CONNECTED:
+                await self.close()
+            elif self.closing:
+                # Give the queued messages and the close message a moment to go out
+                await self._drain()
+            else:
+                # The client is gone, nothing left to send
+                self.sender.cancel()
+        self._disconnected(self.close_code or 1000)
+
+
+class WebSocketHub:
+    """Rooms of WebSocket connections with broadcasting.
+
+    A broadcast builds its ASGI message (and encodes JSON) once and queues that same message for
+    every connection in the room, without waiting. A connection whose send queue is full is
+    closed with 1013 (Try Again Later) when `overflow` is "close", or misses the message when it
+    is "drop". Connections leave their rooms automatically when they disconnect.
+    """
+
+    def __init__(self, overflow: str = "close") -> None:
+        if overflow not in ("close", "drop"):
+            raise ValueError(f"Invalid overflow policy: {overflow}. Must be one of: close, drop")
+        self.overflow = overflow
+        self.rooms: dict[str, set[WebSocketConnection]] = {}
+        self.dropped = 0
+
+    def join(self, room: str, websocket: WebSocketConnection) -> None:
+        self.rooms.setdefault(room, set()).add(websocket)
+        websocket.hubs.add(self)
+
+    def leave(self, room: str, websocket: WebSocketConnection) -> None:
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(websocket)
+            if not members:
+                del self.rooms[room]
+
+    def leave_all(self, websocket: WebSocketConnection) -> None:
+        for room in [room for room, members in self.rooms.items() if websocket in members]:
+            self.leave(room, websocket)
+        websocket.hubs.discard(self)
+
+    def broadcast(self, room: str, message: ASGIMessage) -> int:
+        """Queue a message for every connection in the room, returns how many got it."""
+        delivered = 0
+        for websocket in list(self.rooms.get(room, ())):
+            if websocket.send_nowait(message):
+                delivered += 1
+                continue
+            self.dropped += 1
+            if self.overflow == "close":
+                log.warning(f"Closing WebSocket connection to {websocket.path}, its send queue is full")
+                websocket.abort(1013, "Send queue full")
+        return delivered
+
+    def broadcast_text(self, room: str, data: str) -> int:
+        return self.broadcast(room, {"type": AsgiEventType.WEBSOCKET_SEND, "text": data})
+
+    def broadcast_bytes(self, room: str, data: bytes) -> int:
+        return self.broadcast(room, {"type": AsgiEventType.WEBSOCKET_SEND, "bytes": data})
+
+    def broadcast_json(self, room: str, data: Any) -> int:
+        return self.broadcast_text(room, json_dumps(data).decode())
+
+    def get_stats(self) -> dict[str, int]:
+        return {"rooms": len(self.rooms), "connections": sum(len(members) for members in self.rooms.values()), "dropped": self.dropped}
+
+
+class WebSocketBatcher:
+    """Coalesces JSON events sent within `window` seconds, or `max_messages` of them, into one frame.
+
+    Each event is encoded once when it is added; a batch is framed as a JSON array ("json") or
+    as newline-delimited JSON ("ndjson"), sent as a text frame or, with `binary`, a bytes frame.
+    Batches go out in order; while one is held up by a slow client the next keeps filling up.
+    Use it as an async context manager so the last batch is flushed:
+
+        async with WebSocketBatcher(websocket, window=0.005) as batcher:
+            async for event in feed:
+                await batcher.send_json(event)
+    """
+
+    def __init__(self, websocket: WebSocketConnection, window: float = 0.005, max_messages: int = 100, framing: str = "json", binary: bool = False) -> None:
+        if framing not in ("json", "ndjson"):
+            raise ValueError(f"Invalid framing: {framing}. Must be one of: json, ndjson")
+        self.websocket = websocket
+        self.window = window
+        self.max_messages = max_messages
+        self.framing = framing
+        self.binary = binary
+        self.pending: list[bytes] = []
+        self.pending_since = 0.0  # when the oldest pending event was added
+        self.pending_added = 0.0  # sum of the pending events' add times, for the average latency
+        self.lock = asyncio.Lock()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.flushes: set[asyncio.Task[None]] = set()
+
+        # Metrics
+        self.batches = 0
+        self.messages = 0
+        self.max_batch_size = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    async def send_json(self, data: Any) -> None:
+        await self.send_encoded(json_dumps(data))
+
+    async def send_encoded(self, data: bytes) -> None:
+        """Add an event that is already encoded as JSON."""
+        now = time.monotonic()
+        if not self.pending:
+            self.pending_since = now
+            self.timer = asyncio.get_running_loop().call_later(self.window, self._window_elapsed)
+        self.pending.append(data)
+        self.pending_added += now
+        if len(self.pending) >= self.max_messages:
+            await self.flush()
+
+    def _window_elapsed(self) -> None:
+        self.timer = None
+        task = asyncio.create_task(self.flush())
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def flush(self) -> None:
+        """Send the pending events as one frame."""
+        async with self.lock:
+            if not self.pending:
+                return
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            batch, self.pending = self.pending, []
+
+            now = time.monotonic()
+            size = len(batch)
+            self.batches += 1
+            self.messages += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.total_latency += size * now - self.pending_added
+            self.max_latency = max(self.max_latency, now - self.pending_since)
+            self.pending_added = 0.0
+
+            if self.framing == "json":
+                frame = b"[" + b",".join(batch) + b"]"
+            else:
+                frame = b"\n".join(batch) + b"\n"
+            if self.binary:
+                await self.websocket.send_bytes(frame)
+            else:
+                await self.websocket.send_text(frame.decode())
+
+    async def close(self) -> None:
+        """Flush the last batch."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)
+        await self.flush()
+
+    async def __aenter__(self) -> "WebSocketBatcher":
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            await self.close()
+        elif self.timer is not None:
+            self.timer.cancel()
+
+    def get_stats(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "messages": self.messages,
+            "pending": len(self.pending),
+            "avg_batch_size": self.messages / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "avg_latency_ms": self.total_latency / self.messages * 1000 if self.messages else 0.0,
+            "max_latency_ms": self.max_latency * 1000,
+        }
@@ -1,7 +1,16 @@
+import asyncio
+
+from typing import Optional
+
+import pytest
+
 from future.application import Future
-from future.controllers import WelcomeController
+from future.controllers import WELCOME_RESPONSE, WelcomeController
 from future.lifespan import Lifespan
-from future.routing import Get, RouteGroup
+from future.middleware import Middleware
+from future.requests import Request
+from future.responses import PlainTextResponse, Response
+from future.routing import Get, Route, RouteGroup
 from future.testclient import FutureTestClient
 
 
@@ -30,3 +39,144 @@ async def test_application_setup() -> None:
         response = await client.get("http://127.0.0.1/", headers={"Host": f"api.{test_domain}"})
         assert response.status_code == 200
         assert response.text == "✨ Welcome to Future! ✨"
+
+
+async def test_host_resolution_cache() -> None:
+    routes = [
+        RouteGroup(
+            name="test_application_routes",
+            subdomain="api",
+            routes=[
+                Get(path="/", endpoint=WelcomeController.root, name="Welcome"),  # type: ignore[reportAttributeAccessIssue]
+            ],
+        ),
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DOMAIN": "example.com", "APP_DEBUG": False, "APP_HOST_CACHE_SIZE": 2})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        for host in ["api.example.com", "API.Example.com:8443", "api.example.com."]:
+            response = await client.get("http://127.0.0.1/", headers={"Host": host})
+            assert response.status_code == 200
+
+        response = await client.get("http://127.0.0.1/", headers={"Host": "api.example.com."})
+        assert response.status_code == 200
+
+        response = await client.get("http://127.0.0.1/", headers={"Host": "evil.com"})
+        assert response.status_code == 403
+
+    stats = app.get_performance_stats()["host_cache"]
+    # Spellings of the same host share one entry
+    assert stats == {"size": 2, "max_size": 2, "hits": 3, "misses": 2}
+
+
+class ExpensiveController:
+    calls = 0
+
+    async def report(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        ExpensiveController.calls += 1
+        call = ExpensiveController.calls
+        await asyncio.sleep(0.05)
+        return PlainTextResponse(f"report {call} {request.headers.get('accept-language')}")
+
+
+async def test_request_coalescing() -> None:
+    routes = [
+        Get(path="/report", endpoint=ExpensiveController.report, name="report", coalesce=["accept-language"]),  # type: ignore[reportAttributeAccessIssue]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        responses = await asyncio.gather(
+            *(client.get("http://127.0.0.1/report", headers={"accept-language": "en"}) for _ in range(5)),
+            client.get("http://127.0.0.1/report", headers={"accept-language": "fr"}),
+        )
+        assert [response.text for response in responses] == ["report 1 en"] * 5 + ["report 2 fr"]
+        assert app.inflight == {}
+
+        # The first client going away doesn't cancel the shared call for the second one
+        first = asyncio.create_task(client.get("http://127.0.0.1/report", headers={"accept-language": "en"}))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(client.get("http://127.0.0.1/report", headers={"accept-language": "en"}))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        response = await second
+        assert response.text == "report 3 en"
+        assert ExpensiveController.calls == 3
+
+    # Requests with credentials never share a call, unless the route keys on their header
+    ExpensiveController.calls = 0
+    routes = [
+        Get(path="/report", endpoint=ExpensiveController.report, name="report", coalesce=True),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/team", endpoint=ExpensiveController.report, name="team", coalesce=["authorization"]),  # type: ignore[reportAttributeAccessIssue]
+    ]
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        credentials = [("authorization", "Bearer alice", "alice"), ("authorization", "Bearer bob", "bob"), ("cookie", "session=carol", "carol")]
+        responses = await asyncio.gather(
+            *(client.get("http://127.0.0.1/report", headers={header: value, "accept-language": user}) for header, value, user in credentials)
+        )
+        assert sorted(response.text.split()[-1] for response in responses) == ["alice", "bob", "carol"]
+        assert ExpensiveController.calls == 3
+
+        responses = await asyncio.gather(
+            *(client.get("http://127.0.0.1/team", headers={"authorization": "Bearer alice", "accept-language": "alice"}) for _ in range(2)),
+            client.get("http://127.0.0.1/team", headers={"authorization": "Bearer bob", "accept-language": "bob"}),
+        )
+        assert [response.text.split()[-1] for response in responses] == ["alice", "alice", "bob"]
+        assert ExpensiveController.calls == 5
+
+    # The coalescing key doesn't cover the body, so requests with one can't share a call
+    with pytest.raises(ValueError):
+        Route(["POST"], path="/report", endpoint=ExpensiveController.report, name="report", coalesce=True)  # type: ignore[reportAttributeAccessIssue]
+
+
+class RequestIdMiddleware(Middleware):
+    name = "requestId"
+    attach_to = "response"
+
+    def intercept(request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[reportSelfClsParameterName]
+        assert response is not None
+        response.headers.append([b"x-request", request.headers.get("x-request", "").encode()])
+        return None
+
+
+async def test_coalesced_responses_are_not_shared() -> None:
+    routes = [
+        Get(path="/report", endpoint=ExpensiveController.report, name="report", coalesce=True, middlewares=[RequestIdMiddleware]),  # type: ignore[reportAttributeAccessIssue,list-item]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        responses = await asyncio.gather(*(client.get("http://127.0.0.1/report", headers={"x-request": str(number)}) for number in range(5)))
+        # One handler call, but each response carries only its own request's header
+        assert len({response.text for response in responses}) == 1
+        assert [response.headers.get_list("x-request") for response in responses] == [[str(number)] for number in range(5)]
+
+
+async def test_frozen_responses_are_not_shared() -> None:
+    routes = [
+        Get(path="/", endpoint=WelcomeController.root, name="welcome", middlewares=[RequestIdMiddleware]),  # type: ignore[reportAttributeAccessIssue,list-item]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        for number in range(3):
+            response = await client.get("http://127.0.0.1/", headers={"x-request": str(number)})
+            assert response.text == "✨ Welcome to Future! ✨"
+            assert response.headers.get_list("x-request") == [str(number)]
+    # The module level response the handler returns is left as it was
+    assert not any(key == b"x-request" for key, _ in WELCOME_RESPONSE.headers)
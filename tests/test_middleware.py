@@ -0,0 +1,516 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import math
+import time
+
+from collections.abc import Iterator
+from typing import Any, Optional
+
+import pytest
+
+from future.application import Future
+from future.authentication import decode_jwt
+from future.cache import TTLCache
+from future.exceptions import BadRequestException, UnauthorizedException
+from future.lifespan import Lifespan
+from future.middleware import (
+    CacheMiddleware,
+    CompressionMiddleware,
+    ConditionalGetMiddleware,
+    CORSMiddleware,
+    GZipMiddleware,
+    MemoryRateLimitBackend,
+    Middleware,
+    RateLimitMiddleware,
+    RedisRateLimitBackend,
+    ScopeValidationMiddleware,
+)
+from future.requests import Request
+from future.responses import JSONResponse, NotModifiedResponse, PlainTextResponse, PNGResponse, Response, StreamingResponse
+from future.routing import Get, RouteGroup
+from future.testclient import FutureTestClient
+
+
+ROWS = [{"id": i, "name": f"user {i}"} for i in range(500)]
+
+
+def numbers() -> Iterator[bytes]:
+    for i in range(200):
+        yield f"line {i}\n".encode()
+
+
+class ReportController:
+    async def rows(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        return JSONResponse(ROWS)
+
+    async def small(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        return PlainTextResponse("ok")
+
+    async def lines(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        return StreamingResponse(numbers(), content_type="text/plain")
+
+    async def image(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        return PNGResponse(b"\x89PNG" + b"\x00" * 2000)
+
+
+def create_app(middleware: Middleware) -> Future:
+    routes = [
+        Get(path="/rows", endpoint=ReportController.rows, name="rows", middlewares=[middleware]),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/small", endpoint=ReportController.small, name="small", middlewares=[middleware]),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/lines", endpoint=ReportController.lines, name="lines", middlewares=[middleware]),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/image", endpoint=ReportController.image, name="image", middlewares=[middleware]),  # type: ignore[reportAttributeAccessIssue]
+    ]
+
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+    return app
+
+
+async def test_gzip_middleware() -> None:
+    app = create_app(GZipMiddleware(minimum_size=100))
+
+    async with FutureTestClient(app) as client:
+        response = await client.get("http://127.0.0.1/rows", headers={"accept-encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(JSONResponse(ROWS).body)
+        assert response.json() == ROWS
+
+        # Streamed bodies are compressed chunk by chunk
+        response = await client.get("http://127.0.0.1/lines", headers={"accept-encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text == "".join(f"line {i}\n" for i in range(200))
+
+        for path, headers in [
+            ("/rows", {"accept-encoding": "identity"}),
+            ("/rows", {"accept-encoding": "gzip;q=0"}),
+            ("/small", {"accept-encoding": "gzip"}),
+            ("/image", {"accept-encoding": "gzip"}),
+        ]:
+            response = await client.get(f"http://127.0.0.1{path}", headers=headers)
+            assert "content-encoding" not in response.headers
+
+
+async def test_compression_negotiation() -> None:
+    middleware = CompressionMiddleware()
+    assert middleware.negotiate("gzip, deflate") == "gzip"
+    assert middleware.negotiate("*") == middleware.encodings[0]
+    assert middleware.negotiate("br;q=0, zstd;q=0, gzip;q=0") is None
+    assert middleware.negotiate("deflate") is None
+
+    with pytest.raises(ValueError):
+        CompressionMiddleware(encodings=("lzma",))
+
+
+async def test_compression_offload() -> None:
+    middleware = GZipMiddleware(compresslevel=9)
+    encoder = middleware.encoder("gzip")
+    assert encoder.offload
+
+    chunks: list[Any] = [await middleware.run(encoder, b"a" * 1000), await middleware.run(encoder, b"b" * 1000, finish=True)]
+    assert gzip.decompress(b"".join(chunks)) == b"a" * 1000 + b"b" * 1000
+
+
+class AsyncMemoryBackend(MemoryRateLimitBackend):
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:  # type: ignore[override]
+        return super().acquire(key, rate, capacity, cost)
+
+
+async def test_rate_limit_middleware() -> None:
+    app = create_app(RateLimitMiddleware(rate=0.5, capacity=2))
+
+    async with FutureTestClient(app) as client:
+        for _ in range(2):
+            response = await client.get("http://127.0.0.1/small")
+            assert response.status_code == 200
+
+        response = await client.get("http://127.0.0.1/small")
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+
+    app = create_app(RateLimitMiddleware(rate=1, capacity=1, key_by="header", backend=AsyncMemoryBackend()))
+
+    async with FutureTestClient(app) as client:
+        assert (await client.get("http://127.0.0.1/small", headers={"x-api-key": "a"})).status_code == 200
+        assert (await client.get("http://127.0.0.1/small", headers={"x-api-key": "b"})).status_code == 200
+        assert (await client.get("http://127.0.0.1/small", headers={"x-api-key": "a"})).status_code == 429
+
+
+class FakeRedis:
+    """Runs the rate limit script the way Redis would, with string hash fields and a settable server clock."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.expires: dict[str, float] = {}
+
+    async def eval(self, script: str, numkeys: int, key: str, rate: float, capacity: float, cost: float) -> bytes:
+        assert script is RedisRateLimitBackend.script and numkeys == 1
+        if self.expires.get(key, self.now + 1) <= self.now:
+            del self.hashes[key], self.expires[key]
+
+        # TIME answers seconds and microseconds, then HMGET reads the bucket
+        seconds, microseconds = divmod(round(self.now * 1_000_000), 1_000_000)
+        now = seconds + microseconds / 1_000_000
+        bucket = self.hashes.get(key, {})
+        if "tokens" not in bucket:
+            tokens = capacity
+        else:
+            tokens = min(capacity, float(bucket["tokens"]) + (now - float(bucket["updated"])) * rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+
+        # HSET and EXPIRE
+        self.hashes[key] = {"tokens": repr(tokens), "updated": repr(now)}
+        self.expires[key] = now + math.ceil(capacity / rate) + 1
+        return repr(retry_after).encode()
+
+
+async def test_redis_rate_limit_backend() -> None:
+    redis = FakeRedis()
+    backend = RedisRateLimitBackend(redis)
+
+    assert await backend.acquire("a", rate=2, capacity=2) == 0
+    assert await backend.acquire("a", rate=2, capacity=2) == 0
+    assert await backend.acquire("a", rate=2, capacity=2) == 0.5
+    assert redis.expires["ratelimit:a"] == redis.now + 2
+
+    # Tokens refill from the server's clock
+    redis.now += 0.5
+    assert await backend.acquire("a", rate=2, capacity=2) == 0
+    assert await backend.acquire("a", rate=2, capacity=2) == 0.5
+
+    # An expired bucket starts full again
+    redis.now += 10
+    assert await backend.acquire("a", rate=2, capacity=2) == 0
+    assert redis.hashes["ratelimit:a"]["tokens"] == "1.0"
+
+    app = create_app(RateLimitMiddleware(rate=0.5, capacity=1, key_by="header", backend=RedisRateLimitBackend(FakeRedis(), prefix="rl:")))
+
+    async with FutureTestClient(app) as client:
+        assert (await client.get("http://127.0.0.1/small", headers={"x-api-key": "a"})).status_code == 200
+        response = await client.get("http://127.0.0.1/small", headers={"x-api-key": "a"})
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+
+
+async def test_cors_headers_on_errors() -> None:
+    cors = CORSMiddleware(allow_origins=["https://app.example.com"])
+    routes = [
+        Get(path="/small", endpoint=ReportController.small, name="small", middlewares=[cors, RateLimitMiddleware(rate=0.5, capacity=1)]),  # type: ignore[reportAttributeAccessIssue]
+    ]
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        assert (await client.get("http://127.0.0.1/small", headers={"origin": "https://app.example.com"})).status_code == 200
+        # The 429 raised by the rate limiter carries CORS headers too, so the page can read it
+        response = await client.get("http://127.0.0.1/small", headers={"origin": "https://app.example.com"})
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+        assert response.headers["access-control-allow-origin"] == "https://app.example.com"
+
+
+async def test_memory_rate_limit_backend(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 1000.0
+    monkeypatch.setattr("future.middleware.time.monotonic", lambda: now)
+    backend = MemoryRateLimitBackend(shards=2, idle_timeout=10, eviction_interval=2)
+
+    assert backend.acquire("a", rate=2, capacity=2) == 0
+    assert backend.acquire("a", rate=2, capacity=2) == 0
+    assert backend.acquire("a", rate=2, capacity=2) == 0.5
+
+    # Tokens are refilled lazily on the next call
+    now += 0.5
+    assert backend.acquire("a", rate=2, capacity=2) == 0
+    assert backend.acquire("b", rate=2, capacity=2) == 0
+    assert len(backend) == 2
+
+    # Idle buckets are swept one shard per eviction step
+    now += 20
+    backend.acquire("c", rate=2, capacity=2)
+    now += 1
+    backend.acquire("c", rate=2, capacity=2)
+    assert len(backend) == 1
+
+
+async def test_cors_middleware() -> None:
+    middleware = CORSMiddleware(allow_origins=["https://app.example.com"], allow_origin_regex=r"https://.*\.example\.org", allow_credentials=True, max_age=3600)
+    app = create_app(middleware)
+    preflight = {"origin": "https://app.example.com", "access-control-request-method": "GET", "access-control-request-headers": "Content-Type"}
+
+    async with FutureTestClient(app) as client:
+        response = await client.options("http://127.0.0.1/small", headers=preflight)
+        assert response.status_code == 204
+        assert response.headers["access-control-allow-origin"] == "https://app.example.com"
+        assert response.headers["access-control-allow-credentials"] == "true"
+        assert response.headers["access-control-max-age"] == "3600"
+        assert "allow" not in response.headers  # answered by the middleware, not the OPTIONS handler
+
+        # The preflight response is built once per origin
+        assert middleware.for_origin("https://app.example.com")[1] is middleware.for_origin("https://app.example.com")[1]  # type: ignore[index]
+
+        response = await client.options("http://127.0.0.1/small", headers={**preflight, "access-control-request-method": "DELETE"})
+        assert response.status_code == 400
+
+        response = await client.options("http://127.0.0.1/small", headers={**preflight, "origin": "https://evil.com"})
+        assert response.status_code == 400
+
+        response = await client.get("http://127.0.0.1/small", headers={"origin": "https://api.example.org"})
+        assert response.text == "ok"
+        assert response.headers["access-control-allow-origin"] == "https://api.example.org"
+        assert response.headers["vary"] == "Origin"
+
+        response = await client.get("http://127.0.0.1/small", headers={"origin": "https://evil.com"})
+        assert "access-control-allow-origin" not in response.headers
+
+    app = create_app(CORSMiddleware(allow_headers=["*"]))
+
+    async with FutureTestClient(app) as client:
+        response = await client.options("http://127.0.0.1/small", headers={**preflight, "access-control-request-headers": "x-custom"})
+        assert response.headers["access-control-allow-origin"] == "*"
+        assert response.headers["access-control-allow-headers"] == "x-custom"
+
+
+def make_jwt(claims: dict[str, Any], secret: bytes = b"secret") -> str:
+    def encode(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    signing_input = encode(b'{"alg":"HS256","typ":"JWT"}') + "." + encode(json.dumps(claims).encode())
+    return signing_input + "." + encode(hmac.new(secret, signing_input.encode(), hashlib.sha256).digest())
+
+
+class AccountController:
+    async def me(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        assert request.route is not None
+        return PlainTextResponse(f"{request.route.name} {request.context['user_id']}")
+
+
+async def test_decode_jwt() -> None:
+    token = make_jwt({"sub": "42", "exp": time.time() + 60})
+    assert decode_jwt(token, "secret")["sub"] == "42"
+
+    for token, secret in [
+        (make_jwt({"sub": "42"}), "other"),
+        (make_jwt({"sub": "42", "exp": time.time() - 1}), "secret"),
+        ("not.a.token", "secret"),
+        ("garbage", "secret"),
+    ]:
+        with pytest.raises(UnauthorizedException):
+            decode_jwt(token, secret)
+
+
+async def test_scope_validation_middleware() -> None:
+    verified: list[str] = []
+
+    def verify(token: str) -> dict[str, Any]:
+        verified.append(token)
+        return decode_jwt(token, "secret")
+
+    middleware = ScopeValidationMiddleware(verify=verify)
+    route = Get(path="/me", endpoint=AccountController.me, name="me", middlewares=[middleware], scopes=["read:api", "user"])  # type: ignore[reportAttributeAccessIssue]
+    assert route.scopes == frozenset({"read:api", "user"})
+
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=[route])
+    token = make_jwt({"sub": "42", "scope": "user read:api admin"})
+
+    async with FutureTestClient(app) as client:
+        for _ in range(3):
+            response = await client.get("http://127.0.0.1/me", headers={"authorization": f"Bearer {token}"})
+            assert response.text == "me 42"
+        # The signature is only checked once per token
+        assert verified == [token]
+
+        response = await client.get("http://127.0.0.1/me")
+        assert response.status_code == 401
+
+        response = await client.get("http://127.0.0.1/me", headers={"authorization": f"Bearer {make_jwt({'sub': '42'}, b'other')}"})
+        assert response.status_code == 401
+
+        response = await client.get("http://127.0.0.1/me", headers={"authorization": f"Bearer {make_jwt({'sub': '7', 'scopes': ['user']})}"})
+        assert response.status_code == 403
+
+    with pytest.raises(ValueError):
+        ScopeValidationMiddleware()
+
+
+async def test_rate_limit_per_user() -> None:
+    # Listed first, the limiter still runs after the middleware that identifies the user
+    limiter = RateLimitMiddleware(rate=0.5, capacity=1, key_by="user")
+    route = Get(path="/me", endpoint=AccountController.me, name="me", middlewares=[limiter, ScopeValidationMiddleware(secret="secret")], scopes=["user"])  # type: ignore[reportAttributeAccessIssue]
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=[route])
+    alice, bob = (f"Bearer {make_jwt({'sub': user, 'scope': 'user'})}" for user in ("alice", "bob"))
+
+    async with FutureTestClient(app) as client:
+        assert (await client.get("http://127.0.0.1/me", headers={"authorization": alice})).text == "me alice"
+        assert (await client.get("http://127.0.0.1/me", headers={"authorization": bob})).text == "me bob"
+        assert (await client.get("http://127.0.0.1/me", headers={"authorization": alice})).status_code == 429
+
+
+class CountingController:
+    calls = 0
+
+    async def slow(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        CountingController.calls += 1
+        await asyncio.sleep(0.01)
+        return PlainTextResponse(f"call {CountingController.calls} {request.headers.get('accept-language')}")
+
+
+async def test_cache_middleware() -> None:
+    CountingController.calls = 0
+    middleware = CacheMiddleware(ttl=30, vary=["accept-language"])
+    route = Get(path="/slow", endpoint=CountingController.slow, name="slow", middlewares=[middleware])  # type: ignore[reportAttributeAccessIssue]
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=[route])
+
+    async with FutureTestClient(app) as client:
+        # Concurrent misses run the handler once
+        responses = await asyncio.gather(*(client.get("http://127.0.0.1/slow", headers={"accept-language": "en"}) for _ in range(5)))
+        assert [response.text for response in responses] == ["call 1 en"] * 5
+        assert middleware.inflight == {}
+
+        response = await client.get("http://127.0.0.1/slow", headers={"accept-language": "en"})
+        assert response.text == "call 1 en"
+
+        # Vary headers, query strings and authorization get their own entries or bypass the cache
+        assert (await client.get("http://127.0.0.1/slow", headers={"accept-language": "fr"})).text == "call 2 fr"
+        assert (await client.get("http://127.0.0.1/slow?page=2", headers={"accept-language": "en"})).text == "call 3 en"
+        assert (await client.get("http://127.0.0.1/slow", headers={"accept-language": "en", "authorization": "Bearer x"})).text == "call 4 en"
+
+    assert middleware.get_stats()["size"] == 3
+
+
+class FlakyController:
+    calls = 0
+
+    async def report(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        FlakyController.calls += 1
+        await asyncio.sleep(0.01)
+        if FlakyController.calls == 1:
+            raise BadRequestException("not yet")
+        return PlainTextResponse("report")
+
+
+class StampMiddleware(Middleware):
+    name = "stamp"
+    attach_to = "response"
+
+    def intercept(request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[reportSelfClsParameterName]
+        assert response is not None
+        response.headers.append([b"x-stamp", b"1"])
+        return None
+
+
+async def test_cache_middleware_pipeline() -> None:
+    CountingController.calls = 0
+    inner, outer = CacheMiddleware(ttl=30), CacheMiddleware(ttl=60)
+    routes = [
+        RouteGroup(
+            name="cached",
+            middlewares=[ConditionalGetMiddleware(), StampMiddleware],  # type: ignore[list-item]
+            routes=[
+                Get(path="/slow", endpoint=CountingController.slow, name="slow", middlewares=[inner, outer]),  # type: ignore[reportAttributeAccessIssue]
+                Get(path="/flaky", endpoint=FlakyController.report, name="flaky", middlewares=[CacheMiddleware(wait_timeout=5)]),  # type: ignore[reportAttributeAccessIssue]
+            ],
+        )
+    ]
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        # Nested instances keep their own in-flight state, and both store the response
+        responses = await asyncio.gather(*(client.get("http://127.0.0.1/slow") for _ in range(3)))
+        assert [response.text for response in responses] == ["call 1 None"] * 3
+        assert inner.get_stats()["size"] == outer.get_stats()["size"] == 1
+
+        # Hits go through the response middlewares outside the cache, once per request
+        response = await client.get("http://127.0.0.1/slow")
+        assert response.headers.get_list("x-stamp") == ["1"]
+        response = await client.get("http://127.0.0.1/slow", headers={"if-none-match": response.headers["etag"]})
+        assert response.status_code == 304
+        assert CountingController.calls == 1
+        # The ETag is computed once, on the stored response the copies were made from
+        [(_, stored, _)] = inner.cache.entries.values()
+        assert stored.etag == response.headers["etag"]
+
+        # A failing handler releases the requests waiting for it right away
+        started = time.monotonic()
+        responses = await asyncio.gather(*(client.get("http://127.0.0.1/flaky") for _ in range(3)))
+        assert time.monotonic() - started < 1
+        assert sorted(response.status_code for response in responses) == [200, 200, 400]
+
+
+async def test_ttl_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 1000.0
+    monkeypatch.setattr("future.cache.time.monotonic", lambda: now)
+    cache = TTLCache(max_bytes=10, ttl=5)
+
+    cache.set("a", 1, size=4)
+    cache.set("b", 2, size=4)
+    assert cache.get("a") == 1
+    cache.set("c", 3, size=4)  # evicts b, the least recently used
+    assert cache.get("b") is None and cache.size == 8
+    cache.set("d", 4, size=11)  # larger than the whole cache
+    assert cache.get("d") is None
+
+    now += 5
+    assert cache.get("a") is None
+    assert cache.get_stats()["hits"] == 1
+
+
+DASHBOARD = PlainTextResponse("dashboard").freeze()
+
+
+class DashboardController:
+    renders = 0
+
+    async def frozen(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        return DASHBOARD
+
+    async def versioned(request: Request) -> Response:  # type: ignore[reportSelfClsParameterName]
+        etag = 'W/"v7"'
+        if request.is_not_modified(etag=etag):
+            return NotModifiedResponse(etag=etag)
+        DashboardController.renders += 1
+        return PlainTextResponse("version 7", headers={"etag": etag})
+
+
+async def test_conditional_get_middleware() -> None:
+    routes = [
+        Get(path="/frozen", endpoint=DashboardController.frozen, name="frozen", middlewares=[ConditionalGetMiddleware()]),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/versioned", endpoint=DashboardController.versioned, name="versioned", middlewares=[ConditionalGetMiddleware()]),  # type: ignore[reportAttributeAccessIssue]
+    ]
+    app = Future(lifespan=Lifespan(), config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        response = await client.get("http://127.0.0.1/frozen")
+        etag = response.headers["etag"]
+        assert response.text == "dashboard" and etag.startswith('"')
+        assert DASHBOARD.etag == etag
+        assert all(key != b"etag" for key, _ in DASHBOARD.headers)  # the shared response is left as is
+
+        response = await client.get("http://127.0.0.1/frozen", headers={"if-none-match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        response = await client.get("http://127.0.0.1/frozen", headers={"if-none-match": '"stale"'})
+        assert response.status_code == 200
+
+        # Handler-side check: the response is not rendered at all
+        response = await client.get("http://127.0.0.1/versioned")
+        assert response.headers["etag"] == 'W/"v7"'
+        response = await client.get("http://127.0.0.1/versioned", headers={"if-none-match": 'W/"v7"'})
+        assert response.status_code == 304
+        assert DashboardController.renders == 1
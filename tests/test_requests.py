@@ -0,0 +1,117 @@
+from typing import Any
+
+import msgspec
+import pytest
+
+from future.application import Future
+from future.exceptions import PayloadTooLargeException
+from future.lifespan import Lifespan
+from future.requests import Headers, Request
+from future.responses import JSONResponse, Response
+from future.routing import Post
+from future.testclient import FutureTestClient
+
+
+class User(msgspec.Struct):
+    id: int
+    name: str
+
+
+async def receive() -> dict[str, object]:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def test_request_headers() -> None:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "scheme": "http",
+        "headers": [
+            (b"host", b"api.example.com"),
+            (b"accept", b"text/html"),
+            (b"X-Custom", b"first"),
+            (b"x-custom", b"second"),
+        ],
+    }
+    request = Request(scope, receive)
+    assert isinstance(request.headers, Headers)
+    assert request.host == "api.example.com"
+    assert request.headers.get("Accept") == "text/html"
+    assert request.headers["x-custom"] == "first"
+    assert request.headers.getlist("X-CUSTOM") == ["first", "second"]
+    assert request.headers.get("missing", "default") == "default"
+    assert "accept" in request.headers
+    assert "missing" not in request.headers
+    assert list(request.headers) == ["host", "accept", "x-custom"]
+    assert len(request.headers) == 3
+
+
+def make_receive(chunks: list[bytes]) -> Any:
+    messages = [{"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1} for index, chunk in enumerate(chunks)]
+
+    async def receive() -> dict[str, Any]:
+        return messages.pop(0)
+
+    return receive
+
+
+async def test_request_stream_and_body_cache() -> None:
+    scope = {"type": "http", "method": "POST", "path": "/", "scheme": "http", "headers": []}
+    request = Request(scope, make_receive([b"hello ", b"chunked ", b"world"]))
+    assert await request.body() == b"hello chunked world"
+    # The body is cached, so it can be read again and streamed
+    assert await request.body() == b"hello chunked world"
+    assert [chunk async for chunk in request.stream()] == [b"hello chunked world"]
+
+    request = Request(scope, make_receive([b"abc", b"def"]))
+    assert [chunk async for chunk in request.stream()] == [b"abc", b"def"]
+
+
+async def test_request_body_size_limit() -> None:
+    async def upload(request: Request) -> Response:
+        body = await request.body()
+        return Response(body=f"{len(body)} bytes")
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False, "APP_MAX_BODY_SIZE": 10})
+    app.add_routes(routes=[Post(path="/upload", endpoint=upload, name="upload")])
+
+    async with FutureTestClient(app) as client:
+        response = await client.post("http://127.0.0.1/upload", content=b"0123456789")
+        assert response.status_code == 200
+        assert response.text == "10 bytes"
+
+        response = await client.post("http://127.0.0.1/upload", content=b"0123456789!")
+        assert response.status_code == 413
+
+    scope = {"type": "http", "method": "POST", "path": "/", "scheme": "http", "headers": []}
+    request = Request(scope, make_receive([b"01234", b"56789", b"!"]), max_body_size=10)
+    with pytest.raises(PayloadTooLargeException):
+        await request.body()
+
+
+async def test_request_json() -> None:
+    async def create_user(request: Request) -> Response:
+        user = await request.json(type=User)
+        return JSONResponse({"id": user.id, "name": user.name.upper()})
+
+    async def echo(request: Request) -> Response:
+        return JSONResponse(await request.json())
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=[Post(path="/users", endpoint=create_user, name="create_user"), Post(path="/echo", endpoint=echo, name="echo")])
+
+    async with FutureTestClient(app) as client:
+        response = await client.post("http://127.0.0.1/users", content=b'{"id": 1, "name": "alice"}')
+        assert response.json() == {"id": 1, "name": "ALICE"}
+
+        response = await client.post("http://127.0.0.1/users", content=b'{"id": "one", "name": "alice"}')
+        assert response.status_code == 422
+
+        response = await client.post("http://127.0.0.1/echo", content=b'{"nested": [1, 2, {"a": null}]}')
+        assert response.json() == {"nested": [1, 2, {"a": None}]}
+
+        response = await client.post("http://127.0.0.1/echo", content=b"{not json")
+        assert response.status_code == 400
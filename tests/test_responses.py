@@ -0,0 +1,218 @@
+import asyncio
+
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import msgspec
+
+from future.application import Future
+from future.lifespan import Lifespan
+from future.requests import Request
+from future.responses import (
+    EventChannel,
+    EventSourceResponse,
+    FileResponse,
+    JSONResponse,
+    PNGResponse,
+    RedirectResponse,
+    Response,
+    ServerSentEvent,
+    StreamingResponse,
+)
+from future.routing import Get
+from future.testclient import FutureTestClient
+
+
+class User(msgspec.Struct):
+    id: int
+    name: str
+
+
+async def collect(response: Any) -> list[dict[str, Any]]:
+    messages: list[dict[str, Any]] = []
+
+    async def send(message: dict[str, Any]) -> None:
+        messages.append(message)
+
+    await response(send)
+    return messages
+
+
+async def test_json_response() -> None:
+    response = JSONResponse({"name": "Zoë", "created": datetime(2025, 1, 6), "tags": {"a"}, "user": User(id=1, name="Alice")})
+    assert response.body == b'{"name":"Zo\xc3\xab","created":"2025-01-06T00:00:00","tags":["a"],"user":{"id":1,"name":"Alice"}}'
+    assert [b"content-type", b"application/json"] in response.headers
+
+    # Unsupported keys and values are serialized with str(), like json.dumps(default=str)
+    response = JSONResponse({(1, 2): object})
+    assert response.body == b'{"(1, 2)":"<class \'object\'>"}'
+
+    messages = await collect(response)
+    assert messages[0]["status"] == 200
+    assert messages[1]["body"] == response.body
+
+
+async def test_streaming_response() -> None:
+    async def async_chunks() -> AsyncIterator[str]:
+        yield "hello "
+        yield "world"
+
+    def sync_chunks() -> Iterator[bytes]:
+        yield b"foo"
+        yield b"bar"
+
+    contents: list[tuple[Any, bytes]] = [(async_chunks(), b"hello world"), (sync_chunks(), b"foobar"), ([b"a", "b"], b"ab")]
+    for content, expected in contents:
+        messages = await collect(StreamingResponse(content, content_type="text/plain"))
+        assert messages[0]["type"] == "http.response.start"
+        assert all(message["more_body"] for message in messages[1:-1])
+        assert messages[-1]["more_body"] is False
+        assert b"".join(message["body"] for message in messages[1:]) == expected
+
+
+async def test_redirect_response() -> None:
+    messages = await collect(RedirectResponse("/login"))
+    assert messages[0]["status"] == 307
+    assert [b"location", b"/login"] in messages[0]["headers"]
+
+
+async def test_file_response(tmp_path: Path) -> None:
+    report = tmp_path / "report.csv"
+    report.write_bytes(b"0123456789" * 10_000)
+
+    async def download(request: Request) -> Response:
+        return FileResponse(str(report), request=request)
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=[Get(path="/report", endpoint=download, name="report")])
+
+    async with FutureTestClient(app) as client:
+        response = await client.get("http://127.0.0.1/report")
+        assert response.status_code == 200
+        assert response.content == report.read_bytes()
+        assert response.headers["content-type"] == "text/csv"
+        assert response.headers["content-length"] == "100000"
+        etag = response.headers["etag"]
+
+        response = await client.get("http://127.0.0.1/report", headers={"Range": "bytes=10-14"})
+        assert response.status_code == 206
+        assert response.content == b"01234"
+        assert response.headers["content-range"] == "bytes 10-14/100000"
+
+        response = await client.get("http://127.0.0.1/report", headers={"Range": "bytes=-3"})
+        assert response.content == b"789"
+
+        response = await client.get("http://127.0.0.1/report", headers={"Range": "bytes=200000-"})
+        assert response.status_code == 416
+
+        response = await client.get("http://127.0.0.1/report", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = await client.get("http://127.0.0.1/report", headers={"If-Modified-Since": response.headers["last-modified"]})
+        assert response.status_code == 304
+
+
+async def test_file_response_zerocopysend(tmp_path: Path) -> None:
+    report = tmp_path / "report.bin"
+    report.write_bytes(b"x" * 1000)
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "scheme": "http",
+        "headers": [(b"range", b"bytes=100-199")],
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    messages = await collect(FileResponse(str(report), request=Request(scope, receive)))
+    assert messages[0]["status"] == 206
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    assert (messages[1]["offset"], messages[1]["count"]) == (100, 100)
+
+
+async def test_frozen_response() -> None:
+    response = Response(body="static", headers={"Cache-Control": "max-age=60"}).freeze()
+    first = await collect(response)
+    second = await collect(response)
+    # The same pre-built messages are replayed for every request
+    assert first[0] is second[0] and first[1] is second[1]
+    assert first[0]["headers"] == [[b"Cache-Control", b"max-age=60"], [b"content-type", b"text/plain"], [b"content-length", b"6"]]
+    assert first[1]["body"] == b"static"
+
+    png = PNGResponse(b"\x89PNG", headers={"cache-control": "no-store"})
+    assert png.headers == [[b"cache-control", b"no-store"], [b"content-type", b"image/png"]]
+
+
+async def test_event_source_response() -> None:
+    assert ServerSentEvent("line one\nline two", event="update", id=7).encode() == b"id: 7\nevent: update\ndata: line one\ndata: line two\n\n"
+
+    async def events() -> AsyncIterator[Any]:
+        yield {"count": 1}
+        await asyncio.sleep(0.05)  # Long enough for a heartbeat
+        yield "done"
+
+    messages = await collect(EventSourceResponse(events(), ping=0.01))
+    assert messages[0]["status"] == 200
+    assert [b"content-type", b"text/event-stream"] in messages[0]["headers"]
+    bodies = [message["body"] for message in messages[1:]]
+    assert bodies[0] == b'data: {"count":1}\n\n'
+    assert b": ping\n\n" in bodies
+    assert bodies[-2:] == [b"data: done\n\n", b""]
+
+
+async def test_event_source_disconnect() -> None:
+    channel = EventChannel(history=3)
+    for number in range(5):
+        channel.publish(number)
+    disconnected = asyncio.Event()
+    closed = asyncio.Event()
+
+    async def receive() -> dict[str, Any]:
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            # Resuming after id 2 replays what is left in the history, then live events
+            async for event in channel.subscribe(last_event_id="2"):
+                yield event
+        finally:
+            closed.set()
+
+    request = Request({"type": "http", "method": "GET", "scheme": "http", "path": "/events", "headers": []}, receive)
+    task = asyncio.create_task(collect(EventSourceResponse(events(), request=request)))
+    await asyncio.sleep(0.01)
+    channel.publish("live", event="news")
+    await asyncio.sleep(0.01)
+    disconnected.set()
+    messages = await asyncio.wait_for(task, 1)
+
+    assert closed.is_set() and not channel.subscribers
+    bodies = [message["body"] for message in messages[1:]]
+    assert bodies == [b"id: 3\ndata: 2\n\n", b"id: 4\ndata: 3\n\n", b"id: 5\ndata: 4\n\n", b"id: 6\nevent: news\ndata: live\n\n"]
+
+
+async def test_event_channel_unknown_last_event_id() -> None:
+    # After a restart ids start over, so an id from before it is unknown and the client gets live events
+    channel = EventChannel()
+    received: list[bytes] = []
+
+    async def subscriber() -> None:
+        async for event in channel.subscribe(last_event_id="500"):
+            received.append(event)
+
+    task = asyncio.create_task(subscriber())
+    await asyncio.sleep(0)
+    for number in range(5):
+        channel.publish(number)
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert received == [f"id: {number + 1}\ndata: {number}\n\n".encode() for number in range(5)]
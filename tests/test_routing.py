@@ -1,7 +1,12 @@
+from typing import Optional
+
 from future.application import Future
-from future.controllers import WelcomeController
+from future.controllers import DebugController, WelcomeController
 from future.lifespan import Lifespan
-from future.routing import Get, RouteGroup
+from future.middleware import Middleware, ScopeValidationMiddleware, TestMiddlewareRequest
+from future.requests import Request
+from future.responses import Response
+from future.routing import ROUTERS, Get, Post, Route, RouteGroup, RouteMethods
 from future.testclient import FutureTestClient
 
 
@@ -197,3 +202,192 @@ async def test_domain_routing() -> None:
         response = await client.get("http://127.0.0.1/", headers={"Host": "example.com"})
         assert response.status_code == 200
         assert response.text == "✨ Welcome to Future! ✨"
+
+
+async def test_route_tree_typed_parameters() -> None:
+    routes = [
+        Get(path="/users/<int:user_id>/<str:arg2>", endpoint=DebugController.args, name="getUserInfo"),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/dogs/<uuid:dog_id>", endpoint=DebugController.some_handler, name="get_dog"),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/cats/{cat_id}", endpoint=DebugController.some_handler, name="get_cat"),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/birds/:bird_id", endpoint=DebugController.some_handler, name="get_bird"),  # type: ignore[reportAttributeAccessIssue]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        response = await client.get("http://127.0.0.1/users/42/Alice")
+        assert response.status_code == 200
+        assert response.text == "user_id='42', arg2='Alice'\n"
+
+        response = await client.get("http://127.0.0.1/users/abc/Alice")
+        assert response.status_code == 404
+
+        response = await client.get("http://127.0.0.1/dogs/123e4567-e89b-12d3-a456-426614174000")
+        assert response.text == "Handled with params: {'dog_id': '123e4567-e89b-12d3-a456-426614174000'}"
+
+        response = await client.get("http://127.0.0.1/cats/tom/")
+        assert response.text == "Handled with params: {'cat_id': 'tom'}"
+
+        response = await client.get("http://127.0.0.1/birds/tweety")
+        assert response.text == "Handled with params: {'bird_id': 'tweety'}"
+
+
+async def test_route_tree_static_before_parameter() -> None:
+    routes = [
+        Get(path="/items/<str:item>", endpoint=DebugController.some_handler, name="item"),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/items/ping", endpoint=DebugController.ping, name="ping"),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/files/*", endpoint=DebugController.some_handler, name="files"),  # type: ignore[reportAttributeAccessIssue]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        response = await client.get("http://127.0.0.1/items/ping")
+        assert response.text == "Pong\n"
+
+        response = await client.get("http://127.0.0.1/items/pong")
+        assert response.text == "Handled with params: {'item': 'pong'}"
+
+        response = await client.get("http://127.0.0.1/files/a/b.txt")
+        assert response.text == "Handled with params: {'tail': 'a/b.txt'}"
+
+
+async def test_router_engines() -> None:
+    for router in ["tree", "regex", "linear"]:
+        routes = [
+            Get(path="/", endpoint=WelcomeController.root, name="Welcome"),  # type: ignore[reportAttributeAccessIssue]
+            Get(path="/users/<int:user_id>/<str:arg2>", endpoint=DebugController.args, name="getUserInfo"),  # type: ignore[reportAttributeAccessIssue]
+            Get(path="/cats/<int:cat_id>", endpoint=DebugController.some_handler, name="get_cat"),  # type: ignore[reportAttributeAccessIssue]
+            Get(path="/cats/<int:cat_id>/toys/<str:toy>", endpoint=DebugController.some_handler, name="get_cat_toy"),  # type: ignore[reportAttributeAccessIssue]
+        ]
+
+        lifespan = Lifespan()
+        app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False, "APP_ROUTER": router})
+        app.add_routes(routes=routes)
+
+        async with FutureTestClient(app) as client:
+            response = await client.get("http://127.0.0.1/")
+            assert response.text == "✨ Welcome to Future! ✨"
+
+            response = await client.get("http://127.0.0.1/users/7/bob")
+            assert response.text == "user_id='7', arg2='bob'\n"
+
+            response = await client.get("http://127.0.0.1/cats/3/toys/ball")
+            assert response.text == "Handled with params: {'cat_id': '3', 'toy': 'ball'}"
+
+            response = await client.get("http://127.0.0.1/cats/three")
+            assert response.status_code == 404
+
+
+async def test_router_engines_agree_on_tails() -> None:
+    # (route path, request path, expected params or None for no match), checked against every engine
+    cases = [
+        ("/files/<path:p>", "/files", None),
+        ("/files/<path:p>", "/files/", {"p": ""}),
+        ("/files/<path:p>", "/files/a/b", {"p": "a/b"}),
+        ("/files/*", "/files", {"tail": ""}),
+        ("/files/*", "/files/", {"tail": ""}),
+        ("/files/*", "/files/a/b", {"tail": "a/b"}),
+        ("/files/<p>", "/files", None),
+        ("/files/<p>", "/files/a/b", None),
+    ]
+    for router, engine in ROUTERS.items():
+        for route_path, path, expected in cases:
+            route = Get(path=route_path, endpoint=DebugController.ping, name="files")  # type: ignore[reportAttributeAccessIssue]
+            route.compile_pattern()
+            matcher = engine()
+            matcher.insert(route, RouteMethods())
+            match = matcher.match(path)
+            assert (match[1] if match else None) == expected, (router, route_path, path)
+
+
+async def test_method_dispatch() -> None:
+    routes = [
+        Get(path="/ping", endpoint=DebugController.ping, name="ping"),  # type: ignore[reportAttributeAccessIssue]
+        Post(path="/ping", endpoint=WelcomeController.root, name="ping_post"),  # type: ignore[reportAttributeAccessIssue]
+        Post(path="/submit", endpoint=WelcomeController.root, name="submit"),  # type: ignore[reportAttributeAccessIssue]
+        Get(path="/private", endpoint=DebugController.ping, name="private", middlewares=[ScopeValidationMiddleware(secret="secret")], scopes=["admin"]),  # type: ignore[reportAttributeAccessIssue]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        response = await client.get("http://127.0.0.1/ping")
+        assert response.text == "Pong\n"
+
+        response = await client.post("http://127.0.0.1/ping")
+        assert response.text == "✨ Welcome to Future! ✨"
+
+        response = await client.get("http://127.0.0.1/submit")
+        assert response.status_code == 405
+        assert response.headers["allow"] == "POST, OPTIONS"
+
+        response = await client.head("http://127.0.0.1/ping")
+        assert response.status_code == 200
+        assert response.content == b""
+        assert response.headers["content-length"] == "5"
+
+        response = await client.options("http://127.0.0.1/ping")
+        assert response.status_code == 204
+        assert response.headers["allow"] == "GET, POST, HEAD, OPTIONS"
+
+        # Middlewares that would reject the request don't run for the synthesized OPTIONS
+        response = await client.get("http://127.0.0.1/private")
+        assert response.status_code == 401
+        response = await client.options("http://127.0.0.1/private")
+        assert response.status_code == 204
+        assert response.headers["allow"] == "GET, HEAD, OPTIONS"
+
+
+class AsyncHeaderMiddleware(Middleware):
+    name = "asyncHeaderMiddleware"
+    attach_to = "response"
+
+    async def intercept(request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[override,reportAttributeAccessIssue,reportSelfClsParameterName]
+        if response is not None:
+            response.headers.append([b"x-middleware", b"async"])
+        return None
+
+
+async def test_middleware_pipeline() -> None:
+    routes: list[Route | RouteGroup] = [
+        RouteGroup(
+            name="outer",
+            prefix="/api",
+            middlewares=[TestMiddlewareRequest],  # type: ignore[list-item]
+            routes=[
+                RouteGroup(  # type: ignore[list-item]
+                    name="inner",
+                    prefix="/v1",
+                    middlewares=[AsyncHeaderMiddleware],  # type: ignore[list-item]
+                    routes=[
+                        Get(path="/ping", endpoint=DebugController.ping, name="ping"),  # type: ignore[reportAttributeAccessIssue]
+                    ],
+                ),
+            ],
+        ),
+        Get(path="/plain", endpoint=DebugController.ping, name="plain"),  # type: ignore[reportAttributeAccessIssue]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_NAME": "test", "APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    route_config = app.routes[""]["/api/v1/ping"].handlers["GET"]
+    assert len(route_config["before"]) == 1 and len(route_config["after"]) == 1
+    assert app.routes[""]["/plain"].handlers["GET"]["before"] == ()
+
+    async with FutureTestClient(app) as client:
+        response = await client.get("http://127.0.0.1/api/v1/ping")
+        assert response.text == "Pong\n"
+        assert response.headers["x-middleware"] == "async"
+
+        # The sync request middleware of the outer group interrupts the request
+        response = await client.get("http://127.0.0.1/api/v1/ping", headers={"x-interrupt": "1"})
+        assert response.text == "Request intercepted!"
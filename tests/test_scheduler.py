@@ -0,0 +1,327 @@
+import asyncio
+import subprocess
+import sys
+import threading
+import time
+
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from future.election import FileLeaseBackend, LeaderElection, MemoryLeaseBackend
+from future.jobstore import FileJobStore, JobStore, SQLJobStore
+from future.scheduler import CronExpression, CronScheduler, ScheduledTask, Task, Unit
+from future.types import RunRecord, TaskState
+
+
+async def test_next_run_is_anchored_to_start_time() -> None:
+    start = datetime.now() + timedelta(minutes=1)
+    task = ScheduledTask("report", func=print, interval=10, unit=Unit.SECONDS, start_time=start)
+    assert task.next_run == start
+    assert 59 < task.deadline - time.monotonic() <= 60
+
+    # However late the previous run was, the next one stays on the start_time + n * interval grid
+    task.calculate_next_run(task.anchor + 25.3)
+    assert task.deadline == task.anchor + 30
+    assert task.next_run == start + timedelta(seconds=30)
+    task.calculate_next_run(task.anchor + 30)
+    assert task.next_run == start + timedelta(seconds=40)
+
+
+async def test_scheduler_runs_due_tasks() -> None:
+    runs: list[float] = []
+
+    async def tick() -> None:
+        runs.append(time.monotonic())
+
+    scheduler = CronScheduler()
+    await scheduler.start()
+    # The idle scheduler is woken up by new tasks, sub-second intervals work
+    scheduler.add_task(Task("tick", interval=0.02, unit=Unit.SECONDS, func=tick))
+    scheduler.add_task(Task("later", interval=1, unit=Unit.DAYS, func=tick, start_time=datetime.now() + timedelta(days=1)))
+    await asyncio.sleep(0.15)
+    assert scheduler.remove_task("tick")
+    count = len(runs)
+    await asyncio.sleep(0.05)
+    await scheduler.stop()
+
+    assert 5 <= count <= 9
+    assert len(runs) == count
+    assert scheduler.list_tasks() == ["later"]
+    assert scheduler.loop_task is None
+
+
+async def test_overlap_policies_and_timeouts() -> None:
+    started: dict[str, int] = {"skip": 0, "queue": 0, "replace": 0, "timeout": 0}
+    finished: dict[str, int] = dict.fromkeys(started, 0)
+
+    async def probe(name: str) -> None:
+        started[name] += 1
+        await asyncio.sleep(0.05)  # Slower than the interval, like a probe against a hanging host
+        finished[name] += 1
+
+    scheduler = CronScheduler()
+    await scheduler.start()
+    for policy in ("skip", "queue", "replace"):
+        scheduler.add_task(Task(policy, interval=0.02, unit=Unit.SECONDS, func=probe, args=(policy,), overlap=policy))
+    scheduler.add_task(Task("timeout", interval=0.02, unit=Unit.SECONDS, func=probe, args=("timeout",), timeout=0.01, max_concurrency=2))
+    await asyncio.sleep(0.13)
+    assert all(len(task.running) <= task.max_concurrency for task in scheduler.tasks.values())
+    await scheduler.stop()
+
+    # Skipped runs never start, queued runs start back to back and replaced runs never finish
+    assert 2 <= started["skip"] <= 3 and started["skip"] - finished["skip"] <= 1
+    assert started["queue"] >= started["skip"]
+    assert started["replace"] >= 5 and finished["replace"] == 0
+    assert started["timeout"] >= 5 and finished["timeout"] == 0
+    assert not scheduler.running_tasks
+
+
+async def test_timeout_outcomes(tmp_path: Path) -> None:
+    async def hang() -> None:
+        await asyncio.sleep(1)
+
+    async def fail() -> None:
+        raise TimeoutError("upstream did not answer")
+
+    scheduler = CronScheduler(store=FileJobStore(str(tmp_path / "jobs.jsonl")))
+    await scheduler.start()
+    scheduler.add_task(Task("hang", interval=1, unit=Unit.HOURS, func=hang, timeout=0.01))
+    scheduler.add_task(Task("fail", interval=1, unit=Unit.HOURS, func=fail, timeout=1))
+    await asyncio.sleep(0.05)
+
+    # Only the scheduler's deadline counts as a timeout, not a TimeoutError raised by the task
+    [hung] = await scheduler.get_history("hang")
+    [failed] = await scheduler.get_history("fail")
+    await scheduler.stop()
+    assert (hung["outcome"], hung["error"]) == ("timeout", None)
+    assert (failed["outcome"], failed["error"]) == ("error", "upstream did not answer")
+
+
+async def test_sync_tasks_use_scheduler_pool() -> None:
+    threads: list[str] = []
+    scheduler = CronScheduler(max_workers=2)
+    await scheduler.start()
+    scheduler.add_task(Task("sync", interval=1, unit=Unit.HOURS, func=lambda **kwargs: threads.append(threading.current_thread().name), kwargs={"x": 1}))
+    await asyncio.sleep(0.05)
+    await scheduler.stop()
+
+    assert len(threads) == 1 and threads[0].startswith("future-cron")
+    assert scheduler.thread_pool is None
+
+
+async def test_cron_expressions() -> None:
+    assert CronExpression("0 2 * * *").next_after(datetime(2026, 10, 18, 3)) == datetime(2026, 10, 19, 2)
+    assert CronExpression("*/15 9-17 * * mon-fri").next_after(datetime(2026, 10, 17, 12)) == datetime(2026, 10, 19, 9)
+    # A day field covering its whole range is unrestricted, so only Mondays match here
+    assert CronExpression("0 0 */1 * mon").next_after(datetime(2026, 10, 17, 12)) == datetime(2026, 10, 19)
+    assert CronExpression("0 0 1 * 0-6").next_after(datetime(2026, 10, 17, 12)) == datetime(2026, 11, 1)
+    assert CronExpression("30 */10 * * * *").next_after(datetime(2026, 10, 18, 23, 59, 50)) == datetime(2026, 10, 19, 0, 0, 30)
+    assert CronExpression("0 0 29 feb *").next_after(datetime(2026, 3, 1)) == datetime(2028, 2, 29)
+    assert CronExpression("@monthly").next_after(datetime(2026, 12, 5)) == datetime(2027, 1, 1)
+    # Restricting both day fields matches either, here the 13th or any Friday
+    assert CronExpression("0 0 13 * 5").next_after(datetime(2026, 10, 18)) == datetime(2026, 10, 23)
+    for invalid in ("* * *", "60 * * * *", "* * * * mon-", "*/0 * * * *"):
+        with pytest.raises(ValueError):
+            CronExpression(invalid)
+
+    # Fire times follow the task's timezone, 02:30 is skipped when Oslo switches to summer time
+    start = datetime(2026, 3, 28, 12, tzinfo=timezone.utc)
+    task = ScheduledTask("backup", func=print, cron="30 2 * * *", timezone="Europe/Oslo", start_time=start)
+    assert task.next_run == datetime(2026, 3, 29, 3, 30, tzinfo=ZoneInfo("Europe/Oslo"))
+    task.calculate_next_run(time.monotonic() + (task.fire_time - datetime.now(timezone.utc)).total_seconds() + 1)
+    assert task.next_run == datetime(2026, 3, 30, 2, 30, tzinfo=ZoneInfo("Europe/Oslo"))
+
+
+class FakeClock:
+    """Stands in for the scheduler's time module, with a wall clock that can be set."""
+
+    def __init__(self, moment: datetime) -> None:
+        self.now = moment.timestamp()
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now - 1_000_000
+
+
+async def test_cron_deadlines_across_dst(monkeypatch: pytest.MonkeyPatch) -> None:
+    oslo = ZoneInfo("Europe/Oslo")
+    clock = FakeClock(datetime(2026, 3, 29, 1, tzinfo=oslo))
+    monkeypatch.setattr("future.scheduler.time", clock)
+
+    # Only two hours pass from 01:00 to 04:00 on the night clocks go forward
+    task = ScheduledTask("backup", func=print, cron="0 4 * * *", timezone=oslo, start_time=datetime(2026, 3, 29, 1, tzinfo=oslo))
+    assert task.deadline - clock.monotonic() == 2 * 3600
+
+    # and 25 hours from one 04:00 to the next when they go back
+    clock.now = datetime(2026, 10, 24, 4, tzinfo=oslo).timestamp()
+    task = ScheduledTask("backup", func=print, cron="0 4 * * *", timezone=oslo, start_time=datetime(2026, 10, 24, 3, tzinfo=oslo))
+    assert task.calculate_next_run(clock.monotonic()) == 1
+    assert task.next_run == datetime(2026, 10, 25, 4, tzinfo=oslo)
+    assert task.deadline - clock.monotonic() == 25 * 3600
+
+    # Woken at 03:00 winter time, an hour before the fire time, nothing is due yet
+    clock.now = datetime(2026, 10, 25, 3, tzinfo=oslo).timestamp()
+    assert task.calculate_next_run(clock.monotonic()) == 0
+    assert task.deadline - clock.monotonic() == 3600
+    clock.now += 3600
+    assert task.calculate_next_run(clock.monotonic()) == 1
+    assert task.next_run == datetime(2026, 10, 26, 4, tzinfo=oslo)
+
+
+async def test_misfire_policies() -> None:
+    runs = {"coalesce": 0, "catch_up": 0, "bounded": 0}
+
+    async def tick(name: str) -> None:
+        runs[name] += 1
+
+    scheduler = CronScheduler()
+    await scheduler.start()
+    for policy in ("coalesce", "catch_up"):
+        scheduler.add_task(Task(policy, interval=0.1, unit=Unit.SECONDS, func=tick, args=(policy,), misfire=policy, max_concurrency=5))
+    # Missed runs respect the overlap policy, here one running and one queued
+    scheduler.add_task(Task("bounded", interval=0.1, unit=Unit.SECONDS, func=tick, args=("bounded",), misfire="catch_up", overlap="queue"))
+    await asyncio.sleep(0.01)
+    time.sleep(0.45)  # Stall the event loop through four more slots
+    await asyncio.sleep(0.02)
+    await scheduler.stop()
+
+    assert runs["coalesce"] == 2
+    assert runs["catch_up"] == 5
+    assert runs["bounded"] == 3
+
+
+async def test_file_lease_failover(tmp_path: Path) -> None:
+    first, second = FileLeaseBackend(str(tmp_path)), FileLeaseBackend(str(tmp_path))
+    assert await first.acquire("cron", "first", 10)
+    assert not await second.acquire("cron", "second", 10)
+    assert (tmp_path / "cron.lock").read_text() == "first"
+    # Leases held by one backend are not handed to its other owners
+    assert await first.acquire("cron", "first", 10)
+    assert not await first.acquire("cron", "other", 10)
+    assert not await first.renew("cron", "other", 10)
+    await first.release("cron", "other")
+    assert await first.renew("cron", "first", 10)
+    await first.release("cron", "first")
+    assert await second.acquire("cron", "second", 10)
+    await second.release("cron", "second")
+
+    # The kernel releases the lock of a worker that dies without cleaning up
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"import fcntl, sys, time; f = open({str(tmp_path / 'cron.lock')!r}, 'a'); fcntl.flock(f, fcntl.LOCK_EX); print(flush=True); time.sleep(60)",
+        ],
+        stdout=subprocess.PIPE,
+    )
+    assert holder.stdout is not None
+    holder.stdout.readline()
+    assert not await first.acquire("cron", "first", 10)
+    holder.kill()
+    holder.wait()
+    assert await first.acquire("cron", "first", 10)
+    await first.release("cron", "first")
+
+
+async def test_only_the_leader_runs_tasks() -> None:
+    backend = MemoryLeaseBackend()
+    runs = {"a": 0, "b": 0}
+
+    async def tick(worker: str) -> None:
+        runs[worker] += 1
+
+    schedulers = {}
+    for worker in runs:
+        schedulers[worker] = CronScheduler(election=LeaderElection(backend, ttl=0.2, renew_interval=0.02, owner=worker))
+        await schedulers[worker].start()
+        schedulers[worker].add_task(Task("tick", interval=0.02, unit=Unit.SECONDS, func=tick, args=(worker,)))
+    await asyncio.sleep(0.1)
+    assert runs["a"] >= 3 and runs["b"] == 0
+
+    # Stopping the leader releases the lease, the other worker takes over on its next attempt
+    await schedulers["a"].stop()
+    await asyncio.sleep(0.1)
+    await schedulers["b"].stop()
+    assert runs["b"] >= 2
+    assert not backend.leases
+
+
+async def test_job_stores(tmp_path: Path) -> None:
+    states: dict[str, TaskState] = {"backup": {"last_run": 100.0, "next_run": 200.0}}
+    runs = [RunRecord(task="backup", started=float(number), duration=0.5, outcome="success", error=None) for number in range(5)]
+    factories: list[Callable[[], JobStore]] = [
+        lambda: SQLJobStore(f"sqlite:///{tmp_path / 'jobs.db'}", history=3),
+        lambda: FileJobStore(str(tmp_path / "jobs.jsonl"), history=3),
+    ]
+    for factory in factories:
+        store = factory()
+        assert store.load() == {}
+        store.write(states, runs[:4])
+        store.write({"backup": {"last_run": 200.0, "next_run": 300.0}}, runs[4:])
+        store.close()
+
+        reopened = factory()
+        assert reopened.load() == {"backup": {"last_run": 200.0, "next_run": 300.0}}
+        assert [run["started"] for run in reopened.history("backup")] == [4.0, 3.0, 2.0]
+        reopened.close()
+
+    # A line torn by a crash is skipped, and compaction keeps only the live records
+    with open(tmp_path / "jobs.jsonl", "ab") as file:
+        file.write(b'{"type": "state", "na')
+    store = FileJobStore(str(tmp_path / "jobs.jsonl"), history=3, compact_after=0)
+    assert store.load()["backup"]["next_run"] == 300.0
+    store.write({}, [])
+    assert len((tmp_path / "jobs.jsonl").read_bytes().splitlines()) == 4
+
+    # The torn tail is cut off before appending, so the next record stays readable
+    with open(tmp_path / "jobs.jsonl", "ab") as file:
+        file.write(b'{"type": "run", "task": "backup", "sta')
+    store = FileJobStore(str(tmp_path / "jobs.jsonl"), history=3)
+    store.write({"backup": {"last_run": 300.0, "next_run": 400.0}}, [])
+    reopened = FileJobStore(str(tmp_path / "jobs.jsonl"), history=3)
+    assert reopened.load()["backup"]["next_run"] == 400.0
+    assert [run["started"] for run in reopened.history("backup")] == [4.0, 3.0, 2.0]
+
+
+async def test_schedule_survives_restarts(tmp_path: Path) -> None:
+    runs: list[str] = []
+
+    async def backup() -> None:
+        runs.append("backup")
+
+    async def run_scheduler(*tasks: Task) -> CronScheduler:
+        scheduler = CronScheduler(store=FileJobStore(str(tmp_path / "jobs.jsonl")), flush_interval=0.01)
+        await scheduler.start()
+        for task in tasks:
+            scheduler.add_task(task)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = await run_scheduler(Task("backup", interval=1, unit=Unit.HOURS, func=backup))
+    next_run = scheduler.tasks["backup"].next_run
+    assert runs == ["backup"]
+
+    # After a restart the task keeps its schedule instead of running again right away
+    scheduler = await run_scheduler(Task("backup", interval=1, unit=Unit.HOURS, func=backup))
+    assert runs == ["backup"]
+    assert scheduler.tasks["backup"].next_run == next_run
+    history = await asyncio.to_thread(FileJobStore(str(tmp_path / "jobs.jsonl")).history, "backup")
+    assert [run["outcome"] for run in history] == ["success"]
+
+    # Runs missed while the process was down are misfires
+    two_hours_ago = (datetime.now() - timedelta(hours=2)).timestamp()
+    FileJobStore(str(tmp_path / "jobs.jsonl")).write(
+        {"coalesce": {"last_run": None, "next_run": two_hours_ago}, "catch_up": {"last_run": None, "next_run": two_hours_ago}}, []
+    )
+    runs.clear()
+    await run_scheduler(
+        *(Task(policy, interval=1, unit=Unit.HOURS, func=backup, misfire=policy, overlap="queue", max_concurrency=2) for policy in ("coalesce", "catch_up"))
+    )
+    assert len(runs) == 1 + 3
@@ -1,8 +1,19 @@
+import asyncio
+
+from typing import Optional
+
+import pytest
+
 from future.application import Future
 from future.controllers import WebSocketController
 from future.lifespan import Lifespan
+from future.middleware import Middleware
+from future.requests import Request
+from future.responses import Response
 from future.routing import RouteGroup, WebSocket
 from future.testclient import FutureTestClient
+from future.types import ASGIMessage
+from future.websockets import WebSocketBatcher, WebSocketConnection, WebSocketDisconnect, WebSocketHub, WebSocketState
 
 
 async def test_websocket_basic() -> None:
@@ -78,3 +89,185 @@ async def test_websocket_empty_message() -> None:
         reply = await websocket.recv()
         assert reply == "Echo: "
         await websocket.close()
+
+
+HUB = WebSocketHub()
+
+
+class RoomController:
+    async def join(websocket: WebSocketConnection, room: str) -> None:  # type: ignore[reportSelfClsParameterName]
+        await websocket.accept()
+        HUB.join(room, websocket)
+        async for message in websocket:
+            HUB.broadcast_json(room, {"room": room, "message": message})
+
+    async def fail(websocket: WebSocketConnection) -> None:  # type: ignore[reportSelfClsParameterName]
+        await websocket.accept()
+        raise RuntimeError("boom")
+
+
+class RejectMiddleware(Middleware):
+    name = "reject"
+
+    def intercept(request: Request, response: Optional[Response] = None) -> Optional[Response]:  # type: ignore[reportAttributeAccessIssue,reportSelfClsParameterName]
+        if request.headers.get("x-token") != "secret":
+            return Response(body="Forbidden", status=403)
+        return None
+
+
+async def test_websocket_rooms() -> None:
+    routes = [
+        WebSocket(path="/rooms/<room>", endpoint=RoomController.join, name="room"),  # type: ignore[reportAttributeAccessIssue]
+        WebSocket(path="/fail", endpoint=RoomController.fail, name="fail"),  # type: ignore[reportAttributeAccessIssue]
+        WebSocket(path="/private", endpoint=WebSocketController.websocket_handler, name="private", middlewares=[RejectMiddleware]),  # type: ignore[reportAttributeAccessIssue,list-item]
+    ]
+
+    lifespan = Lifespan()
+    app = Future(lifespan=lifespan, config={"APP_DEBUG": False})
+    app.add_routes(routes=routes)
+
+    async with FutureTestClient(app) as client:
+        first = await client.websocket_connect("ws://127.0.0.1/rooms/scans")
+        second = await client.websocket_connect("ws://127.0.0.1/rooms/scans")
+        other = await client.websocket_connect("ws://127.0.0.1/rooms/other")
+        await asyncio.sleep(0.01)
+        assert HUB.get_stats() == {"rooms": 2, "connections": 3, "dropped": 0}
+
+        await first.send("hello")
+        # Both subscribers get the very same message, encoded once
+        first_message = await first.receive_message()
+        second_message = await second.receive_message()
+        assert first_message is second_message
+        assert first_message["text"] == '{"room":"scans","message":"hello"}'
+        assert other.from_app.empty()
+
+        # Disconnected clients leave their rooms
+        await first.close()
+        await second.close()
+        await other.close()
+        assert HUB.rooms == {}
+
+        with pytest.raises(WebSocketDisconnect) as disconnect:
+            await client.websocket_connect("ws://127.0.0.1/private")
+        assert disconnect.value.code == 1008
+
+        websocket = await client.websocket_connect("ws://127.0.0.1/private", headers={"x-token": "secret"})
+        await websocket.send(b"\x00\x01")
+        assert await websocket.recv() == b"\x00\x01"
+        await websocket.close()
+
+        websocket = await client.websocket_connect("ws://127.0.0.1/fail")
+        with pytest.raises(WebSocketDisconnect) as disconnect:
+            await websocket.recv()
+        assert disconnect.value.code == 1011
+        with pytest.raises(RuntimeError):
+            await websocket.close()
+
+
+async def test_websocket_backpressure() -> None:
+    gate = asyncio.Event()
+    sent: list[ASGIMessage] = []
+
+    async def receive() -> ASGIMessage:
+        return {"type": "websocket.connect"}
+
+    async def send(message: ASGIMessage) -> None:
+        sent.append(message)
+        if message["type"] == "websocket.send":
+            await gate.wait()
+
+    scope = {"type": "websocket", "path": "/", "headers": [], "scheme": "ws"}
+    websocket = WebSocketConnection(scope, receive, send, send_queue_size=1)
+    await websocket.accept()
+
+    hub = WebSocketHub()
+    hub.join("scans", websocket)
+    assert hub.broadcast_text("scans", "1") == 1
+    await asyncio.sleep(0)  # the sender takes it and waits on the client
+    assert hub.broadcast_text("scans", "2") == 1
+
+    # A full queue makes send_text wait
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(websocket.send_text("3"), timeout=0.01)
+
+    # and broadcasts close the connection instead of waiting
+    assert hub.broadcast_text("scans", "4") == 0
+    assert websocket.state is WebSocketState.DISCONNECTED
+    assert hub.get_stats() == {"rooms": 0, "connections": 0, "dropped": 1}
+
+    gate.set()
+    await websocket.cleanup()
+    assert [message.get("text") for message in sent[1:-1]] == ["1"]
+    assert sent[-1] == {"type": "websocket.close", "code": 1013, "reason": "Send queue full"}
+
+
+async def test_websocket_close_timeout() -> None:
+    sent: list[ASGIMessage] = []
+
+    async def receive() -> ASGIMessage:
+        return {"type": "websocket.connect"}
+
+    async def stuck(message: ASGIMessage) -> None:
+        sent.append(message)
+        if message["type"] == "websocket.send":
+            await asyncio.Event().wait()  # a client that never reads
+
+    async def failing(message: ASGIMessage) -> None:
+        if message["type"] == "websocket.send":
+            await asyncio.sleep(0.01)
+            raise RuntimeError("broken transport")
+
+    scope = {"type": "websocket", "path": "/", "headers": [], "scheme": "ws"}
+
+    # Closing gives up on a stuck client after close_timeout, even with a full queue
+    websocket = WebSocketConnection(scope, receive, stuck, send_queue_size=1, close_timeout=0.05)
+    await websocket.accept()
+    await websocket.send_text("1")
+    await asyncio.sleep(0)
+    await websocket.send_text("2")
+    await asyncio.wait_for(websocket.close(), timeout=1)
+    assert websocket.sender is not None and websocket.sender.done()
+    assert websocket.state is WebSocketState.DISCONNECTED and websocket.close_code == 1006
+    assert [message["type"] for message in sent] == ["websocket.accept", "websocket.send"]
+
+    # A sender failing on any error disconnects and wakes the producers waiting for room
+    websocket = WebSocketConnection(scope, receive, failing, send_queue_size=1)
+    await websocket.accept()
+    await websocket.send_text("1")
+    await asyncio.sleep(0)
+    await websocket.send_text("2")
+    await asyncio.wait_for(websocket.send_text("3"), timeout=1)
+    assert websocket.state is WebSocketState.DISCONNECTED and websocket.close_code == 1006
+    with pytest.raises(WebSocketDisconnect):
+        await websocket.send_text("4")
+    await asyncio.wait_for(websocket.cleanup(), timeout=1)
+
+
+async def test_websocket_batcher() -> None:
+    sent: list[ASGIMessage] = []
+
+    async def receive() -> ASGIMessage:
+        return {"type": "websocket.connect"}
+
+    async def send(message: ASGIMessage) -> None:
+        sent.append(message)
+
+    websocket = WebSocketConnection({"type": "websocket", "path": "/", "headers": [], "scheme": "ws"}, receive, send)
+    await websocket.accept()
+
+    async with WebSocketBatcher(websocket, window=0.01) as batcher:
+        for i in range(3):
+            await batcher.send_json({"id": i})
+        await asyncio.sleep(0.05)
+        await batcher.send_json({"id": 3})
+
+    async with WebSocketBatcher(websocket, window=10, max_messages=2, framing="ndjson") as ndjson:
+        for i in range(3):
+            await ndjson.send_json(i)
+
+    await websocket.close()
+    assert [message.get("text") for message in sent[1:-1]] == ['[{"id":0},{"id":1},{"id":2}]', '[{"id":3}]', "0\n1\n", "2\n"]
+
+    stats = batcher.get_stats()
+    assert stats["batches"] == 2 and stats["messages"] == 4 and stats["max_batch_size"] == 3
+    assert stats["max_latency_ms"] >= 10